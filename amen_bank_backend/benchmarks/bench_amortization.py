@@ -0,0 +1,41 @@
+"""Micro-benchmark : échéancier vectorisé (NumPy) contre une boucle Python ligne par ligne.
+
+Usage (depuis amen_bank_backend) : python benchmarks/bench_amortization.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.amortization import amortization_schedule, annuity_payment
+
+
+def loop_schedule(amount, years, annual_rate):
+    """Échéancier calculé ligne par ligne, sans différé ni remboursement anticipé"""
+    monthly_rate = annual_rate / 12
+    months = years * 12
+    payment = round(annuity_payment(amount, monthly_rate, months), 3)
+    balance = amount
+    rows = []
+    for month in range(1, months + 1):
+        interest = round(balance * monthly_rate, 3)
+        principal = round(payment - interest, 3) if month < months else balance
+        balance = round(balance - principal, 3)
+        rows.append((month, round(interest + principal, 3), interest, principal, 0.0, balance))
+    return rows
+
+
+if __name__ == '__main__':
+    cases = [(50000, 7, 0.07), (300000, 25, 0.06)]
+    for amount, years, rate in cases:
+        loop = min(timeit.repeat(lambda: loop_schedule(amount, years, rate), number=200, repeat=5)) / 200
+        vector = min(timeit.repeat(lambda: amortization_schedule(amount, years, rate), number=200, repeat=5)) / 200
+        rows = min(timeit.repeat(lambda: list(amortization_schedule(amount, years, rate).rows()), number=200, repeat=5)) / 200
+        print(f"{years * 12:4d} échéances : boucle {loop * 1e6:7.1f} µs, vectorisé {vector * 1e6:6.1f} µs "
+              f"({rows * 1e6:6.1f} µs avec conversion en lignes)")
+
+    early = min(timeit.repeat(
+        lambda: amortization_schedule(300000, 25, 0.06, deferral_months=12, early_repayments=[(60, 20000), (120, 20000)]),
+        number=200, repeat=5)) / 200
+    print(f" 300 échéances, différé et deux remboursements anticipés : {early * 1e6:.1f} µs")
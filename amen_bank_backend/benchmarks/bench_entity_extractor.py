@@ -0,0 +1,81 @@
+"""Micro-benchmark : extraction d'entités en une passe contre les six `re.findall` d'origine.
+
+Usage (depuis amen_bank_backend) : python benchmarks/bench_entity_extractor.py
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.entity_extractor import extract_entities
+
+
+def legacy_extract_entities(message):
+    """Ancienne implémentation de ChatbotHandler._extract_entities"""
+    entities = {}
+
+    montant_pattern = r'(\d+(?:[.,]\d+)?)\s*(?:tnd|dinars?|dt)?'
+    montants = re.findall(montant_pattern, message.lower())
+    if montants:
+        entities['montant'] = float(montants[0].replace(',', '.'))
+
+    duree_pattern = r'(\d+)\s*(?:ans?|années?)'
+    durees = re.findall(duree_pattern, message.lower())
+    if durees:
+        entities['duree_annees'] = int(durees[0])
+
+    nom_pattern = r'(?:à|pour|vers)\s+([A-Za-z\s]+?)(?:\s|$|,|\.|!|\?|\d)'
+    noms = re.findall(nom_pattern, message)
+    if noms:
+        entities['beneficiaire'] = noms[0].strip()
+
+    account_id_pattern = r'(?:compte|id)\s*(\d+)'
+    account_ids = re.findall(account_id_pattern, message.lower())
+    if account_ids:
+        entities['from_account_id'] = int(account_ids[0])
+        entities['to_account_id'] = int(account_ids[0])
+
+    to_account_number_pattern = r'(?:numéro de compte|compte)\s*(\d{8,})'
+    to_account_numbers = re.findall(to_account_number_pattern, message.lower())
+    if to_account_numbers:
+        entities['to_account_number'] = to_account_numbers[0]
+
+    if any(word in message.lower() for word in ['oui', 'confirme', 'ok', 'valider']):
+        entities['confirmation'] = 'oui'
+    elif any(word in message.lower() for word in ['non', 'annuler', 'stop']):
+        entities['confirmation'] = 'non'
+
+    return entities
+
+
+MESSAGES = [
+    "Effectue un virement de 1000 TND à Ahmed Ben Salah",
+    "Simule un crédit de 50 000 TND sur 7 ans",
+    "Déposer 200 TND sur mon compte 3",
+    "vire 150,500 dt du compte 2 vers le compte 5",
+    "virer 500 TND vers le compte 123456789012",
+    "taux de 5% pour un prêt de 20000 dinars",
+    "Le compte 123456789012 a reçu 300 TND",
+    "Oui je confirme",
+    "Quel est le solde de mon compte courant ?",
+    "Pouvez-vous me raconter l'histoire de la banque et de ses agences à Tunis ?",
+]
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(lambda: [func(m) for m in MESSAGES], number=number, repeat=5))
+    per_message = seconds / (number * len(MESSAGES)) * 1e6
+    print(f"{label:<40} {per_message:8.2f} µs/message")
+
+
+if __name__ == '__main__':
+    bench("six re.findall", legacy_extract_entities, 2000)
+    bench("passe unique", extract_entities, 2000)
+
+    print()
+    for message in MESSAGES:
+        print(message)
+        print(f"    avant : {legacy_extract_entities(message)}")
+        print(f"    après : {extract_entities(message)}")
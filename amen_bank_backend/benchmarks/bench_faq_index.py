@@ -0,0 +1,82 @@
+"""Micro-benchmark : latence et taux de réponse de l'index FAQ (BM25) sur un jeu de questions.
+
+Chaque question est étiquetée avec le début de la réponse attendue, ou None
+quand aucune réponse de la FAQ ne convient (elle doit alors partir en génération).
+
+Usage (depuis amen_bank_backend) : python benchmarks/bench_faq_index.py [seuil]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.faq_index import faq_index, FAQ_ANSWER_THRESHOLD
+
+SAMPLES = [
+    ("quels documents pour un crédit", "Pour une demande de crédit"),
+    ("Quels papiers dois-je fournir pour mon dossier de prêt ?", "Pour une demande de crédit"),
+    ("quels justificatifs pour un financement", "Pour une demande de crédit"),
+    ("Quel est le taux de vos crédits ?", "Nos taux de crédit"),
+    ("taux crédit immobilier", "Nos taux de crédit"),
+    ("combien coûte un crédit auto", "Nos taux de crédit"),
+    ("comment effectuer un virement ?", "Pour effectuer un virement"),
+    ("comment programmer un virement permanent", "Un virement permanent"),
+    ("mettre en place un virement mensuel", "Un virement permanent"),
+    ("quels sont les frais bancaires", "Les frais bancaires"),
+    ("pourquoi j'ai des frais sur mon compte", "Les frais bancaires"),
+    ("j'ai perdu ma carte", "🔒 En cas de perte"),
+    ("carte volée, que faire ?", "🔒 En cas de perte"),
+    ("comment ouvrir un compte épargne", "Pour ouvrir un compte"),
+    ("comment consulter mon solde ?", "Demandez-moi simplement"),
+    ("comment voir mes transactions", "Pour consulter vos transactions"),
+    ("raconte-moi une blague", None),
+    ("quelle est la capitale de la France", None),
+    ("je voudrais parler à un conseiller demain", None),
+    ("quel temps fait-il à Tunis", None),
+    ("Simule un crédit de 50000 TND sur 7 ans", None),
+    ("Virer 100 TND à Ahmed Ben Salah", None),
+    ("Déposer 200 TND sur mon compte 3", None),
+    ("je veux un crédit", None),
+]
+
+
+def evaluate(threshold):
+    correct = answered = wrong = missed = 0
+    for question, expected in SAMPLES:
+        answer = faq_index.answer(question, threshold)
+        if answer is None:
+            if expected is None:
+                correct += 1
+            else:
+                missed += 1
+        else:
+            answered += 1
+            if expected is not None and answer.startswith(expected):
+                correct += 1
+            else:
+                wrong += 1
+    return correct, answered, wrong, missed
+
+
+if __name__ == '__main__':
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else FAQ_ANSWER_THRESHOLD
+    questions = [question for question, _ in SAMPLES]
+    seconds = min(timeit.repeat(lambda: [faq_index.search(q) for q in questions], number=500, repeat=5))
+    print(f"{len(faq_index.documents)} formulations indexées, {len(faq_index.answers)} réponses")
+    print(f"latence moyenne : {seconds / (500 * len(questions)) * 1e6:.1f} µs/question")
+    print()
+
+    for candidate in (0.4, 0.5, 0.6, 0.7, 0.8):
+        correct, answered, wrong, missed = evaluate(candidate)
+        marker = " <-" if candidate == threshold else ""
+        print(f"seuil {candidate:.1f} : {correct}/{len(SAMPLES)} corrects, {answered} réponses servies, "
+              f"{wrong} erronées, {missed} manquées{marker}")
+    print()
+
+    for question, expected in SAMPLES:
+        match = faq_index.search(question)
+        score = match[1] if match else 0.0
+        served = match is not None and score >= threshold
+        ok = (expected is None and not served) or (served and expected is not None and match[0].startswith(expected))
+        print(f"{'ok ' if ok else 'KO '} {score:5.3f}  {question}")
@@ -0,0 +1,89 @@
+"""Micro-benchmark : moteur d'intentions compilé contre l'ancienne cascade de `any(...)`.
+
+Usage (depuis amen_bank_backend) : python benchmarks/bench_intent_engine.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.intent_engine import KeywordIntentEngine, INTENT_KEYWORDS
+
+
+def legacy_analyze_intent(message):
+    """Ancienne implémentation de ChatbotHandler._analyze_intent"""
+    message_lower = message.lower()
+
+    if any(word in message_lower for word in ['solde', 'combien', 'argent', 'compte']):
+        return 'consultation_solde'
+    elif any(word in message_lower for word in ['transaction', 'mouvement', 'historique', 'opération']):
+        return 'consultation_transactions'
+    elif any(word in message_lower for word in ['virement', 'virer', 'transférer', 'envoyer']):
+        return 'virement'
+    elif any(word in message_lower for word in ['crédit', 'prêt', 'emprunt', 'financement']):
+        return 'demande_credit'
+    elif any(word in message_lower for word in ["simulation", "simuler"]):
+        return "simulation_credit"
+    elif any(word in message_lower for word in ["depot", "déposer", "verser"]):
+        return "depot"
+    elif any(word in message_lower for word in ["retrait", "retirer"]):
+        return "retrait"
+    elif any(word in message_lower for word in ["aide", "help", "assistance", "problème"]):
+        return 'assistance'
+    elif any(word in message_lower for word in ['bonjour', 'salut', 'hello', 'bonsoir']):
+        return 'salutation'
+    else:
+        return 'conversation_generale'
+
+
+MESSAGES = [
+    "Quel est le solde de mon compte courant ?",
+    "Affiche mes dernières transactions",
+    "Effectue un virement de 1000 TND à Ahmed Ben Salah",
+    "Simule un crédit de 50000 TND sur 7 ans",
+    "combien pour un crédit",
+    "Déposer 200 TND sur mon compte épargne",
+    "Retirer 50 TND de mon compte courant",
+    "Aide-moi à comprendre mes frais bancaires",
+    "Bonjour",
+    "Pouvez-vous me raconter l'histoire de la banque et de ses agences à Tunis ?",
+]
+
+
+def large_table(extra_terms):
+    """Table d'origine complétée de termes synthétiques, pour simuler des centaines de mots-clés"""
+    table = [(intent, list(keywords)) for intent, keywords in INTENT_KEYWORDS]
+    for i in range(extra_terms):
+        table[i % len(table)][1].append((f"terme{i}x", 1.0))
+    return table
+
+
+def legacy_large(message, table):
+    message_lower = message.lower()
+    for intent, keywords in table:
+        if any(keyword in message_lower for keyword, _ in keywords):
+            return intent
+    return 'conversation_generale'
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(lambda: [func(m) for m in MESSAGES], number=number, repeat=5))
+    per_message = seconds / (number * len(MESSAGES)) * 1e6
+    print(f"{label:<40} {per_message:8.2f} µs/message")
+
+
+if __name__ == '__main__':
+    engine = KeywordIntentEngine()
+    bench("ancienne cascade any()", legacy_analyze_intent, 2000)
+    bench("moteur compilé", engine.classify, 2000)
+
+    for extra in (200, 800):
+        table = large_table(extra)
+        large_engine = KeywordIntentEngine(table)
+        bench(f"ancienne cascade, +{extra} termes", lambda m: legacy_large(m, table), 200)
+        bench(f"moteur compilé, +{extra} termes", large_engine.classify, 200)
+
+    print()
+    for message in MESSAGES:
+        print(f"{legacy_analyze_intent(message):<28} {engine.classify(message)[0]:<28} {message}")
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class QueueFull(Exception):
+    """La file d'attente du planificateur a atteint `max_queue`"""
+
+
+class MicroBatchScheduler:
+    """Regroupe les demandes concurrentes pour les traiter en un seul lot.
+
+    Dès qu'une demande arrive, le thread du planificateur attend au plus
+    `max_wait_ms` que d'autres la rejoignent (ou que le lot atteigne
+    `max_batch_size`), puis appelle `run_batch(items)` une seule fois.
+    `run_batch` doit renvoyer une liste de résultats dans le même ordre ;
+    chaque appelant récupère le sien via la Future renvoyée par `submit`.
+
+    Avec `max_queue`, `submit` lève QueueFull plutôt que d'allonger une file
+    déjà pleine. Un appelant qui abandonne (délai dépassé) annule sa Future :
+    la demande est retirée du prochain lot si elle n'a pas encore démarré.
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=20, max_queue=None, name="micro-batch"):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.name = name
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.started = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def submit(self, item):
+        future = Future()
+        with self._cond:
+            if self.max_queue is not None and len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f"{self.name}: {len(self._queue)} demandes en attente")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._queue.append((item, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def record_timeout(self):
+        """Compter une demande abandonnée par son appelant faute de réponse à temps"""
+        with self._cond:
+            self.timeouts += 1
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return None
+
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            now = time.monotonic()
+            while self._queue and len(batch) < self.max_batch_size:
+                item, future, enqueued_at = self._queue.popleft()
+                # Ignorer les demandes annulées entre-temps par leur appelant
+                if not future.set_running_or_notify_cancel():
+                    self.cancelled += 1
+                    continue
+                wait = now - enqueued_at
+                self.started += 1
+                self.queue_wait_total += wait
+                self.queue_wait_max = max(self.queue_wait_max, wait)
+                batch.append((item, future))
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+
+            try:
+                results = list(self.run_batch([item for item, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: {len(results)} résultats pour un lot de {len(batch)} demandes")
+            except Exception as e:
+                # Aucun appelant ne reste bloqué : chacun reçoit l'erreur
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+            with self._cond:
+                self.batches += 1
+                self.items += len(batch)
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._queue),
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size_seen": self.max_batch_seen,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "max_queue": self.max_queue,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "cancelled": self.cancelled,
+                "avg_queue_wait_ms": round(self.queue_wait_total / self.started * 1000, 1) if self.started else 0.0,
+                "max_queue_wait_ms": round(self.queue_wait_max * 1000, 1)
+            }
@@ -1,22 +1,50 @@
-from transformers import pipeline
 import json
-import re
+import os
+import time
 from datetime import datetime, timedelta
-from src.models.database import get_db_connection
 from src.routes.transfers import perform_transfer
-from src.routes.accounts import get_accounts_data, perform_deposit, perform_withdrawal
+from src.routes.accounts import get_accounts_data, get_spending_data, perform_deposit, perform_withdrawal
 from src.routes.loans import perform_loan_simulation, perform_loan_application
+from src.chatbot.generation import GenerationModel, GenerationTimeout
+from src.chatbot.batching import QueueFull
+from src.chatbot.faq_index import faq_index, FAQ_ANSWER_THRESHOLD
+from src.chatbot.intent_cascade import intent_cascade, CANNED_RESPONSES
+from src.chatbot.state_store import conversation_state_store, conversation_key
+from src.chatbot.user_context import user_context_cache
+from src.chatbot.entity_extractor import extract_entities
+from src.chatbot.text_utils import fold_text
+
+# Réponse déterministe tant que le modèle de génération n'est pas chargé
+MODEL_WARMING_RESPONSE = (
+    "Notre assistant termine son démarrage. En attendant, je peux déjà vous aider pour "
+    "vos soldes, vos transactions, un virement, un dépôt, un retrait ou une simulation de crédit."
+)
+
+# Réponse déterministe quand le modèle est saturé ou trop lent
+MODEL_BUSY_RESPONSE = (
+    "Notre assistant est très sollicité en ce moment. Je peux tout de même vous aider pour "
+    "vos soldes, vos transactions, un virement, un dépôt, un retrait ou une simulation de crédit."
+)
+
+# Intentions servies avec les données du client connecté plutôt qu'avec la FAQ
+DATA_INTENTS = ('consultation_solde', 'consultation_transactions', 'depenses')
+
+# Intentions qui démarrent une opération : la FAQ ne répond que si le message est une question
+ACTION_INTENTS = ('virement', 'demande_credit', 'simulation_credit', 'depot', 'retrait')
+QUESTION_WORDS = ('comment', 'quel', 'quels', 'quelle', 'quelles', 'pourquoi', 'combien', 'que', 'qu', 'ou', 'est')
+
+# Opérations que le classifieur ne démarre pas seul : la conversation propose l'opération
+# (état SUGGESTION_STEP) et le parcours ne commence qu'après un « oui »
+SUGGESTION_STEP = 'suggestion'
+SUGGESTED_OPERATIONS = {
+    'virement': "effectuer un virement",
+    'demande_credit': "faire une demande de crédit",
+    'depot': "effectuer un dépôt",
+    'retrait': "effectuer un retrait"
+}
 
 class ChatbotHandler:
     def __init__(self):
-        self.generator = pipeline(
-            "text-generation", 
-            model="distilgpt2", 
-            tokenizer="distilgpt2",
-            max_new_tokens=100, 
-            truncation=True
-        )
-        
         self.system_prompt = """Tu es un assistant bancaire intelligent d'Amen Bank, spécialisé dans les services bancaires en ligne en Tunisie. 
 
 CONTEXTE:
@@ -47,20 +75,134 @@ INSTRUCTIONS IMPORTANTES:
 - En cas de problème technique, orienter vers un conseiller
 
 Réponds de manière naturelle et utile aux demandes des clients."""
-        self.conversation_states = {}
+        # Chargé en arrière-plan par warm_up() : n'importe pas transformers au démarrage.
+        # Le prompt système est encodé une seule fois et mis en cache (clés/valeurs).
+        self.model = GenerationModel("distilgpt2", max_new_tokens=100, prefix=f"{self.system_prompt}\n\n")
+        self.intent_cascade = intent_cascade
+        # Temps maximal de traitement d'un message avant la réponse de repli
+        self.deadline_seconds = float(os.environ.get('CHAT_DEADLINE_MS', 8000)) / 1000
+        self.state_store = conversation_state_store
+        self.faq_index = faq_index
+        self.faq_threshold = FAQ_ANSWER_THRESHOLD
 
     def process_message(self, message, user_session=None):
+        deadline = time.monotonic() + self.deadline_seconds
+        response_data, prompt = self._route_message(message, user_session)
+        if prompt is not None:
+            start = time.perf_counter()
+            try:
+                generated = self.model.generate(prompt, timeout=max(deadline - time.monotonic(), 0.0))
+            except (QueueFull, GenerationTimeout) as e:
+                print(f"Génération abandonnée, réponse de repli: {e}")
+                response_data['response'] = self._fallback_response(message)
+                response_data['degraded'] = True
+                return response_data
+            response_data['response'] = self._finalize_generated(generated)
+            self.intent_cascade.record_generation(time.perf_counter() - start)
+        return response_data
+
+    def _fallback_response(self, message):
+        """Réponse immédiate sans le modèle : question fréquente la plus proche, sinon message d'attente"""
+        return self.faq_index.answer(message, self.faq_threshold) or MODEL_BUSY_RESPONSE
+
+    def stream_message(self, message, user_session=None):
+        """Variante de process_message qui produit des événements au fil de la génération.
+
+        Génère des couples (événement, données) : 'meta' (intention, entités)
+        en premier, puis des 'token' au fur et à mesure, et enfin 'done' avec
+        la réponse complète, qui fait foi. Mêmes limites que process_message :
+        file pleine ou délai dépassé avant le premier morceau donnent la
+        réponse de repli ; un arrêt en cours de route garde le texte déjà reçu.
+        """
+        deadline = time.monotonic() + self.deadline_seconds
+        response_data, prompt = self._route_message(message, user_session)
+        yield 'meta', {key: value for key, value in response_data.items() if key != 'response'}
+
+        if prompt is None:
+            yield 'token', {'text': response_data['response']}
+            yield 'done', {'response': response_data['response']}
+            return
+
+        parts = []
+        start = time.perf_counter()
+        stream = self.model.stream(prompt, timeout=max(deadline - time.monotonic(), 0.0))
+        try:
+            for text in stream:
+                parts.append(text)
+                yield 'token', {'text': text}
+        except (QueueFull, GenerationTimeout) as e:
+            print(f"Génération abandonnée, réponse de repli: {e}")
+            if not parts:
+                fallback = self._fallback_response(message)
+                yield 'token', {'text': fallback}
+                yield 'done', {'response': fallback, 'degraded': True}
+                return
+            yield 'done', {'response': self._finalize_generated("".join(parts)), 'degraded': True}
+            return
+        finally:
+            # Lecteur parti en cours de route : arrêter la génération sans attendre le ramasse-miettes
+            stream.close()
+        self.intent_cascade.record_generation(time.perf_counter() - start)
+        yield 'done', {'response': self._finalize_generated("".join(parts))}
+
+    def _finalize_generated(self, ai_response):
+        ai_response = ai_response.strip()
+        if not ai_response or len(ai_response) < 10:
+            ai_response = "Je n'ai pas bien compris votre demande. Pouvez-vous reformuler ?"
+        return ai_response
+
+    def _route_message(self, message, user_session=None):
+        """Traiter le message jusqu'à la génération.
+
+        Renvoie (response_data, prompt) : `prompt` est None quand la réponse
+        est déjà complète, sinon c'est le prompt à passer au modèle. L'état de
+        la conversation est relu au début et réécrit une fois le message traité.
+        """
         user_id = user_session.get("user_id") if user_session else None
-        
-        if user_id not in self.conversation_states:
-            self.conversation_states[user_id] = {"current_intent": None, "entities": {}}
+        key = conversation_key(user_session)
+        state = self.state_store.load(key)
+        try:
+            return self._dispatch_message(message, user_id, state)
+        finally:
+            self.state_store.save(key, state)
+
+    def _dispatch_message(self, message, user_id, state):
+        # Opération proposée au message précédent : ce message est analysé comme un nouveau
+        suggested = None
+        if state["current_intent"] == SUGGESTION_STEP:
+            suggested = state["entities"].get("suggested_intent")
+            state["current_intent"] = None
+            state["entities"].clear()
 
-        state = self.conversation_states[user_id]
-        
         # Analyse initiale de l'intention et des entités
-        intent = self._analyze_intent(message)
+        intent, confidence, tier = self._analyze_intent(message, pending_flow=state["current_intent"] is not None)
         entities = self._extract_entities(message)
 
+        # Réponse à la proposition : « oui » démarre le parcours (sans valoir confirmation de l'opération)
+        if suggested is not None and 'confirmation' in entities:
+            if entities.pop('confirmation') != 'oui':
+                return {'response': "D'accord. Que puis-je faire pour vous ?", 'intent': 'conversation_generale', 'entities': {}, 'action_required': False}, None
+            intent, tier = suggested, 'flow'
+
+        # Question fréquente : réponse rédigée, sans génération ni changement d'état
+        if state["current_intent"] is None:
+            faq_response = self._match_faq(message, intent, entities, user_id)
+            if faq_response is not None:
+                return faq_response, None
+
+        # Opération reconnue par le seul classifieur : la proposer plutôt que la démarrer
+        if tier == 'classifier' and intent in SUGGESTED_OPERATIONS:
+            state["current_intent"] = SUGGESTION_STEP
+            state["entities"]["suggested_intent"] = intent
+            return {
+                'response': f"Souhaitez-vous {SUGGESTED_OPERATIONS[intent]} ? (oui/non)",
+                'intent': intent,
+                'entities': {},
+                'action_required': True,
+                'confidence': confidence,
+                'intent_tier': tier
+            }, None
+
         # Mettre à jour l'intention courante si une nouvelle intention claire est détectée
         if intent != 'conversation_generale' and intent != state["current_intent"]:
             state["current_intent"] = intent
@@ -74,7 +216,8 @@ Réponds de manière naturelle et utile aux demandes des clients."""
             'intent': state["current_intent"],
             'entities': state["entities"],
             'action_required': False,
-            'confidence': 0.8
+            'confidence': confidence,
+            'intent_tier': tier
         }
 
         if state["current_intent"] == 'virement':
@@ -91,22 +234,61 @@ Réponds de manière naturelle et utile aux demandes des clients."""
             account_data = get_accounts_data(user_id)
             response_data['response'] = self._enhance_response_with_data("", account_data, 'consultation_transactions')
             state["current_intent"] = None
+        elif state["current_intent"] == 'depenses' and user_id:
+            spending_data = get_spending_data(user_id)
+            response_data['response'] = self._enhance_response_with_data("", spending_data, 'depenses')
+            state["current_intent"] = None
         elif state["current_intent"] == 'depot':
             response_data = self._handle_deposit_flow(user_id, state)
         elif state["current_intent"] == 'retrait':
             response_data = self._handle_withdrawal_flow(user_id, state)
+        elif state["current_intent"] in CANNED_RESPONSES:
+            response_data['response'] = CANNED_RESPONSES[state["current_intent"]]
+            state["current_intent"] = None
+        elif not self.model.is_ready():
+            # Modèle en cours de chargement : réponse immédiate plutôt qu'attente
+            self.model.warm_up()
+            response_data['response'] = MODEL_WARMING_RESPONSE
+            response_data['model_ready'] = False
+            state["current_intent"] = None
         else:
             # Utiliser le générateur pour les conversations générales
             user_context = self._get_user_context(user_id) if user_id else "Utilisateur non connecté"
-            full_prompt = f"{self.system_prompt}\n\nMESSAGE CLIENT: {message}\n\nCONTEXTE UTILISATEUR:\n{user_context}\n\nRéponse de l'assistant:"
-            generated_text = self.generator(full_prompt, num_return_sequences=1)[0]["generated_text"]
-            ai_response = generated_text.replace(full_prompt, "").strip()
-            if not ai_response or len(ai_response) < 10:
-                ai_response = "Je n'ai pas bien compris votre demande. Pouvez-vous reformuler ?"
-            response_data['response'] = ai_response
+            # Le prompt système est déjà en cache dans le modèle : seule la suite est encodée
+            prompt = f"MESSAGE CLIENT: {message}\n\nCONTEXTE UTILISATEUR:\n{user_context}\n\nRéponse de l'assistant:"
             state["current_intent"] = None
-
-        return response_data
+            return response_data, prompt
+
+        return response_data, None
+
+    def _match_faq(self, message, intent, entities, user_id):
+        """Réponse de la FAQ si le message en est assez proche, sinon None.
+
+        Un message porteur d'entités (montant, compte, durée...) demande une
+        opération : il suit le parcours correspondant. Le solde et les
+        transactions d'un client connecté se lisent dans ses comptes. Une
+        intention d'opération (« faire un virement », « demande de crédit »)
+        démarre son parcours, sauf si le message est une question
+        (« comment faire un virement ? », « quels documents pour un crédit ? »).
+        """
+        if entities or (user_id and intent in DATA_INTENTS):
+            return None
+        if intent in ACTION_INTENTS and not _is_question(message):
+            return None
+        match = self.faq_index.search(message)
+        if match is None or match[1] < self.faq_threshold:
+            return None
+        answer, score, question = match
+        self.intent_cascade.record_faq()
+        return {
+            'response': answer,
+            'intent': 'faq',
+            'entities': {},
+            'action_required': False,
+            'confidence': score,
+            'intent_tier': 'faq',
+            'faq_question': question
+        }
 
     def _handle_transfer_flow(self, user_id, state):
         if not user_id:
@@ -247,6 +429,7 @@ Réponds de manière naturelle et utile aux demandes des clients."""
         
         if state["entities"].get("confirmation") == "oui":
             result = perform_deposit(
+                user_id,
                 state["entities"]["to_account_id"],
                 state["entities"]["montant"]
             )
@@ -290,6 +473,7 @@ Réponds de manière naturelle et utile aux demandes des clients."""
         
         if state["entities"].get("confirmation") == "oui":
             result = perform_withdrawal(
+                user_id,
                 state["entities"]["from_account_id"],
                 state["entities"]["montant"]
             )
@@ -305,124 +489,20 @@ Réponds de manière naturelle et utile aux demandes des clients."""
             return {"response": "Retrait annulé. N'hésitez pas si vous avez d'autres questions.", "intent": "retrait", "entities": {}, "action_required": False}
 
     def _get_user_context(self, user_id):
-        """Récupère le contexte utilisateur depuis la base de données"""
+        """Contexte utilisateur pour le prompt, servi depuis le cache des instantanés"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute("SELECT username, full_name FROM users WHERE user_id = %s", (user_id,))
-            user = cursor.fetchone()
-            
-            if not user:
-                return "Utilisateur non trouvé"
-            
-            cursor.execute("""
-                SELECT account_number, account_label, current_balance, account_type 
-                FROM accounts WHERE user_id = %s
-            """, (user_id,))
-            accounts = cursor.fetchall()
-            
-            cursor.execute("""
-                SELECT t.description, t.amount, t.debit_credit_indicator, t.transaction_date,
-                       a.account_label
-                FROM transactions t
-                JOIN accounts a ON t.account_id = a.account_id
-                WHERE a.user_id = %s
-                ORDER BY t.transaction_date DESC
-                LIMIT 5
-            """, (user_id,))
-            transactions = cursor.fetchall()
-            
-            conn.close()
-            
-            context = f"Client: {user['full_name']} ({user['username']})\n\n"
-            
-            context += "COMPTES:\n"
-            total_balance = 0
-            for account in accounts:
-                context += f"- {account['account_label']} ({account['account_number']}): {account['current_balance']:.3f} TND\n"
-                total_balance += account['current_balance']
-            
-            context += f"\nSOLDE TOTAL: {total_balance:.3f} TND\n"
-            
-            context += "\nDERNIÈRES TRANSACTIONS:\n"
-            for trans in transactions:
-                sign = "+" if trans['debit_credit_indicator'] == 'C' else "-"
-                context += f"- {trans['transaction_date']}: {sign}{trans['amount']:.3f} TND - {trans['description']}\n"
-            
-            return context
-            
+            return user_context_cache.get_context(user_id)
         except Exception as e:
             print(f"Erreur contexte utilisateur: {e}")
             return "Contexte utilisateur non disponible"
 
-    def _analyze_intent(self, message):
-        """Analyse l'intention du message avec des mots-clés"""
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ['solde', 'combien', 'argent', 'compte']):
-            return 'consultation_solde'
-        elif any(word in message_lower for word in ['transaction', 'mouvement', 'historique', 'opération']):
-            return 'consultation_transactions'
-        elif any(word in message_lower for word in ['virement', 'virer', 'transférer', 'envoyer']):
-            return 'virement'
-        elif any(word in message_lower for word in ['crédit', 'prêt', 'emprunt', 'financement']):
-            return 'demande_credit'
-        elif any(word in message_lower for word in ["simulation", "simuler"]):
-            return "simulation_credit"
-        elif any(word in message_lower for word in ["depot", "déposer", "verser"]):
-            return "depot"
-        elif any(word in message_lower for word in ["retrait", "retirer"]):
-            return "retrait"
-        elif any(word in message_lower for word in ["aide", "help", "assistance", "problème"]):
-            return 'assistance'
-        elif any(word in message_lower for word in ['bonjour', 'salut', 'hello', 'bonsoir']):
-            return 'salutation'
-        else:
-            return 'conversation_generale'
+    def _analyze_intent(self, message, pending_flow=False):
+        """Analyse l'intention du message par niveaux : (intention, confiance, niveau)"""
+        return self.intent_cascade.classify(message, pending_flow=pending_flow)
 
     def _extract_entities(self, message):
-        """Extrait les entités du message"""
-        entities = {}
-        
-        # Extraction des montants
-        montant_pattern = r'(\d+(?:[.,]\d+)?)\s*(?:tnd|dinars?|dt)?'
-        montants = re.findall(montant_pattern, message.lower())
-        if montants:
-            entities['montant'] = float(montants[0].replace(',', '.'))
-        
-        # Extraction des durées en années
-        duree_pattern = r'(\d+)\s*(?:ans?|années?)'
-        durees = re.findall(duree_pattern, message.lower())
-        if durees:
-            entities['duree_annees'] = int(durees[0])
-        
-        # Extraction des noms de bénéficiaires
-        nom_pattern = r'(?:à|pour|vers)\s+([A-Za-z\s]+?)(?:\s|$|,|\.|!|\?|\d)'
-        noms = re.findall(nom_pattern, message)
-        if noms:
-            entities['beneficiaire'] = noms[0].strip()
-        
-        # Extraction des numéros de compte source (ID)
-        account_id_pattern = r'(?:compte|id)\s*(\d+)'
-        account_ids = re.findall(account_id_pattern, message.lower())
-        if account_ids:
-            entities['from_account_id'] = int(account_ids[0])
-            entities['to_account_id'] = int(account_ids[0]) # Pour le dépôt
-        
-        # Extraction des numéros de compte de destination
-        to_account_number_pattern = r'(?:numéro de compte|compte)\s*(\d{8,})'
-        to_account_numbers = re.findall(to_account_number_pattern, message.lower())
-        if to_account_numbers:
-            entities['to_account_number'] = to_account_numbers[0]
-        
-        # Extraction des confirmations
-        if any(word in message.lower() for word in ['oui', 'confirme', 'ok', 'valider']):
-            entities['confirmation'] = 'oui'
-        elif any(word in message.lower() for word in ['non', 'annuler', 'stop']):
-            entities['confirmation'] = 'non'
-        
-        return entities
+        """Extrait les entités du message (montant, durée, comptes, bénéficiaire, confirmation)"""
+        return extract_entities(message)
 
     def _enhance_response_with_data(self, base_response, data, intent):
         """Améliore la réponse avec les données utilisateur"""
@@ -438,6 +518,17 @@ Réponds de manière naturelle et utile aux demandes des clients."""
                 response += f"• {account['account_label']} ({account['account_number']}): {account['current_balance']:.3f} TND\n"
             response += "\nPour voir les transactions d'un compte spécifique, indiquez-moi l'ID du compte."
             return response
+        elif intent == 'depenses' and data.get('success'):
+            if not data['months']:
+                return "📉 Aucune opération enregistrée sur vos comptes ces deux derniers mois."
+            response = "📉 Vos dépenses, tous comptes confondus :\n\n"
+            for month in reversed(data['months']):
+                response += f"• {month['month']}: {month['debits']:.3f} TND dépensés, {month['credits']:.3f} TND reçus\n"
+                top = sorted(month['by_type'].items(), key=lambda item: item[1]['debits'], reverse=True)[:3]
+                for transaction_type, totals in top:
+                    if totals['debits'] > 0:
+                        response += f"   - {transaction_type}: {totals['debits']:.3f} TND\n"
+            return response
         else:
             return base_response or "Je n'ai pas pu récupérer les informations demandées."
 
@@ -446,6 +537,7 @@ Réponds de manière naturelle et utile aux demandes des clients."""
         return [
             "Quel est le solde de mon compte courant ?",
             "Affiche mes dernières transactions",
+            "Combien ai-je dépensé ce mois-ci ?",
             "Effectue un virement de 1000 TND à Ahmed Ben Salah",
             "Simule un crédit de 50000 TND sur 7 ans",
             "Déposer 200 TND sur mon compte épargne",
@@ -455,5 +547,10 @@ Réponds de manière naturelle et utile aux demandes des clients."""
             "Aide-moi à comprendre mes frais bancaires"
         ]
 
+def _is_question(message):
+    """Message formulé comme une question d'information (mot interrogatif en tête)"""
+    words = fold_text(message).replace("'", " ").split()
+    return bool(words) and words[0] in QUESTION_WORDS
+
 # Instance globale
 chatbot_handler = ChatbotHandler()
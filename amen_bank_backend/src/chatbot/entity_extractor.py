@@ -0,0 +1,129 @@
+import re
+from collections import namedtuple
+from src.chatbot.text_utils import fold_text
+
+# Entité repérée dans le message : type, position dans le texte d'origine et valeur
+Span = namedtuple('Span', ['kind', 'start', 'end', 'value'])
+
+# Mots qui ne peuvent pas faire partie d'un nom de bénéficiaire
+# ("pour un crédit", "vers le compte 3", "à Ahmed sur le compte ...")
+BENEFICIARY_STOPWORDS = frozenset([
+    'le', 'la', 'les', 'l', 'un', 'une', 'des', 'du', 'de', 'd',
+    'mon', 'ma', 'mes', 'ton', 'ta', 'tes', 'son', 'sa', 'ses',
+    'notre', 'nos', 'votre', 'vos', 'leur', 'leurs', 'ce', 'cet', 'cette',
+    'moi', 'toi', 'lui', 'elle', 'nous', 'vous', 'eux', 'partir',
+    'compte', 'rib', 'id', 'numero', 'sur', 'depuis', 'avec', 'et', 'ou', 'en', 'par',
+    'tnd', 'dt', 'dinar', 'dinars', 'millime', 'millimes', 'an', 'ans', 'annee', 'annees', 'mois',
+    'oui', 'non', 'ok', 'merci', 'svp', 'stp'
+])
+MAX_BENEFICIARY_WORDS = 4
+
+# Alternatives par ordre de priorité : à une même position, la première qui
+# correspond l'emporte, et ce qu'elle couvre n'est plus disponible pour les
+# suivantes. Le texte analysé est en minuscules et sans accents ; la limite
+# de mot et le premier chiffre sont testés une seule fois pour toutes les
+# alternatives numériques.
+_ENTITY_PATTERN = re.compile(r"""
+\b(?:
+    (?=\d)(?:
+        # RIB (20 chiffres, éventuellement groupés) ou numéro de compte de 8 chiffres et plus
+        (?P<account_number>\d{2}\s\d{3}\s\d{13}\s\d{2}|\d{8,})\b
+        # Durée : "7 ans", "10 annees"
+      | (?P<duration>\d{1,3})\s*(?:ans?|annees?)\b
+        # Pourcentage (taux) : repéré pour ne pas être pris pour un montant
+      | (?P<percent>\d+(?:[.,]\d+)?)\s*%
+        # Montant, avec séparateur de milliers par espace et devise facultatifs
+      | (?P<amount>\d{1,3}(?:[ \u00a0\u202f]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?)
+          (?:\s*(?P<currency>tnd|dinars?|dt)\b)?
+    )
+    # Identifiant de compte : "compte 2", "compte n° 2", "id 2"
+  | (?:compte|id)\s*(?:n[o°]?\.?\s*|\#\s*)?(?P<account_id>\d{1,7})\b(?!\s*(?:tnd|dinars?|dt)\b)
+    # Confirmation ou refus
+  | (?P<yes>oui|ok|d'accord|confirmer?|confirmez|confirme|valider?|valide)\b
+  | (?P<no>non|annuler?|annule|stop)\b
+    # Bénéficiaire : seule la préposition est consommée, le nom reste visible
+    # pour les autres alternatives ("vers compte 12345678")
+  | (?:a|pour|vers)\s+(?=(?P<beneficiary>[a-z][a-z'-]*(?:\s+[a-z][a-z'-]*){0,3}))
+)
+""", re.VERBOSE)
+
+
+def _to_number(text):
+    return float("".join(text.split()).replace(',', '.'))
+
+
+def _beneficiary_name(message, start, candidate):
+    """Nom du bénéficiaire parmi les mots candidats, coupé au premier mot vide"""
+    end = 0
+    for count, word in enumerate(candidate.split()):
+        if word in BENEFICIARY_STOPWORDS or count == MAX_BENEFICIARY_WORDS:
+            break
+        end = candidate.index(word, end) + len(word)
+    if not end:
+        return None
+    # Le texte plié garde les positions : le nom est renvoyé tel qu'écrit par le client
+    return message[start:start + end]
+
+
+def extract_spans(message):
+    """Entités du message, dans l'ordre d'apparition, sans chevauchement"""
+    folded = fold_text(message)
+    spans = []
+    for match in _ENTITY_PATTERN.finditer(folded):
+        kind = match.lastgroup
+        if kind == 'currency':
+            kind = 'amount'
+        if kind == 'beneficiary':
+            start = match.start(kind)
+            # Sans accent, « a » est le plus souvent le verbe (« le compte ... a reçu 300 ») :
+            # il n'introduit un bénéficiaire que devant un nom écrit avec une majuscule
+            if message[match.start()] in 'aA' and not message[start].isupper():
+                continue
+            name = _beneficiary_name(message, start, match.group(kind))
+            if name:
+                spans.append(Span('beneficiary', start, start + len(name), name))
+        elif kind == 'account_number':
+            spans.append(Span(kind, match.start(kind), match.end(kind), "".join(match.group(kind).split())))
+        elif kind == 'account_id' or kind == 'duration':
+            spans.append(Span(kind, match.start(kind), match.end(kind), int(match.group(kind))))
+        elif kind == 'amount':
+            currency = match.group('currency')
+            value = (_to_number(match.group('amount')), bool(currency))
+            spans.append(Span(kind, match.start(), match.end(), value))
+        elif kind == 'yes' or kind == 'no':
+            spans.append(Span('confirmation', match.start(), match.end(), 'oui' if kind == 'yes' else 'non'))
+    return spans
+
+
+def extract_entities(message):
+    """Entités au format attendu par les parcours du chatbot.
+
+    Montant : le premier accompagné d'une devise, sinon le premier nombre
+    libre ; les identifiants et numéros de compte, durées et pourcentages
+    n'en sont jamais. Avec deux identifiants de compte, le premier est la
+    source et le second la destination ; avec un seul, il sert aux deux.
+    """
+    entities = {}
+    account_ids = []
+    amounts = []
+    for span in extract_spans(message):
+        if span.kind == 'amount':
+            amounts.append(span.value)
+        elif span.kind == 'account_id':
+            account_ids.append(span.value)
+        elif span.kind == 'duration':
+            entities.setdefault('duree_annees', span.value)
+        elif span.kind == 'account_number':
+            entities.setdefault('to_account_number', span.value)
+        elif span.kind == 'beneficiary':
+            entities.setdefault('beneficiaire', span.value)
+        elif span.kind == 'confirmation':
+            entities.setdefault('confirmation', span.value)
+
+    if amounts:
+        with_currency = [value for value, has_currency in amounts if has_currency]
+        entities['montant'] = with_currency[0] if with_currency else amounts[0][0]
+    if account_ids:
+        entities['from_account_id'] = account_ids[0]
+        entities['to_account_id'] = account_ids[-1]
+    return entities
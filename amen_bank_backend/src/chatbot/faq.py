@@ -0,0 +1,78 @@
+# Questions fréquentes, servies par /api/chat/faq et utilisées comme réponses de repli
+FAQ_ENTRIES = [
+    {
+        'question': 'Quels sont vos taux de crédit en dinars ?',
+        'answer': 'Nos taux de crédit varient selon le type :\n• Crédit Personnel : 6.5% à 8.5%\n• Crédit Immobilier : 5.0% à 7.0%\n• Crédit Auto : 6.0% à 8.0%\n\nPour une simulation personnalisée, demandez-moi de simuler un crédit.'
+    },
+    {
+        'question': 'Quels documents sont nécessaires pour un prêt ?',
+        'answer': 'Pour une demande de crédit, vous devez fournir :\n• Pièce d\'identité\n• Justificatifs de revenus (3 derniers bulletins de salaire)\n• Relevés bancaires (3 derniers mois)\n• Justificatif de domicile\n• Selon le projet : devis, compromis de vente, etc.'
+    },
+    {
+        'question': 'Comment effectuer un virement ?',
+        'answer': 'Pour effectuer un virement, dites-moi :\n• Le montant à transférer\n• Le nom du bénéficiaire\n• Le numéro de compte de destination\n\nJe vous guiderai ensuite pour la validation sécurisée.'
+    },
+    {
+        'question': 'Comment consulter mon solde ?',
+        'answer': 'Demandez-moi simplement :\n• "Quel est le solde de mon compte ?"\n• "Affiche mon solde"\n• "Combien j\'ai sur mon compte ?"\n\nJe vous afficherai le solde de tous vos comptes.'
+    },
+    {
+        'question': 'Comment voir mes transactions ?',
+        'answer': 'Pour consulter vos transactions, demandez :\n• "Affiche mes transactions"\n• "Historique de mes opérations"\n• "Dernières transactions"\n\nJe vous montrerai vos opérations récentes.'
+    }
+]
+
+# Réponses rédigées par l'équipe, avec les formulations de question qu'elles couvrent.
+# Indexées avec les questions fréquentes (voir faq_index) pour répondre sans génération.
+CURATED_ANSWERS = [
+    {
+        'questions': [
+            'Quels documents pour un crédit ?',
+            'Quelles pièces fournir pour un dossier de prêt ?',
+            'Quels justificatifs pour une demande de financement ?'
+        ],
+        'answer': FAQ_ENTRIES[1]['answer']
+    },
+    {
+        'questions': [
+            'Quel est le taux d\'intérêt de vos prêts ?',
+            'Taux du crédit immobilier',
+            'Taux du crédit auto',
+            'Combien coûte un crédit personnel ?'
+        ],
+        'answer': FAQ_ENTRIES[0]['answer']
+    },
+    {
+        'questions': [
+            'Comment faire un virement permanent ?',
+            'Programmer un virement mensuel automatique',
+            'Mettre en place un virement récurrent'
+        ],
+        'answer': 'Un virement permanent s\'exécute automatiquement à la fréquence choisie (mensuelle, trimestrielle...).\n• Depuis la page Virements, cochez « Virement programmé »\n• Choisissez la fréquence et la date de première exécution\n• Validez : vous pourrez le modifier ou l\'annuler à tout moment.'
+    },
+    {
+        'questions': [
+            'Quels sont vos frais bancaires ?',
+            'Combien coûte la tenue de compte ?',
+            'Aide-moi à comprendre mes frais bancaires',
+            'Pourquoi ai-je des frais sur mon relevé ?'
+        ],
+        'answer': 'Les frais bancaires dépendent de votre formule de compte :\n• Tenue de compte : prélevée chaque trimestre\n• Carte bancaire : cotisation annuelle\n• Virements en ligne : gratuits entre comptes Amen Bank\n\nLe détail figure dans les conditions tarifaires, disponibles en agence ou auprès de votre conseiller.'
+    },
+    {
+        'questions': [
+            'Ma carte est perdue ou volée',
+            'Comment faire opposition sur ma carte bancaire ?',
+            'Bloquer ma carte'
+        ],
+        'answer': '🔒 En cas de perte ou de vol de votre carte, faites opposition immédiatement en appelant le service client Amen Bank, disponible 24h/24, puis confirmez par écrit auprès de votre agence. Une nouvelle carte vous sera délivrée.'
+    },
+    {
+        'questions': [
+            'Comment ouvrir un compte ?',
+            'Ouvrir un compte épargne',
+            'Quels documents pour ouvrir un compte ?'
+        ],
+        'answer': 'Pour ouvrir un compte, présentez-vous en agence avec :\n• Votre pièce d\'identité\n• Un justificatif de domicile récent\n• Un justificatif de revenus\n\nUn compte épargne peut être ouvert en complément de votre compte courant.'
+    }
+]
@@ -0,0 +1,112 @@
+import math
+import os
+import re
+from collections import Counter
+from src.chatbot.faq import FAQ_ENTRIES, CURATED_ANSWERS
+from src.chatbot.text_utils import fold_text
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Mots vides (sans accents) : ils ne disent rien de la question posée
+STOP_WORDS = frozenset([
+    'a', 'au', 'aux', 'avec', 'ce', 'ces', 'comment', 'd', 'dans', 'de', 'des', 'du', 'en', 'est', 'et',
+    'faire', 'faut', 'il', 'j', 'je', 'l', 'la', 'le', 'les', 'ma', 'me', 'mes', 'moi', 'mon', 'n', 'ne',
+    'nos', 'notre', 'on', 'ou', 'par', 'pas', 'pour', 'qu', 'quel', 'quelle', 'quelles', 'quels', 'que',
+    'qui', 's', 'sa', 'se', 'ses', 'son', 'sont', 'sur', 't', 'ta', 'te', 'tes', 'ton', 'tu', 'un', 'une',
+    'vos', 'votre', 'vous', 'y', 'ai', 'as', 'avez', 'suis', 'svp', 'merci', 'bonjour'
+])
+
+
+def _stem(token):
+    """Racinisation légère : pluriel et féminin ('credits' -> 'credit', 'perdue' -> 'perdu')"""
+    if len(token) > 3 and token[-1] in 'sx':
+        token = token[:-1]
+    if len(token) > 3 and token[-1] == 'e':
+        token = token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [_stem(token) for token in _TOKEN.findall(fold_text(text)) if token not in STOP_WORDS]
+
+
+class FAQIndex:
+    """Index BM25 en mémoire sur les questions fréquentes et réponses rédigées.
+
+    Chaque formulation de question est un document qui renvoie vers sa
+    réponse. Le score BM25 est normalisé entre 0 et 1 : il est divisé par le
+    score qu'obtiendrait un document contenant une fois chacun des mots de la
+    question (les mots absents de l'index comptent avec l'IDF maximal). Un
+    score proche de 1 signifie que tous les mots significatifs de la question
+    se retrouvent dans une même formulation.
+    """
+
+    def __init__(self, entries, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.answers = []
+        self.documents = []
+        for entry in entries:
+            answer_id = len(self.answers)
+            self.answers.append(entry['answer'])
+            for question in entry['questions']:
+                self.documents.append((answer_id, question))
+
+        self._postings = {}
+        self._lengths = []
+        for doc_id, (_, question) in enumerate(self.documents):
+            tokens = tokenize(question)
+            self._lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                self._postings.setdefault(token, []).append((doc_id, count))
+
+        count = len(self.documents)
+        self._avg_length = sum(self._lengths) / count if count else 0.0
+        self._idf = {
+            token: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for token, postings in self._postings.items()
+        }
+        # IDF d'un mot inconnu de l'index
+        self._max_idf = math.log(1 + (count + 0.5) / 0.5)
+
+    def search(self, text):
+        """Meilleure réponse pour `text` : (réponse, score normalisé, question indexée), ou None"""
+        tokens = set(tokenize(text))
+        if not tokens:
+            return None
+
+        scores = {}
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            idf = self._idf[token]
+            for doc_id, count in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / self._avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        if not scores:
+            return None
+
+        doc_id = max(scores, key=scores.get)
+        ideal = sum(self._idf.get(token, self._max_idf) for token in tokens)
+        score = min(scores[doc_id] / ideal, 1.0)
+        answer_id, question = self.documents[doc_id]
+        return self.answers[answer_id], round(score, 3), question
+
+    def answer(self, text, threshold):
+        """Réponse si le score atteint `threshold`, sinon None"""
+        match = self.search(text)
+        if match is None or match[1] < threshold:
+            return None
+        return match[0]
+
+
+def build_faq_index():
+    entries = [{'questions': [entry['question']], 'answer': entry['answer']} for entry in FAQ_ENTRIES]
+    return FAQIndex(entries + CURATED_ANSWERS)
+
+
+# Construit au démarrage : quelques dizaines de formulations, indexées en quelques millisecondes.
+# FAQ_ANSWER_THRESHOLD : score à partir duquel la réponse est servie sans génération.
+faq_index = build_faq_index()
+FAQ_ANSWER_THRESHOLD = float(os.environ.get('FAQ_ANSWER_THRESHOLD', 0.5))
@@ -0,0 +1,288 @@
+import copy
+import os
+import queue
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from src.chatbot.batching import MicroBatchScheduler
+
+# Silence maximal du modèle entre deux morceaux d'une réponse en continu
+STREAM_STALL_SECONDS = 60
+
+
+class ModelNotReady(Exception):
+    """Le modèle de génération n'est pas encore chargé"""
+
+
+class GenerationTimeout(Exception):
+    """La génération n'a pas abouti avant le délai imparti"""
+
+
+class _StreamRequest:
+    """Réponse en continu confiée au planificateur : prompt, file de sortie des morceaux
+    et signal d'arrêt posé quand le lecteur abandonne"""
+
+    def __init__(self, prompt, streamer):
+        self.prompt = prompt
+        self.streamer = streamer
+        self.error = None
+        self.cancelled = threading.Event()
+
+
+class GenerationModel:
+    """Modèle de génération de texte chargé paresseusement.
+
+    L'import de transformers/torch et le chargement des poids se font dans
+    un thread d'arrière-plan (`warm_up`) : le reste de l'application répond
+    pendant ce temps, et `generate` lève ModelNotReady tant que le modèle
+    n'est pas prêt.
+
+    Les appels concurrents à `generate` sont regroupés par un
+    MicroBatchScheduler et passent ensemble dans le modèle, en un lot
+    complété par padding (GENERATION_MAX_BATCH, GENERATION_BATCH_WAIT_MS).
+    La file d'attente est bornée (GENERATION_MAX_QUEUE) : au-delà, `generate`
+    lève QueueFull au lieu de faire patienter la requête. `stream` a son
+    propre planificateur et son propre thread (GENERATION_STREAM_MAX_QUEUE) :
+    une longue réponse en continu ne retarde pas les lots, et elle s'arrête
+    dès que son lecteur abandonne (déconnexion, délai dépassé).
+
+    `prefix` (le prompt système, identique pour toutes les requêtes) est
+    encodé une seule fois au chargement : son cache clé/valeur est copié
+    pour chaque génération, et seule la partie propre à la requête est
+    encodée. Les prompts passés à `generate`/`stream` sont donc la suite
+    du préfixe, et seul le texte généré est renvoyé.
+    """
+
+    NOT_LOADED = 'not_loaded'
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, model_name="distilgpt2", max_new_tokens=100, prefix=None):
+        self.model_name = model_name
+        self.max_new_tokens = max_new_tokens
+        self.prefix = prefix
+        self.state = self.NOT_LOADED
+        self.error = None
+        self.load_seconds = None
+        self.tokenizer = None
+        self.model = None
+        self._prefix_ids = None
+        self._prefix_cache = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self.scheduler = MicroBatchScheduler(
+            self._run_batch,
+            max_batch_size=int(os.environ.get('GENERATION_MAX_BATCH', 8)),
+            max_wait_ms=float(os.environ.get('GENERATION_BATCH_WAIT_MS', 20)),
+            max_queue=int(os.environ.get('GENERATION_MAX_QUEUE', 32)),
+            name="chatbot-generation"
+        )
+        # Une réponse en continu à la fois, sur son propre thread
+        self.stream_scheduler = MicroBatchScheduler(
+            self._run_streams,
+            max_batch_size=1,
+            max_wait_ms=0,
+            max_queue=int(os.environ.get('GENERATION_STREAM_MAX_QUEUE', 8)),
+            name="chatbot-generation-stream"
+        )
+
+    def warm_up(self, background=True):
+        """Démarrer le chargement s'il n'a pas déjà eu lieu"""
+        with self._lock:
+            if self.state in (self.LOADING, self.READY):
+                return
+            self.state = self.LOADING
+            self.error = None
+            if background:
+                self._thread = threading.Thread(target=self._load, name="chatbot-model-warmup", daemon=True)
+                self._thread.start()
+                return
+        self._load()
+
+    def _load(self):
+        start = time.monotonic()
+        try:
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer, DynamicCache
+
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            model = AutoModelForCausalLM.from_pretrained(self.model_name)
+            model.eval()
+
+            # GPT-2 n'a pas de jeton de padding : nécessaire pour générer par lots.
+            # Padding et troncature à gauche pour garder la fin du prompt, juste avant la réponse.
+            tokenizer.padding_side = "left"
+            tokenizer.truncation_side = "left"
+            if tokenizer.pad_token_id is None:
+                tokenizer.pad_token_id = tokenizer.eos_token_id
+            model.generation_config.pad_token_id = tokenizer.pad_token_id
+
+            prefix_ids = None
+            prefix_cache = None
+            if self.prefix:
+                prefix_ids = tokenizer(self.prefix, return_tensors="pt").input_ids
+                prefix_cache = DynamicCache()
+                with torch.no_grad():
+                    model(input_ids=prefix_ids, past_key_values=prefix_cache, use_cache=True)
+        except Exception as e:
+            print(f"Erreur lors du chargement du modèle {self.model_name}: {e}")
+            with self._lock:
+                self.state = self.FAILED
+                self.error = str(e)
+            return
+
+        with self._lock:
+            self.tokenizer = tokenizer
+            self.model = model
+            self._prefix_ids = prefix_ids
+            self._prefix_cache = prefix_cache
+            self.load_seconds = round(time.monotonic() - start, 3)
+            self.state = self.READY
+        print(f"Modèle {self.model_name} chargé en {self.load_seconds}s")
+
+    def is_ready(self):
+        return self.state == self.READY
+
+    def wait_until_ready(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.is_ready()
+
+    def _prepare_inputs(self, prompts):
+        """Entrées de generate() : préfixe en cache + suite propre à chaque requête"""
+        import torch
+
+        prefix_length = self._prefix_ids.shape[1] if self._prefix_ids is not None else 0
+        encoded = self.tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.tokenizer.model_max_length - prefix_length - self.max_new_tokens
+        )
+        inputs = {"input_ids": encoded.input_ids, "attention_mask": encoded.attention_mask}
+
+        if self._prefix_cache is not None:
+            batch_size = len(prompts)
+            # Le padding se retrouve entre le préfixe et la suite : il est masqué et
+            # les positions sont recalculées à partir du masque d'attention.
+            inputs["input_ids"] = torch.cat([self._prefix_ids.expand(batch_size, -1), encoded.input_ids], dim=1)
+            inputs["attention_mask"] = torch.cat(
+                [torch.ones((batch_size, prefix_length), dtype=encoded.attention_mask.dtype), encoded.attention_mask],
+                dim=1
+            )
+            # generate() complète le cache en place : chaque appel travaille sur sa copie
+            cache = copy.deepcopy(self._prefix_cache)
+            if batch_size > 1:
+                cache.batch_repeat_interleave(batch_size)
+            inputs["past_key_values"] = cache
+
+        return inputs
+
+    def generate(self, prompt, timeout=None):
+        """Texte généré à la suite de `prompt` (sans le prompt).
+
+        Lève QueueFull si la file est pleine, et GenerationTimeout si le
+        texte n'est pas prêt après `timeout` secondes (attente en file
+        comprise) ; la demande est alors annulée si elle n'a pas démarré.
+        """
+        if not self.is_ready():
+            raise ModelNotReady(self.state)
+        future = self.scheduler.submit(prompt)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.scheduler.record_timeout()
+            raise GenerationTimeout(f"pas de réponse du modèle après {timeout:.1f}s")
+
+    def stream(self, prompt, timeout=None):
+        """Générer la suite de `prompt` morceau par morceau, au rythme du modèle.
+
+        Lève QueueFull si la file est pleine, et GenerationTimeout si le
+        premier morceau n'arrive pas dans les `timeout` secondes (attente en
+        file comprise) ou si le modèle reste ensuite muet plus de
+        STREAM_STALL_SECONDS. Fermer le générateur avant la fin (client
+        déconnecté) retire la demande de la file ou arrête sa génération.
+        """
+        if not self.is_ready():
+            raise ModelNotReady(self.state)
+        from transformers import TextIteratorStreamer
+
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout)
+        request = _StreamRequest(prompt, streamer)
+        future = self.stream_scheduler.submit(request)
+        finished = False
+        try:
+            for text in streamer:
+                streamer.timeout = STREAM_STALL_SECONDS
+                if text:
+                    yield text
+            finished = True
+        except queue.Empty:
+            self.stream_scheduler.record_timeout()
+            raise GenerationTimeout(f"pas de réponse du modèle après {streamer.timeout or 0:.1f}s")
+        finally:
+            if not finished:
+                # Pas encore démarrée : retirée de la file ; en cours : arrêtée au prochain jeton
+                future.cancel()
+                request.cancelled.set()
+        if request.error is not None:
+            raise request.error
+
+    def _run_batch(self, prompts):
+        return self.generate_batch(prompts)
+
+    def _run_streams(self, requests):
+        for request in requests:
+            self._generate_stream(request)
+        return [None] * len(requests)
+
+    def _generate_stream(self, request):
+        try:
+            import torch
+            from transformers import StoppingCriteria, StoppingCriteriaList
+
+            class ReaderGone(StoppingCriteria):
+                """Arrêter la génération dès que le lecteur a abandonné"""
+
+                def __call__(self, input_ids, scores, **kwargs):
+                    return torch.full((input_ids.shape[0],), request.cancelled.is_set(), dtype=torch.bool, device=input_ids.device)
+
+            inputs = self._prepare_inputs([request.prompt])
+            self.model.generate(
+                **inputs,
+                streamer=request.streamer,
+                stopping_criteria=StoppingCriteriaList([ReaderGone()]),
+                max_new_tokens=self.max_new_tokens,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+        except Exception as e:
+            # Débloquer le lecteur, qui relève l'erreur
+            request.error = e
+            request.streamer.end()
+
+    def generate_batch(self, prompts):
+        """Générer la suite de plusieurs prompts en une seule passe du modèle"""
+        inputs = self._prepare_inputs(prompts)
+        output_ids = self.model.generate(
+            **inputs,
+            max_new_tokens=self.max_new_tokens,
+            pad_token_id=self.tokenizer.pad_token_id
+        )
+        # Ne décoder que les jetons générés : le prompt n'est jamais renvoyé
+        new_tokens = output_ids[:, inputs["input_ids"].shape[1]:]
+        return [text.strip() for text in self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
+
+    def status(self):
+        return {
+            "model": self.model_name,
+            "state": self.state,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "prefix_tokens": self._prefix_ids.shape[1] if self._prefix_ids is not None else 0,
+            "batching": self.scheduler.stats(),
+            "streaming": self.stream_scheduler.stats()
+        }
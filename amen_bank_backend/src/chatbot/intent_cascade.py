@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from src.chatbot.intent_engine import keyword_intent_engine, DEFAULT_INTENT
+
+# Réponses sans génération pour les intentions de politesse et d'aide
+CANNED_RESPONSES = {
+    'salutation': (
+        "Bonjour ! 👋 Je suis l'assistant d'Amen Bank. Je peux consulter vos soldes et vos "
+        "transactions, effectuer un virement, un dépôt ou un retrait, ou simuler un crédit. "
+        "Que souhaitez-vous faire ?"
+    ),
+    'au_revoir': "Merci d'avoir utilisé l'assistant Amen Bank. À bientôt ! 👋",
+    'assistance': (
+        "🏦 Voici ce que je peux faire pour vous :\n"
+        "• Consulter vos soldes : « Quel est mon solde ? »\n"
+        "• Afficher vos transactions : « Mes dernières transactions »\n"
+        "• Faire un virement : « Virer 100 TND à Ahmed Ben Salah »\n"
+        "• Déposer ou retirer : « Déposer 200 TND sur le compte 3 »\n"
+        "• Simuler ou demander un crédit : « Simule un crédit de 50000 TND sur 7 ans »\n"
+        "Pour toute autre question, un conseiller reste à votre disposition."
+    ),
+}
+
+
+class IntentCascade:
+    """Détection d'intention par niveaux, du moins coûteux au plus coûteux.
+
+    1. 'keywords' : moteur de mots-clés compilé (quelques microsecondes) ;
+    2. 'classifier' : classifieur TF-IDF, retenu si la probabilité de
+       l'intention atteint `prior_ratio` fois la probabilité a priori
+       (1 / nombre d'intentions) et dépasse d'au moins `margin` celle de la
+       suivante. Les probabilités sont tassées : un seul mot reconnu donne
+       moins de deux fois l'a priori, un mot inconnu exactement l'a priori ;
+    3. 'llm' : aucune intention reconnue, le message part en génération.
+
+    Quand un parcours attend une réponse (montant, compte, confirmation...),
+    le classifieur est sauté : le message est résolu au niveau 'flow' et
+    complète le parcours en cours.
+
+    Chaque niveau compte ses messages et le temps de détection ; le temps de
+    génération des messages envoyés au modèle est compté à part
+    (`record_generation`), comme les réponses servies par la FAQ
+    (`record_faq`).
+    """
+
+    TIERS = ('keywords', 'classifier', 'flow', 'llm')
+
+    def __init__(self, keyword_engine=None, classifier_factory=None, prior_ratio=1.6, margin=0.05):
+        self.keyword_engine = keyword_engine or keyword_intent_engine
+        self.classifier_factory = classifier_factory or _default_classifier
+        self.prior_ratio = prior_ratio
+        self.margin = margin
+        self._classifier = None
+        self._classifier_failed = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.load_seconds = None
+        self._hits = {tier: 0 for tier in self.TIERS}
+        self._seconds = {tier: 0.0 for tier in self.TIERS}
+        self._generations = 0
+        self._generation_seconds = 0.0
+        self._faq_answers = 0
+
+    @property
+    def classifier(self):
+        """Classifieur chargé au premier besoin (import de scikit-learn compris)"""
+        if self._classifier is None and not self._classifier_failed:
+            with self._load_lock:
+                if self._classifier is None and not self._classifier_failed:
+                    start = time.perf_counter()
+                    try:
+                        self._classifier = self.classifier_factory()
+                    except Exception as e:
+                        print(f"Classifieur d'intentions indisponible, niveau ignoré: {e}")
+                        self._classifier_failed = True
+                    self.load_seconds = round(time.perf_counter() - start, 3)
+        return self._classifier
+
+    def warm_up(self):
+        """Charger le classifieur en arrière-plan plutôt qu'au premier message"""
+        threading.Thread(target=lambda: self.classifier, name="intent-classifier-warmup", daemon=True).start()
+
+    def classify(self, message, pending_flow=False):
+        """Intention du message : (intention, confiance, niveau)"""
+        start = time.perf_counter()
+        intent, confidence = self.keyword_engine.classify(message)
+        elapsed = time.perf_counter() - start
+
+        if intent != DEFAULT_INTENT:
+            tier = 'keywords'
+        elif pending_flow:
+            tier = 'flow'
+        else:
+            tier = 'llm'
+            # Chargement éventuel hors mesure : il ne concerne que le premier message
+            classifier = self.classifier
+            if classifier is not None:
+                start = time.perf_counter()
+                threshold = self.prior_ratio / max(len(classifier.classes), 1)
+                labels, probabilities = classifier.predict_batch([message], min_confidence=threshold)
+                elapsed += time.perf_counter() - start
+                if labels[0] != 'unknown':
+                    second, best = sorted(probabilities[0])[-2:]
+                    if best - second >= self.margin:
+                        intent, confidence, tier = str(labels[0]), round(float(best), 3), 'classifier'
+
+        with self._lock:
+            self._hits[tier] += 1
+            self._seconds[tier] += elapsed
+        return intent, confidence, tier
+
+    def record_generation(self, seconds):
+        with self._lock:
+            self._generations += 1
+            self._generation_seconds += seconds
+
+    def record_faq(self):
+        with self._lock:
+            self._faq_answers += 1
+
+    def stats(self):
+        with self._lock:
+            total = sum(self._hits.values())
+            tiers = {
+                tier: {
+                    'hits': self._hits[tier],
+                    'hit_rate': round(self._hits[tier] / total, 3) if total else 0.0,
+                    'avg_ms': round(self._seconds[tier] / self._hits[tier] * 1000, 3) if self._hits[tier] else 0.0
+                }
+                for tier in self.TIERS
+            }
+            generations, generation_seconds = self._generations, self._generation_seconds
+            faq_answers = self._faq_answers
+        return {
+            'messages': total,
+            'prior_ratio': self.prior_ratio,
+            'margin': self.margin,
+            'classifier_loaded': self._classifier is not None,
+            'classifier_load_seconds': self.load_seconds,
+            'tiers': tiers,
+            'faq_answers': faq_answers,
+            'generation': {
+                'count': generations,
+                'avg_ms': round(generation_seconds / generations * 1000, 1) if generations else 0.0
+            }
+        }
+
+
+def _default_classifier():
+    from src.chatbot.intent_classifier import get_intent_classifier
+    return get_intent_classifier()
+
+
+# Instance partagée ; INTENT_CLASSIFIER_PRIOR_RATIO règle le seuil du classifieur (en multiple
+# de la probabilité a priori), INTENT_CLASSIFIER_MARGIN l'écart minimal avec la deuxième intention
+intent_cascade = IntentCascade(
+    prior_ratio=float(os.environ.get('INTENT_CLASSIFIER_PRIOR_RATIO', 1.6)),
+    margin=float(os.environ.get('INTENT_CLASSIFIER_MARGIN', 0.05))
+)
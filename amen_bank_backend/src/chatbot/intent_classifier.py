@@ -1,113 +1,223 @@
-import nltk
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import pickle
 import re
+import sys
+import threading
+import nltk
+import sklearn
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
-import pickle
-import os
 
-# Télécharger les ressources NLTK nécessaires
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+# Version du prétraitement : à incrémenter dès que preprocess_text change,
+# pour invalider les artefacts entraînés avec l'ancienne version
+PREPROCESS_VERSION = 2
+
+# En dessous de cette probabilité, l'intention prédite est 'unknown'
+MIN_CONFIDENCE = 0.3
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+DEFAULT_ARTIFACT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intent_classifier.pkl')
+
+# Mots vides français (liste du corpus NLTK 'stopwords'), utilisés quand le
+# corpus n'est pas installé localement : le démarrage ne télécharge jamais rien
+FRENCH_STOP_WORDS = (
+    'au', 'aux', 'avec', 'ce', 'ces', 'dans', 'de', 'des', 'du', 'elle', 'en', 'et', 'eux', 'il', 'ils',
+    'je', 'la', 'le', 'les', 'leur', 'lui', 'ma', 'mais', 'me', 'même', 'mes', 'moi', 'mon', 'ne', 'nos',
+    'notre', 'nous', 'on', 'ou', 'par', 'pas', 'pour', 'qu', 'que', 'qui', 'sa', 'se', 'ses', 'son', 'sur',
+    'ta', 'te', 'tes', 'toi', 'ton', 'tu', 'un', 'une', 'vos', 'votre', 'vous', 'c', 'd', 'j', 'l', 'à',
+    'm', 'n', 's', 't', 'y', 'été', 'étée', 'étées', 'étés', 'étant', 'étante', 'étants', 'étantes',
+    'suis', 'es', 'est', 'sommes', 'êtes', 'sont', 'serai', 'seras', 'sera', 'serons', 'serez', 'seront',
+    'serais', 'serait', 'serions', 'seriez', 'seraient', 'étais', 'était', 'étions', 'étiez', 'étaient',
+    'fus', 'fut', 'fûmes', 'fûtes', 'furent', 'sois', 'soit', 'soyons', 'soyez', 'soient', 'fusse',
+    'fusses', 'fût', 'fussions', 'fussiez', 'fussent', 'ayant', 'ayante', 'ayantes', 'ayants', 'eu',
+    'eue', 'eues', 'eus', 'ai', 'as', 'avons', 'avez', 'ont', 'aurai', 'auras', 'aura', 'aurons', 'aurez',
+    'auront', 'aurais', 'aurait', 'aurions', 'auriez', 'auraient', 'avais', 'avait', 'avions', 'aviez',
+    'avaient', 'eut', 'eûmes', 'eûtes', 'eurent', 'aie', 'aies', 'ait', 'ayons', 'ayez', 'aient',
+    'eusse', 'eusses', 'eût', 'eussions', 'eussiez', 'eussent'
+)
+
+# Corpus d'entraînement : exemples de phrases par intention
+INTENTS = {
+    'consultation_solde': [
+        'quel est le solde de mon compte',
+        'solde compte courant',
+        'combien j\'ai sur mon compte',
+        'affiche mon solde',
+        'solde actuel',
+        'balance compte',
+        'montant disponible',
+        'argent sur compte'
+    ],
+    'consultation_transactions': [
+        'affiche mes transactions',
+        'historique des opérations',
+        'dernières transactions',
+        'mouvements compte',
+        'liste des opérations',
+        'transactions récentes',
+        'voir mes opérations',
+        'historique bancaire'
+    ],
+    'virement': [
+        'effectuer un virement',
+        'faire un transfert',
+        'envoyer de l\'argent',
+        'virer de l\'argent',
+        'transfert bancaire',
+        'virement vers',
+        'payer quelqu\'un',
+        'transférer des fonds'
+    ],
+    'simulation_credit': [
+        'simuler un crédit',
+        'calculer mensualité',
+        'simulation prêt',
+        'combien pour un crédit',
+        'mensualité crédit',
+        'simulation emprunt',
+        'calculer crédit',
+        'prêt simulation'
+    ],
+    'demande_credit': [
+        'demander un crédit',
+        'faire une demande de prêt',
+        'solliciter un emprunt',
+        'demande de financement',
+        'crédit personnel',
+        'prêt bancaire',
+        'emprunt argent',
+        'financement projet'
+    ],
+    'assistance': [
+        'aide',
+        'besoin d\'aide',
+        'comment faire',
+        'assistance',
+        'support',
+        'renseignement',
+        'information',
+        'question'
+    ],
+    'salutation': [
+        'bonjour',
+        'salut',
+        'bonsoir',
+        'hello',
+        'coucou',
+        'hey',
+        'bonne journée',
+        'bonne soirée'
+    ],
+    'au_revoir': [
+        'au revoir',
+        'à bientôt',
+        'bye',
+        'salut',
+        'merci',
+        'bonne journée',
+        'à plus tard',
+        'tchao'
+    ]
+}
+
+
+def load_stop_words():
+    """Mots vides français : corpus NLTK s'il est installé, sinon la liste embarquée"""
+    try:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        return set(FRENCH_STOP_WORDS)
+    from nltk.corpus import stopwords
+    return set(stopwords.words('french'))
+
+
+def corpus_hash(intents, stop_words):
+    """Empreinte de tout ce qui détermine le modèle entraîné"""
+    payload = json.dumps(
+        {
+            'intents': intents,
+            'stop_words': sorted(stop_words),
+            'preprocess_version': PREPROCESS_VERSION,
+            'sklearn_version': sklearn.__version__
+        },
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
 
 class IntentClassifier:
-    def __init__(self):
+    """Classifieur d'intentions TF-IDF + Naive Bayes.
+
+    Le pipeline entraîné est sérialisé dans un artefact (voir `build`) avec
+    l'empreinte du corpus, des mots vides et de la version du prétraitement.
+    Au démarrage l'artefact est chargé tel quel ; le modèle n'est réentraîné
+    que s'il manque ou si son empreinte ne correspond plus au code
+    (`use_artifact=False` force l'entraînement, sans lire ni écrire l'artefact).
+    """
+
+    def __init__(self, artifact_path=None, intents=None, use_artifact=True):
         self.pipeline = None
-        self.intents = {
-            'consultation_solde': [
-                'quel est le solde de mon compte',
-                'solde compte courant',
-                'combien j\'ai sur mon compte',
-                'affiche mon solde',
-                'solde actuel',
-                'balance compte',
-                'montant disponible',
-                'argent sur compte'
-            ],
-            'consultation_transactions': [
-                'affiche mes transactions',
-                'historique des opérations',
-                'dernières transactions',
-                'mouvements compte',
-                'liste des opérations',
-                'transactions récentes',
-                'voir mes opérations',
-                'historique bancaire'
-            ],
-            'virement': [
-                'effectuer un virement',
-                'faire un transfert',
-                'envoyer de l\'argent',
-                'virer de l\'argent',
-                'transfert bancaire',
-                'virement vers',
-                'payer quelqu\'un',
-                'transférer des fonds'
-            ],
-            'simulation_credit': [
-                'simuler un crédit',
-                'calculer mensualité',
-                'simulation prêt',
-                'combien pour un crédit',
-                'mensualité crédit',
-                'simulation emprunt',
-                'calculer crédit',
-                'prêt simulation'
-            ],
-            'demande_credit': [
-                'demander un crédit',
-                'faire une demande de prêt',
-                'solliciter un emprunt',
-                'demande de financement',
-                'crédit personnel',
-                'prêt bancaire',
-                'emprunt argent',
-                'financement projet'
-            ],
-            'assistance': [
-                'aide',
-                'besoin d\'aide',
-                'comment faire',
-                'assistance',
-                'support',
-                'renseignement',
-                'information',
-                'question'
-            ],
-            'salutation': [
-                'bonjour',
-                'salut',
-                'bonsoir',
-                'hello',
-                'coucou',
-                'hey',
-                'bonne journée',
-                'bonne soirée'
-            ],
-            'au_revoir': [
-                'au revoir',
-                'à bientôt',
-                'bye',
-                'salut',
-                'merci',
-                'bonne journée',
-                'à plus tard',
-                'tchao'
-            ]
-        }
-        
-        self.stop_words = set(stopwords.words('french'))
+        self.intents = intents or INTENTS
+        self.stop_words = load_stop_words()
+        self.corpus_hash = corpus_hash(self.intents, self.stop_words)
+        self.artifact_path = artifact_path or os.environ.get('INTENT_CLASSIFIER_ARTIFACT', DEFAULT_ARTIFACT_PATH)
+        self.source = None
+
+        if use_artifact and self.load_artifact(self.artifact_path):
+            self.source = 'artifact'
+            return
+
         self.train_model()
+        self.source = 'trained'
+        if use_artifact:
+            self.save_artifact(self.artifact_path)
+
+    def load_artifact(self, path):
+        """Charger le pipeline sérialisé s'il correspond au corpus courant"""
+        try:
+            with open(path, 'rb') as artifact_file:
+                artifact = pickle.load(artifact_file)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Artefact du classifieur d'intentions illisible ({path}): {e}")
+            return False
+
+        if artifact.get('corpus_hash') != self.corpus_hash:
+            print(f"Artefact du classifieur d'intentions obsolète ({path}) : réentraînement")
+            return False
+
+        self.pipeline = artifact['pipeline']
+        return True
+
+    def save_artifact(self, path):
+        """Sérialiser le pipeline entraîné ; écriture atomique pour les workers concurrents"""
+        artifact = {
+            'corpus_hash': self.corpus_hash,
+            'preprocess_version': PREPROCESS_VERSION,
+            'sklearn_version': sklearn.__version__,
+            'intents': sorted(self.intents),
+            'pipeline': self.pipeline
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as artifact_file:
+                pickle.dump(artifact, artifact_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Impossible d'enregistrer l'artefact du classifieur d'intentions ({path}): {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        return True
     
     def preprocess_text(self, text):
         """Préprocesser le texte"""
@@ -115,10 +225,10 @@ class IntentClassifier:
         text = text.lower()
         
         # Supprimer la ponctuation
-        text = re.sub(r'[^\w\s]', ' ', text)
+        text = _PUNCTUATION.sub(' ', text)
         
-        # Tokeniser
-        tokens = word_tokenize(text, language='french')
+        # Tokeniser (la ponctuation est déjà retirée : un découpage sur les blancs suffit)
+        tokens = text.split()
         
         # Supprimer les mots vides
         tokens = [token for token in tokens if token not in self.stop_words and len(token) > 2]
@@ -145,20 +255,37 @@ class IntentClassifier:
         # Entraîner le modèle
         self.pipeline.fit(training_data, labels)
     
+    def predict_batch(self, texts, min_confidence=MIN_CONFIDENCE):
+        """Prédire l'intention de plusieurs textes en une seule vectorisation.
+
+        Renvoie (intentions, probabilités) : une intention par texte
+        ('unknown' sous `min_confidence`) et la matrice des probabilités,
+        une ligne par texte et une colonne par intention de `self.classes`.
+        """
+        if not self.pipeline:
+            return ['unknown'] * len(texts), None
+
+        processed = [self.preprocess_text(text) for text in texts]
+        # predict + predict_proba feraient passer deux fois le TF-IDF
+        features = self.pipeline.named_steps['tfidf'].transform(processed)
+        probabilities = self.pipeline.named_steps['classifier'].predict_proba(features)
+
+        classes = self.classes
+        best = probabilities.argmax(axis=1)
+        labels = [
+            classes[index] if probabilities[row, index] >= min_confidence else 'unknown'
+            for row, index in enumerate(best)
+        ]
+        return labels, probabilities
+
+    @property
+    def classes(self):
+        return list(self.pipeline.classes_) if self.pipeline else []
+
     def predict_intent(self, text):
         """Prédire l'intention d'un texte"""
-        if not self.pipeline:
-            return 'unknown'
-        
-        processed_text = self.preprocess_text(text)
-        prediction = self.pipeline.predict([processed_text])
-        confidence = self.pipeline.predict_proba([processed_text]).max()
-        
-        # Seuil de confiance minimum
-        if confidence < 0.3:
-            return 'unknown'
-        
-        return prediction[0]
+        labels, _ = self.predict_batch([text])
+        return labels[0]
     
     def extract_entities(self, text, intent):
         """Extraire les entités du texte selon l'intention"""
@@ -202,6 +329,133 @@ class IntentClassifier:
         
         return entities
 
-# Instance globale du classificateur
-intent_classifier = IntentClassifier()
 
+def build(artifact_path=None):
+    """Entraîner le pipeline et écrire l'artefact (étape de build / déploiement)"""
+    classifier = IntentClassifier(artifact_path, use_artifact=False)
+    if not classifier.save_artifact(classifier.artifact_path):
+        return None
+    return classifier
+
+
+# Classifieur de chaque processus de `classify_file`
+_worker_classifier = None
+
+def _init_worker(artifact_path):
+    global _worker_classifier
+    _worker_classifier = IntentClassifier(artifact_path)
+
+def _classify_chunk(args):
+    lines, field = args
+    if field:
+        records = [json.loads(line) for line in lines]
+        texts = [str(record.get(field) or '') for record in records]
+    else:
+        records = None
+        texts = [line.rstrip('\n') for line in lines]
+
+    labels, probabilities = _worker_classifier.predict_batch(texts)
+    confidences = probabilities.max(axis=1) if probabilities is not None else [0.0] * len(texts)
+
+    output = []
+    for index, text in enumerate(texts):
+        confidence = round(float(confidences[index]), 4)
+        if records is not None:
+            record = records[index]
+            record['intent'] = labels[index]
+            record['intent_confidence'] = confidence
+            output.append(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            output.append(f"{labels[index]}\t{confidence}\t{text}\n")
+    return output
+
+def _read_chunks(lines, chunk_size, field):
+    lines = (line for line in lines if line.strip())
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk, field
+
+def classify_file(input_file, output_file, field=None, workers=None, chunk_size=5000, artifact_path=None):
+    """Classer un fichier de messages par blocs, répartis sur plusieurs processus.
+
+    Entrée : un message par ligne, ou du JSON Lines si `field` désigne le
+    champ du message. Sortie dans le même ordre : 'intention<TAB>confiance<TAB>message',
+    ou l'enregistrement JSON complété de 'intent' et 'intent_confidence'.
+    Les blocs sont lus et écrits au fil de l'eau : la mémoire utilisée ne
+    dépend pas de la taille du fichier.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _read_chunks(input_file, chunk_size, field)
+    count = 0
+
+    if workers == 1:
+        _init_worker(artifact_path)
+        results = map(_classify_chunk, chunks)
+        for lines in results:
+            output_file.writelines(lines)
+            count += len(lines)
+        return count
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(artifact_path,)) as pool:
+        # imap conserve l'ordre des blocs ; au plus quelques blocs en attente par processus
+        for lines in pool.imap(_classify_chunk, chunks):
+            output_file.writelines(lines)
+            count += len(lines)
+    return count
+
+
+# Instance partagée du classificateur, créée au premier appel : importer ce module
+# (commande `build`, corpus INTENTS) n'entraîne ni ne charge rien
+_intent_classifier = None
+_intent_classifier_lock = threading.Lock()
+
+def get_intent_classifier():
+    """Classificateur partagé, chargé depuis l'artefact (ou entraîné) au premier appel"""
+    global _intent_classifier
+    with _intent_classifier_lock:
+        if _intent_classifier is None:
+            _intent_classifier = IntentClassifier()
+        return _intent_classifier
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.chatbot.intent_classifier')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help="entraîner le modèle et écrire l'artefact")
+    build_parser.add_argument('artifact', nargs='?', help="chemin de l'artefact (INTENT_CLASSIFIER_ARTIFACT par défaut)")
+
+    classify_parser = commands.add_parser('classify', help="classer un fichier de messages en parallèle")
+    classify_parser.add_argument('input', help="fichier d'entrée ('-' pour l'entrée standard)")
+    classify_parser.add_argument('-o', '--output', default='-', help="fichier de sortie ('-' pour la sortie standard)")
+    classify_parser.add_argument('--field', help="entrée en JSON Lines : champ contenant le message")
+    classify_parser.add_argument('--workers', type=int, help="nombre de processus (nombre de cœurs par défaut)")
+    classify_parser.add_argument('--chunk-size', type=int, default=5000, help="messages par bloc")
+    classify_parser.add_argument('--artifact', help="chemin de l'artefact")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        built = build(args.artifact)
+        if built is None:
+            return 1
+        print(f"Artefact écrit : {built.artifact_path} (empreinte {built.corpus_hash[:12]})")
+        return 0
+
+    input_file = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        count = classify_file(input_file, output_file, args.field, args.workers, args.chunk_size, args.artifact)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    print(f"{count} messages classés", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
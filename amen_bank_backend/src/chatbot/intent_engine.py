@@ -0,0 +1,130 @@
+import re
+from src.chatbot.text_utils import fold_text
+
+# Mots-clés par intention, sans accents, avec leur poids.
+# L'ordre des intentions départage les égalités de score.
+INTENT_KEYWORDS = [
+    ('simulation_credit', [
+        ('simulation', 1.5), ('simuler', 1.5), ('simule', 1.5),
+        ('combien pour un credit', 2.0), ('combien pour un pret', 2.0),
+        ('mensualite', 1.0)
+    ]),
+    ('virement', [
+        ('virement', 1.0), ('virer', 1.0), ('transferer', 1.0), ('transfert', 1.0), ('envoyer', 1.0)
+    ]),
+    ('depot', [
+        ('depot', 1.0), ('deposer', 1.0), ('verser', 1.0)
+    ]),
+    ('retrait', [
+        ('retrait', 1.0), ('retirer', 1.0)
+    ]),
+    ('depenses', [
+        ('depense', 1.5)
+    ]),
+    ('consultation_transactions', [
+        ('transaction', 1.0), ('mouvement', 1.0), ('historique', 1.0), ('operation', 1.0)
+    ]),
+    ('demande_credit', [
+        ('credit', 1.0), ('pret', 1.0), ('emprunt', 1.0), ('financement', 1.0)
+    ]),
+    # Chacun de ces mots suffit seul (« mon compte ») ; à égalité, une opération
+    # placée plus haut l'emporte (« envoyer de l'argent », « déposer sur le compte 3 »)
+    ('consultation_solde', [
+        ('solde', 1.0), ('combien', 1.0), ('argent', 1.0), ('compte', 1.0)
+    ]),
+    ('assistance', [
+        ('aide', 1.0), ('help', 1.0), ('assistance', 1.0), ('probleme', 1.0)
+    ]),
+    ('salutation', [
+        ('bonjour', 1.0), ('salut', 1.0), ('hello', 1.0), ('bonsoir', 1.0)
+    ]),
+]
+
+DEFAULT_INTENT = 'conversation_generale'
+
+
+def _trie_pattern(words):
+    """Expression régulière factorisée en arbre de préfixes.
+
+    ('solde', 'salut', 'simuler') -> 's(?:olde|alut|imuler)' : à chaque position
+    le moteur suit une seule branche au lieu d'essayer chaque mot-clé.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        if list(node) == ['']:
+            return ''
+        branches = []
+        optional = False
+        # Branches les plus longues d'abord pour préférer la correspondance la plus longue
+        for char in sorted(node, key=lambda c: (c == '', c)):
+            if char == '':
+                optional = True
+                continue
+            # Un espace dans une expression accepte n'importe quel blanc
+            token = r'\s+' if char == ' ' else re.escape(char)
+            branches.append(token + build(node[char]))
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if optional:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+class KeywordIntentEngine:
+    """Classification par mots-clés en une seule passe.
+
+    Toutes les listes de mots-clés sont compilées en une seule expression
+    régulière factorisée en arbre de préfixes, appliquée au texte sans
+    accents. Chaque occurrence ajoute son poids à l'intention correspondante ;
+    les intentions sont ensuite classées par score, puis par ordre de la
+    table en cas d'égalité. En dessous de `min_score`, le message relève de
+    la conversation générale.
+    """
+
+    def __init__(self, keyword_table=None, min_score=1.0):
+        keyword_table = keyword_table or INTENT_KEYWORDS
+        self.min_score = min_score
+        self._priority = {}
+        self._keywords = {}
+        for priority, (intent, keywords) in enumerate(keyword_table):
+            self._priority[intent] = priority
+            for keyword, weight in keywords:
+                self._keywords.setdefault(fold_text(keyword), []).append((intent, weight))
+
+        self._pattern = re.compile(r"\b" + _trie_pattern(self._keywords))
+
+    def rank(self, message):
+        """Intentions détectées, de la plus probable à la moins probable : [(intention, confiance, score)]"""
+        scores = {}
+        for match in self._pattern.finditer(fold_text(message)):
+            entries = self._keywords.get(match.group(0))
+            if entries is None:
+                # Expression écrite avec d'autres blancs ("combien  pour\tun credit")
+                entries = self._keywords[" ".join(match.group(0).split())]
+            for intent, weight in entries:
+                scores[intent] = scores.get(intent, 0.0) + weight
+
+        if not scores:
+            return []
+        total = sum(scores.values())
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self._priority[item[0]]))
+        return [(intent, round(score / total, 3), score) for intent, score in ranked]
+
+    def classify(self, message):
+        """Intention retenue et sa confiance"""
+        ranked = self.rank(message)
+        if not ranked or ranked[0][2] < self.min_score:
+            return DEFAULT_INTENT, 0.0
+        intent, confidence, _ = ranked[0]
+        return intent, confidence
+
+
+# Instance partagée (expression compilée une seule fois)
+keyword_intent_engine = KeywordIntentEngine()
@@ -0,0 +1,75 @@
+import os
+import secrets
+from src.models.cache import make_cache
+
+
+class ConversationStateStore:
+    """État des conversations du chatbot (intention en cours, entités collectées).
+
+    Les états sont rangés dans un cache de `src.models.cache` : en mémoire du
+    processus (LRU borné, expiration après `idle_ttl` secondes sans message),
+    ou dans Redis si CACHE_URL est défini, pour que n'importe quel worker
+    puisse reprendre un parcours commencé par un autre.
+
+    Un état est stocké sous une forme compacte ([intention, entités], JSON
+    compatible) et uniquement s'il y a un parcours en cours : une conversation
+    revenue au repos n'occupe aucune place.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @staticmethod
+    def empty_state():
+        return {"current_intent": None, "entities": {}}
+
+    def load(self, key):
+        """État de la conversation `key` (état vide si inconnue, expirée ou sans clé)"""
+        if key is None:
+            return self.empty_state()
+        record = self.cache.get(key)
+        if record is None:
+            return self.empty_state()
+        intent, entities = record
+        return {"current_intent": intent, "entities": dict(entities or {})}
+
+    def save(self, key, state):
+        """Réécrire l'état après traitement du message"""
+        if key is None:
+            return
+        if state["current_intent"] is None:
+            # Entités isolées inutiles : une nouvelle intention repart d'un état vide
+            self.cache.delete(key)
+            return
+        self.cache.set(key, [state["current_intent"], dict(state["entities"]) or None])
+
+    def delete(self, key):
+        if key is not None:
+            self.cache.delete(key)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def new_chat_id():
+    """Identifiant de conversation, conservé dans la session Flask du client"""
+    return secrets.token_urlsafe(16)
+
+def conversation_key(user_session):
+    """Clé d'état propre à la session : un utilisateur anonyme n'en partage plus l'état avec les autres.
+
+    L'identifiant utilisateur fait partie de la clé : se connecter ou se
+    déconnecter démarre une nouvelle conversation.
+    """
+    if not user_session or not user_session.get('chat_id'):
+        return None
+    return f"{user_session.get('user_id') or 'anonyme'}:{user_session['chat_id']}"
+
+
+# CHAT_STATE_SIZE : nombre maximal de conversations gardées par processus (stockage local)
+# CHAT_STATE_TTL : secondes d'inactivité avant l'oubli d'un parcours inachevé
+conversation_state_store = ConversationStateStore(make_cache(
+    'chat_state',
+    maxsize=int(os.environ.get('CHAT_STATE_SIZE', 10000)),
+    ttl=int(os.environ.get('CHAT_STATE_TTL', 1800))
+))
@@ -0,0 +1,23 @@
+import unicodedata
+
+def _build_fold_table():
+    """Table de translittération : lettres latines accentuées -> lettre de base en minuscule"""
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        base = unicodedata.normalize('NFD', char)[0].lower()
+        if len(base) == 1 and base != char:
+            table[code] = base
+    return table
+
+_FOLD_TABLE = _build_fold_table()
+
+def fold_text(text):
+    """Minuscules sans accents ('Dépôt' -> 'depot'), de même longueur que le texte d'origine"""
+    if text.isascii():
+        return text.lower()
+    folded = text.translate(_FOLD_TABLE).lower()
+    if len(folded) != len(text):
+        # Rares caractères dont la minuscule change de longueur ('İ') : laissés tels quels
+        folded = ''.join(char if len(char.lower()) != 1 else char.lower() for char in text.translate(_FOLD_TABLE))
+    return folded
@@ -0,0 +1,179 @@
+import os
+import threading
+from src.models.cache import LRUTTLCache, make_cache, register_user_data_invalidator
+from src.models.database import DatabaseConnection
+from src.models.ledger import register_posting_listener
+
+RECENT_TRANSACTIONS = 5
+
+# Utilisateur, comptes et dernières transactions en un seul aller-retour.
+# Les trois parties partagent les mêmes colonnes ; `row_type` indique la nature de la ligne.
+CONTEXT_QUERY = """
+SELECT 'user' AS row_type, NULL AS account_id, u.username AS label, u.full_name AS detail,
+       NULL AS amount, NULL AS debit_credit_indicator, NULL AS row_date
+FROM users u
+WHERE u.user_id = %s
+UNION ALL
+SELECT 'account', a.account_id, a.account_label, a.account_number,
+       a.current_balance, NULL, NULL
+FROM accounts a
+WHERE a.user_id = %s
+UNION ALL
+(SELECT 'transaction', t.account_id, a.account_label, t.description,
+        t.amount, t.debit_credit_indicator, t.transaction_date
+ FROM transactions t
+ JOIN accounts a ON t.account_id = a.account_id
+ WHERE a.user_id = %s
+ ORDER BY t.transaction_date DESC, t.transaction_id DESC
+ LIMIT %s)
+"""
+
+
+class UserContextCache:
+    """Instantanés du contexte utilisateur passé au modèle de génération.
+
+    Un instantané (identité, comptes, dernières transactions) est lu en une
+    seule requête au premier besoin puis gardé en cache. Chaque écriture
+    passée par le Ledger le met à jour sans relire la base (nouveau solde,
+    transaction ajoutée en tête) ; si l'instantané ne connaît pas le compte, il est
+    simplement invalidé.
+
+    La mise à jour (lecture, nouvel instantané, écriture) se fait sous verrou,
+    et chaque écriture incrémente la génération de l'utilisateur : un
+    instantané lu en base avant une écriture n'est pas remis en cache. Le
+    verrou ne vaut que dans le processus : avec le cache partagé (Redis),
+    une écriture invalide l'instantané au lieu de le mettre à jour.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.patch_on_posting = isinstance(cache, LRUTTLCache)
+        self._lock = threading.Lock()
+        self._generations = {}
+
+    def get_context(self, user_id):
+        """Contexte utilisateur formaté pour le prompt"""
+        snapshot = self.cache.get(user_id)
+        if snapshot is None:
+            with self._lock:
+                generation = self._generations.get(user_id, 0)
+            snapshot = self.load_snapshot(user_id)
+            if snapshot is None:
+                return "Contexte utilisateur non disponible"
+            if not snapshot["user"]:
+                return "Utilisateur non trouvé"
+            with self._lock:
+                if self._generations.get(user_id, 0) == generation:
+                    self.cache.set(user_id, snapshot)
+        return format_user_context(snapshot)
+
+    def load_snapshot(self, user_id):
+        """Lire l'instantané depuis la base ; None en cas d'erreur"""
+        db = DatabaseConnection()
+        if not db.connect():
+            return None
+        try:
+            rows = db.execute_query(CONTEXT_QUERY, (user_id, user_id, user_id, RECENT_TRANSACTIONS))
+        finally:
+            db.disconnect()
+        if rows is None:
+            return None
+
+        # Sérialisable en JSON, pour le cache partagé
+        snapshot = {"user": None, "accounts": [], "transactions": []}
+        for row in rows:
+            if row["row_type"] == 'user':
+                snapshot["user"] = {"username": row["label"], "full_name": row["detail"]}
+            elif row["row_type"] == 'account':
+                snapshot["accounts"].append({
+                    "account_id": row["account_id"],
+                    "account_label": row["label"],
+                    "account_number": row["detail"],
+                    "current_balance": float(row["amount"])
+                })
+            else:
+                snapshot["transactions"].append({
+                    "account_id": row["account_id"],
+                    "account_label": row["label"],
+                    "description": row["detail"],
+                    "amount": float(row["amount"]),
+                    "debit_credit_indicator": row["debit_credit_indicator"],
+                    "transaction_date": str(row["row_date"])
+                })
+        return snapshot
+
+    def apply_posting(self, posting):
+        """Listener du Ledger : reporter une écriture validée dans l'instantané en cache"""
+        user_id = posting["user_id"]
+        if not self.patch_on_posting:
+            self.invalidate(user_id)
+            return
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._apply_posting(user_id, posting)
+
+    def _apply_posting(self, user_id, posting):
+        snapshot = self.cache.get(user_id)
+        if snapshot is None:
+            return
+
+        account = next((a for a in snapshot["accounts"] if a["account_id"] == posting["account_id"]), None)
+        if account is None:
+            self.cache.delete(user_id)
+            return
+
+        # Nouvel instantané plutôt que modification sur place : il peut être en cours de lecture.
+        # Le montant est ajouté au solde connu : deux écritures notifiées dans le désordre
+        # donnent le même solde final (ce que ne garantit pas `new_balance`)
+        signed_amount = posting["amount"] if posting["debit_credit_indicator"] == 'C' else -posting["amount"]
+        accounts = [
+            dict(a, current_balance=round(a["current_balance"] + signed_amount, 3)) if a is account else a
+            for a in snapshot["accounts"]
+        ]
+        transactions = [{
+            "account_id": posting["account_id"],
+            "account_label": account["account_label"],
+            "description": posting["description"],
+            "amount": posting["amount"],
+            "debit_credit_indicator": posting["debit_credit_indicator"],
+            "transaction_date": str(posting["transaction_date"])
+        }] + snapshot["transactions"][:RECENT_TRANSACTIONS - 1]
+        self.cache.set(user_id, {"user": snapshot["user"], "accounts": accounts, "transactions": transactions})
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self.cache.delete(user_id)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def format_user_context(snapshot):
+    user = snapshot["user"]
+    context = f"Client: {user['full_name']} ({user['username']})\n\n"
+
+    context += "COMPTES:\n"
+    total_balance = 0
+    for account in snapshot["accounts"]:
+        context += f"- {account['account_label']} ({account['account_number']}): {account['current_balance']:.3f} TND\n"
+        total_balance += account['current_balance']
+
+    context += f"\nSOLDE TOTAL: {total_balance:.3f} TND\n"
+
+    context += "\nDERNIÈRES TRANSACTIONS:\n"
+    for trans in snapshot["transactions"]:
+        sign = "+" if trans['debit_credit_indicator'] == 'C' else "-"
+        context += f"- {trans['transaction_date']}: {sign}{trans['amount']:.3f} TND - {trans['description']}\n"
+
+    return context
+
+
+# USER_CONTEXT_CACHE_SIZE / USER_CONTEXT_CACHE_TTL : taille et durée de vie des instantanés
+user_context_cache = UserContextCache(make_cache(
+    'user_context',
+    maxsize=int(os.environ.get('USER_CONTEXT_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('USER_CONTEXT_CACHE_TTL', 300))
+))
+register_posting_listener(user_context_cache.apply_posting)
+register_user_data_invalidator(user_context_cache.invalidate)
@@ -10,7 +10,10 @@ from src.routes.accounts import accounts_bp
 from src.routes.transfers import transfers_bp
 from src.routes.loans import loans_bp
 from src.routes.chatbot import chatbot_bp
-from src.models.database import DatabaseConnection, User # Import User and DatabaseConnection
+from src.chatbot.chatbot_handler import chatbot_handler
+from src.routes.health import health_bp
+from src.models.database import DatabaseConnection, User, init_app as init_db # Import User and DatabaseConnection
+from src.models.instrumentation import init_app as init_instrumentation
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -24,6 +27,19 @@ app.register_blueprint(accounts_bp, url_prefix='/api')
 app.register_blueprint(transfers_bp, url_prefix='/api')
 app.register_blueprint(loans_bp, url_prefix='/api')
 app.register_blueprint(chatbot_bp, url_prefix='/api')
+app.register_blueprint(health_bp, url_prefix='/api')
+
+# Une connexion du pool par requête, restituée en fin de requête
+init_db(app)
+
+# Mesure des requêtes SQL : temps par requête HTTP, journal des requêtes lentes, budget
+init_instrumentation(app)
+
+# Charger le modèle et le classifieur d'intentions du chatbot en arrière-plan :
+# les autres routes répondent immédiatement
+if os.environ.get('CHATBOT_WARMUP', '1') != '0':
+    chatbot_handler.model.warm_up()
+    chatbot_handler.intent_cascade.warm_up()
 
 # Route de connexion déplacée ici pour le test
 @app.route("/login", methods=["POST"])
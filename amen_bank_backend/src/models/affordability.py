@@ -0,0 +1,221 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from src.models.cache import make_cache
+from src.models.database import DatabaseConnection, LoanApplication
+
+# Mois complets analysés (le mois en cours est exclu : il est incomplet)
+HISTORY_MONTHS = int(os.environ.get('AFFORDABILITY_MONTHS', 6))
+# Un débit revenant (même libellé) sur au moins ce nombre de mois est une charge récurrente
+RECURRING_MIN_MONTHS = 3
+# Taux d'endettement maximal, charges récurrentes et nouvelle mensualité comprises
+MAX_DEBT_TO_INCOME = 0.40
+FAVORABLE_DEBT_TO_INCOME = 0.33
+
+# Crédits et débits par mois, calculés par la base
+MONTHLY_TOTALS_QUERY = """
+SELECT DATE_FORMAT(t.transaction_date, '%%Y-%%m') AS month,
+       SUM(CASE WHEN t.debit_credit_indicator = 'C' THEN t.amount ELSE 0 END) AS credits,
+       SUM(CASE WHEN t.debit_credit_indicator = 'D' THEN t.amount ELSE 0 END) AS debits
+FROM transactions t
+JOIN accounts a ON t.account_id = a.account_id
+WHERE a.user_id = %s AND t.transaction_date >= %s AND t.transaction_date < %s
+GROUP BY month
+"""
+
+# Débits de même libellé présents sur plusieurs mois (loyer, échéances, abonnements...).
+# Les retraits d'espèces et les écritures au libellé générique (libellé = type,
+# "RETRAIT", "VIREMENT"...) ne désignent pas un créancier : ce ne sont pas des charges.
+RECURRING_DEBITS_QUERY = """
+SELECT t.description,
+       COUNT(DISTINCT DATE_FORMAT(t.transaction_date, '%%Y-%%m')) AS months,
+       SUM(t.amount) AS total
+FROM transactions t
+JOIN accounts a ON t.account_id = a.account_id
+WHERE a.user_id = %s AND t.transaction_date >= %s AND t.transaction_date < %s
+  AND t.debit_credit_indicator = 'D'
+  AND t.transaction_type NOT IN ('RETRAIT', 'DÉPÔT', 'DEPOT')
+  AND t.description <> t.transaction_type
+GROUP BY t.description
+HAVING months >= %s
+"""
+
+
+def history_window(today=None, months=HISTORY_MONTHS):
+    """Bornes [début, fin) des `months` derniers mois complets"""
+    today = today or date.today()
+    end = date(today.year, today.month, 1)
+    index = end.year * 12 + end.month - 1 - months
+    start = date(index // 12, index % 12 + 1, 1)
+    return start, end
+
+
+class AffordabilityEngine:
+    """Capacité de remboursement d'un client à partir de son historique de transactions.
+
+    Le profil (revenu mensuel moyen, débits mensuels, charges récurrentes)
+    est agrégé par la base en deux requêtes, puis gardé en cache par
+    utilisateur. Il ne porte que sur des mois complets : la clé de cache
+    contient le mois courant, le profil est donc recalculé au changement de
+    mois et les écritures du mois en cours ne le modifient pas.
+    """
+
+    def __init__(self, cache, months=HISTORY_MONTHS):
+        self.cache = cache
+        self.months = months
+
+    def profile(self, user_id, db):
+        """Profil financier du client ; None en cas d'erreur de base"""
+        start, end = history_window(months=self.months)
+        key = f"{user_id}:{end:%Y-%m}"
+        profile = self.cache.get(key)
+        if profile is not None:
+            return profile
+
+        totals = db.execute_query(MONTHLY_TOTALS_QUERY, (user_id, start, end))
+        recurring = db.execute_query(RECURRING_DEBITS_QUERY, (user_id, start, end, RECURRING_MIN_MONTHS))
+        if totals is None or recurring is None:
+            return None
+
+        # Les mois sans mouvement comptent pour zéro
+        profile = {
+            'months': self.months,
+            'active_months': len(totals),
+            'monthly_income': round(float(sum(row['credits'] for row in totals)) / self.months, 3),
+            'monthly_debits': round(float(sum(row['debits'] for row in totals)) / self.months, 3),
+            'recurring_debits': round(float(sum(row['total'] for row in recurring)) / self.months, 3),
+            'period_start': start.isoformat(),
+            'period_end': end.isoformat()
+        }
+        self.cache.set(key, profile)
+        return profile
+
+    def assess(self, user_id, monthly_payment, db):
+        """Évaluation d'une nouvelle mensualité pour le client ; None en cas d'erreur de base"""
+        profile = self.profile(user_id, db)
+        if profile is None:
+            return None
+        return score_profile(profile, float(monthly_payment or 0))
+
+    def score_application(self, application, db):
+        """Évaluer une demande et enregistrer le score ; renvoie l'évaluation ou None"""
+        assessment = self.assess(application['user_id'], application['monthly_payment_simulation'], db)
+        if assessment is None:
+            return None
+        updated = LoanApplication(db).update_assessment(application['application_id'], assessment)
+        return assessment if updated is not None else None
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def score_profile(profile, monthly_payment):
+    """Taux d'endettement après la nouvelle mensualité, score de 0 à 100 et avis"""
+    income = profile['monthly_income']
+    charges = profile['recurring_debits'] + monthly_payment
+    if income <= 0:
+        debt_to_income = None
+        score = 0
+        decision = 'DEFAVORABLE'
+    else:
+        debt_to_income = round(charges / income, 4)
+        # 100 sans charge, 50 au taux d'endettement maximal, 0 au double
+        score = max(0, min(100, round(100 * (1 - debt_to_income / (2 * MAX_DEBT_TO_INCOME)))))
+        if debt_to_income <= FAVORABLE_DEBT_TO_INCOME:
+            decision = 'FAVORABLE'
+        elif debt_to_income <= MAX_DEBT_TO_INCOME:
+            decision = 'A_ETUDIER'
+        else:
+            decision = 'DEFAVORABLE'
+    return {
+        'monthly_income': income,
+        'recurring_debits': profile['recurring_debits'],
+        'monthly_payment': monthly_payment,
+        'debt_to_income': debt_to_income,
+        'score': score,
+        'decision': decision,
+        'scored_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def _rescore_batch(applications):
+    """Évaluer un lot de demandes sur une connexion du pool ; renvoie (évaluées, échecs)"""
+    db = DatabaseConnection()
+    if not db.connect():
+        return 0, len(applications)
+    scored = failed = 0
+    try:
+        for application in applications:
+            if affordability_engine.score_application(application, db) is None:
+                failed += 1
+            else:
+                scored += 1
+    finally:
+        db.disconnect()
+    return scored, failed
+
+
+def rescore_pending(workers=4, batch_size=50):
+    """Réévaluer toutes les demandes PENDING, par lots traités en parallèle.
+
+    Les demandes sont lues par pages (curseur sur application_id) et chaque
+    lot est confié à un thread du pool, qui utilise sa propre connexion :
+    le travail est surtout de l'attente réseau vers MySQL.
+    Renvoie (évaluées, échecs), ou None si la base est injoignable.
+    """
+    db = DatabaseConnection()
+    if not db.connect():
+        print("Erreur de connexion à la base de données")
+        return None
+
+    scored = failed = 0
+    try:
+        loan_model = LoanApplication(db)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            after_id = 0
+            while True:
+                applications = loan_model.get_pending(after_id, batch_size)
+                if not applications:
+                    break
+                futures.append(executor.submit(_rescore_batch, applications))
+                after_id = applications[-1]['application_id']
+            for future in futures:
+                batch_scored, batch_failed = future.result()
+                scored += batch_scored
+                failed += batch_failed
+    finally:
+        db.disconnect()
+    return scored, failed
+
+
+# AFFORDABILITY_CACHE_SIZE / AFFORDABILITY_CACHE_TTL : profils gardés par processus et durée de vie
+affordability_engine = AffordabilityEngine(make_cache(
+    'affordability',
+    maxsize=int(os.environ.get('AFFORDABILITY_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('AFFORDABILITY_CACHE_TTL', 6 * 3600))
+))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.models.affordability')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    rescore_parser = commands.add_parser('rescore', help="réévaluer toutes les demandes de crédit PENDING")
+    rescore_parser.add_argument('--workers', type=int, default=4, help="nombre de threads (et de connexions)")
+    rescore_parser.add_argument('--batch-size', type=int, default=50, help="demandes par lot")
+
+    args = parser.parse_args(argv)
+
+    result = rescore_pending(args.workers, args.batch_size)
+    if result is None:
+        return 1
+    scored, failed = result
+    print(f"{scored} demandes évaluées, {failed} en échec", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
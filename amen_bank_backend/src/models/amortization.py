@@ -0,0 +1,270 @@
+import numpy as np
+
+# Les montants sont calculés en millimes entiers (1 TND = 1000 millimes) :
+# pas de dérive d'arrondi, la somme du capital amorti est exactement le montant prêté.
+MILLIMES = 1000
+
+# Durée maximale acceptée par les calculs : borne la taille des tableaux (480 échéances)
+MAX_LOAN_YEARS = 40
+# Cellules (scénarios × échéances) calculées à la fois par simulation_grid
+GRID_CHUNK_CELLS = 1_000_000
+
+DEFERRAL_TYPES = ('partial', 'total')
+EARLY_REPAYMENT_MODES = ('reduce_term', 'reduce_payment')
+
+SCHEDULE_FIELDS = ['month', 'payment', 'interest', 'principal', 'early_repayment', 'balance']
+
+
+def annuity_payment(balance, monthly_rate, months):
+    """Mensualité constante (même unité que `balance`, non arrondie)"""
+    if monthly_rate == 0:
+        return balance / months
+    return balance * monthly_rate / (1 - (1 + monthly_rate) ** -months)
+
+
+class AmortizationSchedule:
+    """Tableau d'amortissement mois par mois, en colonnes NumPy (millimes entiers).
+
+    Une ligne par échéance : mensualité, intérêts, capital amorti,
+    remboursement anticipé versé après l'échéance et capital restant dû.
+    Pendant un différé total les intérêts sont capitalisés : la mensualité est
+    nulle et le capital amorti négatif (le capital restant dû augmente).
+    """
+
+    def __init__(self, amount, annual_rate, month, payment, interest, principal, early_repayment, balance):
+        self.amount = amount
+        self.annual_rate = annual_rate
+        self.month = month
+        self.payment = payment
+        self.interest = interest
+        self.principal = principal
+        self.early_repayment = early_repayment
+        self.balance = balance
+
+    def __len__(self):
+        return len(self.month)
+
+    def columns(self):
+        """Colonnes en TND, arrondies au millime"""
+        return {
+            'month': self.month.tolist(),
+            'payment': (self.payment / MILLIMES).tolist(),
+            'interest': (self.interest / MILLIMES).tolist(),
+            'principal': (self.principal / MILLIMES).tolist(),
+            'early_repayment': (self.early_repayment / MILLIMES).tolist(),
+            'balance': (self.balance / MILLIMES).tolist()
+        }
+
+    def rows(self):
+        """Lignes [mois, mensualité, intérêts, capital, anticipé, restant dû] en TND"""
+        columns = self.columns()
+        return zip(*(columns[name] for name in SCHEDULE_FIELDS))
+
+    def totals(self):
+        total_interest = int(self.interest.sum())
+        total_payment = int(self.payment.sum() + self.early_repayment.sum())
+        return {
+            'months': len(self),
+            'monthly_payment': self.regular_payment() / MILLIMES,
+            'total_payment': total_payment / MILLIMES,
+            'total_interest': total_interest / MILLIMES,
+            'total_early_repayment': int(self.early_repayment.sum()) / MILLIMES
+        }
+
+    def regular_payment(self):
+        """Mensualité de la première échéance amortissable (millimes)"""
+        amortizing = np.flatnonzero(self.principal > 0)
+        return int(self.payment[amortizing[0]]) if len(amortizing) else 0
+
+
+def _deferral_rows(balance, monthly_rate, months, deferral_type):
+    """Échéances de différé : intérêts seuls (partiel) ou capitalisés (total)"""
+    if deferral_type == 'partial':
+        interest = np.full(months, round(balance * monthly_rate), dtype=np.int64)
+        principal = np.zeros(months, dtype=np.int64)
+        payment = interest.copy()
+        balances = np.full(months, balance, dtype=np.int64)
+    else:
+        growth = (1 + monthly_rate) ** np.arange(1, months + 1)
+        balances = np.rint(balance * growth).astype(np.int64)
+        interest = np.diff(balances, prepend=balance)
+        principal = -interest
+        payment = np.zeros(months, dtype=np.int64)
+    return payment, interest, principal, balances
+
+
+def _annuity_rows(balance, monthly_rate, payment, months):
+    """Échéances à mensualité constante `payment`, arrêtées au remboursement complet.
+
+    Le capital restant dû avant chaque échéance est calculé en forme close,
+    ce qui évite une boucle par ligne ; la dernière échéance solde le reste.
+    """
+    k = np.arange(months)
+    if monthly_rate:
+        growth = (1 + monthly_rate) ** k
+        previous = balance * growth - payment * (growth - 1) / monthly_rate
+    else:
+        previous = balance - payment * k.astype(float)
+    interest = np.rint(np.maximum(previous, 0) * monthly_rate).astype(np.int64)
+    principal = payment - interest
+    balances = balance - np.cumsum(principal)
+
+    paid_off = np.flatnonzero(balances <= 0)
+    end = paid_off[0] + 1 if len(paid_off) else months
+    interest, principal, balances = interest[:end], principal[:end], balances[:end]
+    return principal + interest, interest, principal, balances
+
+
+def _finish(payment, principal, balances):
+    """Dernière échéance : solder le capital restant (écarts d'arrondi compris)"""
+    principal[-1] += balances[-1]
+    payment[-1] += balances[-1]
+    balances[-1] = 0
+
+
+def amortization_schedule(amount, years, annual_rate, deferral_months=0, deferral_type='partial',
+                          early_repayments=None, early_repayment_mode='reduce_term'):
+    """Tableau d'amortissement d'un crédit à mensualités constantes.
+
+    `years` est la durée totale, différé compris. `early_repayments` est une
+    liste de (mois, montant en TND) versés après l'échéance du mois indiqué ;
+    selon `early_repayment_mode`, la durée est raccourcie à mensualité égale
+    ('reduce_term') ou la mensualité recalculée sur la durée restante
+    ('reduce_payment'). Lève ValueError si les paramètres sont invalides,
+    notamment une durée de plus de MAX_LOAN_YEARS ans.
+    """
+    if not amount or amount <= 0 or not years or years <= 0:
+        raise ValueError("Montant et durée doivent être positifs")
+    if years > MAX_LOAN_YEARS:
+        raise ValueError(f"Durée maximale de {MAX_LOAN_YEARS} ans")
+    if annual_rate is None or annual_rate < 0:
+        raise ValueError("Le taux doit être positif ou nul")
+    if deferral_type not in DEFERRAL_TYPES:
+        raise ValueError("Type de différé invalide (partial ou total)")
+    if early_repayment_mode not in EARLY_REPAYMENT_MODES:
+        raise ValueError("Mode de remboursement anticipé invalide (reduce_term ou reduce_payment)")
+
+    total_months = int(round(years * 12))
+    if total_months < 1:
+        raise ValueError("La durée doit être d'au moins un mois")
+    deferral_months = int(deferral_months or 0)
+    if deferral_months < 0 or deferral_months >= total_months:
+        raise ValueError("Le différé doit être inférieur à la durée du crédit")
+
+    events = {}
+    for month, early_amount in early_repayments or []:
+        month = int(month)
+        if month <= deferral_months or month >= total_months or early_amount <= 0:
+            raise ValueError("Remboursement anticipé invalide : mois hors de la période d'amortissement ou montant négatif")
+        events[month] = events.get(month, 0) + int(round(early_amount * MILLIMES))
+
+    monthly_rate = annual_rate / 12
+    balance = int(round(amount * MILLIMES))
+    parts = []
+
+    if deferral_months:
+        deferral = _deferral_rows(balance, monthly_rate, deferral_months, deferral_type)
+        parts.append(deferral + (np.zeros(deferral_months, dtype=np.int64),))
+        balance = int(deferral[3][-1])
+
+    month = deferral_months
+    payment = int(round(annuity_payment(balance, monthly_rate, total_months - month)))
+    for event_month in sorted(events) + [total_months]:
+        if balance <= 0:
+            break
+        rows = _annuity_rows(balance, monthly_rate, payment, event_month - month)
+        segment_payment, interest, principal, balances = rows
+        early = np.zeros(len(balances), dtype=np.int64)
+        month += len(balances)
+
+        if event_month == total_months or balances[-1] <= 0:
+            _finish(segment_payment, principal, balances)
+        else:
+            early[-1] = min(events[event_month], int(balances[-1]))
+            balances[-1] -= early[-1]
+            if early_repayment_mode == 'reduce_payment' and balances[-1] > 0:
+                payment = int(round(annuity_payment(int(balances[-1]), monthly_rate, total_months - month)))
+        parts.append((segment_payment, interest, principal, balances, early))
+        balance = int(balances[-1])
+
+    payment, interest, principal, balances, early = (np.concatenate(column) for column in zip(*parts))
+    return AmortizationSchedule(
+        amount, annual_rate,
+        month=np.arange(1, len(balances) + 1),
+        payment=payment,
+        interest=interest,
+        principal=principal,
+        early_repayment=early,
+        balance=balances
+    )
+
+
+def simulation_grid(amounts, years, annual_rates):
+    """Mensualités et coûts de toutes les combinaisons (montant, durée, taux) en un seul calcul.
+
+    Mêmes montants que amortization_schedule (sans différé ni anticipé) :
+    mensualité arrondie au millime, intérêts arrondis à chaque échéance et
+    dernière échéance ajustée, donc mêmes totaux que l'échéancier et que
+    /loans/simulate. Pour chaque durée, toutes les échéances de tous les
+    scénarios sont calculées d'un bloc (capital restant dû en forme close).
+    Renvoie des tableaux à plat dans l'ordre montant, durée, taux (le taux
+    varie le plus vite), en TND. Lève ValueError si une durée fait moins
+    d'un mois ou plus de MAX_LOAN_YEARS ans.
+    """
+    amount, term, rate = (axis.ravel() for axis in np.meshgrid(
+        np.asarray(amounts, dtype=float),
+        np.asarray(years, dtype=float),
+        np.asarray(annual_rates, dtype=float),
+        indexing='ij'
+    ))
+    months = np.rint(term * 12).astype(np.int64)
+    if months.min() < 1:
+        raise ValueError("La durée doit être d'au moins un mois")
+    if term.max() > MAX_LOAN_YEARS:
+        raise ValueError(f"Durée maximale de {MAX_LOAN_YEARS} ans")
+
+    balance = np.rint(amount * MILLIMES).astype(np.int64)
+    monthly_rate = rate / 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment = np.where(
+            monthly_rate == 0,
+            balance / months,
+            balance * monthly_rate / (1 - (1 + monthly_rate) ** -months)
+        )
+    payment = np.rint(payment).astype(np.int64)
+
+    total_interest = np.zeros(len(balance), dtype=np.int64)
+    for count in np.unique(months):
+        rows = np.flatnonzero(months == count)
+        step = max(1, GRID_CHUNK_CELLS // int(count))
+        for start in range(0, len(rows), step):
+            chunk = rows[start:start + step]
+            total_interest[chunk] = _total_interest(balance[chunk], monthly_rate[chunk], payment[chunk], int(count))
+
+    # La dernière échéance solde le capital : le total versé est le capital plus les intérêts
+    total_payment = balance + total_interest
+    return {
+        'monthly_payment': (payment / MILLIMES).tolist(),
+        'total_payment': (total_payment / MILLIMES).tolist(),
+        'total_interest': (total_interest / MILLIMES).tolist()
+    }
+
+
+def _total_interest(balance, monthly_rate, payment, months):
+    """Intérêts totaux de scénarios de même durée : les lignes de _annuity_rows, une ligne par scénario"""
+    k = np.arange(months)
+    balance, monthly_rate, payment = balance[:, None], monthly_rate[:, None], payment[:, None]
+    growth = (1 + monthly_rate) ** k
+    with np.errstate(divide='ignore', invalid='ignore'):
+        previous = np.where(
+            monthly_rate == 0,
+            balance - payment * k.astype(float),
+            balance * growth - payment * (growth - 1) / monthly_rate
+        )
+    interest = np.rint(np.maximum(previous, 0) * monthly_rate).astype(np.int64)
+    balances = balance - np.cumsum(payment - interest, axis=1)
+
+    # Échéancier arrêté au remboursement complet
+    paid_off = balances <= 0
+    last = np.where(paid_off.any(axis=1), paid_off.argmax(axis=1), months - 1)
+    return np.where(k <= last[:, None], interest, 0).sum(axis=1)
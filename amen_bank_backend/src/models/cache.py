@@ -0,0 +1,276 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # dépendance optionnelle, uniquement pour le cache partagé
+    redis = None
+
+
+class LRUTTLCache:
+    """Cache en mémoire du processus, borné (LRU) et à durée de vie (TTL)"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # Générations par clé, bornées comme les valeurs. Une génération évincée
+        # relève le plancher renvoyé pour les clés absentes : un lecteur qui
+        # l'avait relevée ne peut plus la retrouver identique
+        self._generations = OrderedDict()
+        self._generation_counter = 0
+        self._generation_floor = 0
+
+    def get(self, key):
+        """Valeur en cache, ou None si absente ou expirée"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def generation(self, key):
+        """Génération courante de la clé, à relever avant de lire la source"""
+        with self._lock:
+            return self._generations.get(key, self._generation_floor)
+
+    def bump(self, key):
+        """Invalider la clé : nouvelle génération et valeur oubliée"""
+        with self._lock:
+            self._generation_counter += 1
+            self._generations[key] = self._generation_counter
+            self._generations.move_to_end(key)
+            while len(self._generations) > self.maxsize:
+                _, evicted = self._generations.popitem(last=False)
+                self._generation_floor = max(self._generation_floor, evicted)
+            self._data.pop(key, None)
+
+    def set_if_generation(self, key, generation, value):
+        """Mettre en cache une valeur lue à `generation`, sauf si la clé a été invalidée depuis"""
+        if generation is None:
+            return False
+        with self._lock:
+            if self._generations.get(key, self._generation_floor) != generation:
+                return False
+            self._store(key, value)
+            return True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "local",
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "generations": len(self._generations),
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class RedisCache:
+    """Cache partagé entre workers, stocké dans Redis (valeurs sérialisées en JSON)"""
+
+    # Écrire la valeur seulement si la génération n'a pas changé, atomiquement côté serveur
+    SET_IF_GENERATION = """
+    if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+        return 0
+    end
+    redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+    return 1
+    """
+
+    def __init__(self, url, namespace, ttl=60, generation_ttl=3600):
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+        self.ttl = ttl
+        # Bien plus long que le temps d'une lecture en base : une génération
+        # n'expire pas entre son relevé et la mise en cache qui la compare
+        self.generation_ttl = generation_ttl
+        self._set_if_generation = self.client.register_script(self.SET_IF_GENERATION)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key):
+        return f"amen_bank:{self.namespace}:{key}"
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self._key(key))
+        except redis.RedisError as e:
+            print(f"Erreur cache Redis: {e}")
+            raw = None
+            with self._lock:
+                self.errors += 1
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        try:
+            self.client.set(self._key(key), json.dumps(value), ex=self.ttl)
+        except redis.RedisError as e:
+            print(f"Erreur cache Redis: {e}")
+            with self._lock:
+                self.errors += 1
+
+    def delete(self, key):
+        try:
+            self.client.delete(self._key(key))
+        except redis.RedisError as e:
+            print(f"Erreur cache Redis: {e}")
+            with self._lock:
+                self.errors += 1
+
+    def clear(self):
+        for key in self.client.scan_iter(self._key('*')):
+            self.client.delete(key)
+
+    def _generation_key(self, key):
+        return self._key(f"generation:{key}")
+
+    def generation(self, key):
+        """Génération partagée par tous les workers ; None si Redis est injoignable"""
+        try:
+            raw = self.client.get(self._generation_key(key))
+        except redis.RedisError as e:
+            print(f"Erreur cache Redis: {e}")
+            with self._lock:
+                self.errors += 1
+            return None
+        return int(raw) if raw is not None else 0
+
+    def bump(self, key):
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.incr(self._generation_key(key))
+            pipeline.expire(self._generation_key(key), self.generation_ttl)
+            pipeline.delete(self._key(key))
+            pipeline.execute()
+        except redis.RedisError as e:
+            print(f"Erreur cache Redis: {e}")
+            with self._lock:
+                self.errors += 1
+
+    def set_if_generation(self, key, generation, value):
+        if generation is None:
+            return False
+        try:
+            stored = self._set_if_generation(
+                keys=[self._generation_key(key), self._key(key)],
+                args=[generation, json.dumps(value), self.ttl]
+            )
+        except redis.RedisError as e:
+            print(f"Erreur cache Redis: {e}")
+            with self._lock:
+                self.errors += 1
+            return False
+        return bool(stored)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "redis",
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "errors": self.errors
+            }
+
+
+def make_cache(namespace, maxsize=1024, ttl=60):
+    """Cache local par défaut, partagé (Redis) si CACHE_URL est défini"""
+    url = os.environ.get('CACHE_URL')
+    if url:
+        if redis is not None:
+            return RedisCache(url, namespace, ttl)
+        print("CACHE_URL défini mais le paquet redis n'est pas installé : cache local utilisé")
+    return LRUTTLCache(maxsize, ttl)
+
+
+# Instantanés des comptes par utilisateur (résultat de get_accounts_data)
+account_cache = make_cache(
+    'accounts',
+    maxsize=int(os.environ.get('ACCOUNT_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('ACCOUNT_CACHE_TTL', 60))
+)
+
+# Génération des comptes de chaque utilisateur, tenue par le cache lui-même (Redis
+# INCR quand il est partagé) et incrémentée à chaque invalidation : un lecteur qui
+# a lu la base avant une écriture ne remet pas en cache un solde périmé
+
+def account_generation(user_id):
+    """Génération courante des comptes de l'utilisateur, à relever avant de lire la base"""
+    return account_cache.generation(user_id)
+
+def cache_user_accounts(user_id, generation, result):
+    """Mettre en cache des comptes lus à la génération `generation`, sauf s'ils ont été invalidés depuis"""
+    return account_cache.set_if_generation(user_id, generation, result)
+
+def invalidate_user_accounts(user_id):
+    """À appeler après toute modification de solde d'un compte de l'utilisateur"""
+    account_cache.bump(user_id)
+
+# Caches dérivés des comptes (contexte du chatbot...), à oublier quand un solde change
+# hors du Ledger : sans écriture, leurs listeners d'écriture ne sont pas appelés
+_user_data_invalidators = []
+
+def register_user_data_invalidator(invalidator):
+    if invalidator not in _user_data_invalidators:
+        _user_data_invalidators.append(invalidator)
+
+def invalidate_user_data(user_id):
+    """Solde modifié sans passer par le Ledger : oublier les comptes et ce qui en dérive"""
+    invalidate_user_accounts(user_id)
+    for invalidator in list(_user_data_invalidators):
+        try:
+            invalidator(user_id)
+        except Exception as e:
+            print(f"Erreur lors de l'invalidation des données de l'utilisateur {user_id}: {e}")
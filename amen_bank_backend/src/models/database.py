@@ -1,70 +1,151 @@
 import mysql.connector
 from mysql.connector import Error
 import os
+import time
 from datetime import datetime, date
 from decimal import Decimal
+from flask import g, has_request_context
+from src.models.pool import ConnectionPool
+from src.models.cache import invalidate_user_data
+from src.models.instrumentation import record_query
+from src.models.pricing import monthly_payment
+
+# Configuration de la base de données MySQL (surchargeable par variables d'environnement)
+DB_CONFIG = {
+    'host': os.environ.get('MYSQL80_HOST', 'localhost'),
+    'database': os.environ.get('MYSQL80_DATABASE', 'amen_bank_online'),
+    'user': os.environ.get('MYSQL80_USER', 'root'),
+    'password': os.environ.get('MYSQL80_PASSWORD', '21329467takwa@'),
+    'charset': 'utf8mb4',
+    'collation': 'utf8mb4_unicode_ci'
+}
+
+# Pool de connexions partagé par tout le processus
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+    max_overflow=int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+    timeout=float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    recycle=int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+    pre_ping=os.environ.get('DB_POOL_PRE_PING', '1') != '0'
+)
 
 def get_db_connection():
-    """Fonction utilitaire pour obtenir une connexion à la base de données"""
+    """Fonction utilitaire pour obtenir une connexion à la base de données
+
+    La connexion est empruntée au pool : `close()` la restitue au pool.
+    """
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            database='amen_bank_online',
-            user='root',
-            password='21329467takwa@',  # Mot de passe vide pour le développement local
-            charset='utf8mb4',
-            collation='utf8mb4_unicode_ci'
-        )
-        return connection
+        return db_pool.checkout()
     except Error as e:
         print(f"Erreur lors de la connexion à MySQL: {e}")
         return None
 
+def _acquire_connection():
+    """Connexion liée à la requête Flask courante, ou empruntée au pool hors requête"""
+    if not has_request_context():
+        return db_pool.checkout(), False
+    connection = g.get('_db_connection')
+    if connection is None:
+        connection = db_pool.checkout()
+        g._db_connection = connection
+    return connection, True
+
+def release_request_connection(exception=None):
+    """Restituer au pool la connexion liée à la requête (teardown Flask)"""
+    connection = g.pop('_db_connection', None)
+    if connection is not None:
+        connection.close()
+
+def init_app(app):
+    """Lier le cycle de vie des connexions à celui des requêtes Flask"""
+    app.teardown_request(release_request_connection)
+
 class DatabaseConnection:
     def __init__(self):
         self.connection = None
         self.cursor = None
+        self._request_bound = False
     
     def connect(self):
         try:
-            # Configuration de la base de données MySQL
-            # En production, ces valeurs devraient être dans des variables d'environnement
-            self.connection = mysql.connector.connect(
-                host='localhost',
-                database='amen_bank_online',
-                user='root',
-                password='21329467takwa@',  # Mot de passe vide pour le développement local
-                charset='utf8mb4',
-                collation='utf8mb4_unicode_ci'
-            )
-            
-            if self.connection.is_connected():
-                self.cursor = self.connection.cursor(dictionary=True)
-                print("Connexion à MySQL réussie")
-                return True
+            # Une même requête HTTP réutilise une seule connexion du pool
+            self.connection, self._request_bound = _acquire_connection()
+            self.cursor = self.connection.cursor(dictionary=True)
+            return True
         except Error as e:
             print(f"Erreur lors de la connexion à MySQL: {e}")
             return False
     
     def disconnect(self):
-        if self.connection and self.connection.is_connected():
+        if self.cursor is not None:
             self.cursor.close()
-            self.connection.close()
-            print("Connexion MySQL fermée")
+            self.cursor = None
+        if self.connection is not None:
+            # La connexion liée à la requête est restituée au teardown
+            if not self._request_bound:
+                self.connection.close()
+            self.connection = None
     
-    def execute_query(self, query, params=None):
+    def execute_query(self, query, params=None, commit=True):
+        """Exécuter une requête ; avec commit=False l'écriture reste dans la transaction courante"""
+        start = time.perf_counter()
         try:
             self.cursor.execute(query, params)
             if query.strip().upper().startswith('SELECT'):
-                return self.cursor.fetchall()
+                result = self.cursor.fetchall()
+                rows = len(result)
             else:
-                self.connection.commit()
-                return self.cursor.rowcount
+                if commit:
+                    self.connection.commit()
+                result = rows = self.cursor.rowcount
+            record_query(query, params, time.perf_counter() - start, rows)
+            return result
         except Error as e:
             print(f"Erreur lors de l'exécution de la requête: {e}")
+            record_query(query, params, time.perf_counter() - start, 0, error=e)
             self.connection.rollback()
             return None
 
+    def stream_query(self, query, params=None, chunk_size=500):
+        """Lire un SELECT par paquets via un curseur non bufferisé.
+
+        Générateur de listes de lignes : le résultat complet n'est jamais
+        chargé en mémoire. La connexion ne doit pas servir à d'autres requêtes
+        tant que le générateur n'est pas épuisé ou fermé.
+        """
+        cursor = self.connection.cursor(dictionary=True, buffered=False)
+        exhausted = False
+        start = time.perf_counter()
+        total_rows = 0
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    exhausted = True
+                    break
+                total_rows += len(rows)
+                yield rows
+        finally:
+            record_query(query, params, time.perf_counter() - start, total_rows)
+            try:
+                if not exhausted:
+                    # Arrêt anticipé (client déconnecté) : vider le résultat restant
+                    self.connection.consume_results()
+                cursor.close()
+            except Error as e:
+                print(f"Erreur lors de la fermeture du curseur: {e}")
+
+    def last_insert_id(self):
+        return self.cursor.lastrowid
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
 class User:
     def __init__(self, db_connection):
         self.db = db_connection
@@ -94,6 +175,11 @@ class Account:
         query = "SELECT * FROM accounts WHERE user_id = %s"
         return self.db.execute_query(query, (user_id,))
     
+    def get_by_id(self, account_id):
+        query = "SELECT * FROM accounts WHERE account_id = %s"
+        result = self.db.execute_query(query, (account_id,))
+        return result[0] if result else None
+    
     def get_by_account_number(self, account_number):
         query = "SELECT * FROM accounts WHERE account_number = %s"
         result = self.db.execute_query(query, (account_number,))
@@ -101,35 +187,189 @@ class Account:
     
     def update_balance(self, account_id, new_balance):
         query = "UPDATE accounts SET current_balance = %s WHERE account_id = %s"
-        return self.db.execute_query(query, (new_balance, account_id))
+        result = self.db.execute_query(query, (new_balance, account_id))
+        if result:
+            owner = self.db.execute_query("SELECT user_id FROM accounts WHERE account_id = %s", (account_id,))
+            if owner:
+                invalidate_user_data(owner[0]["user_id"])
+        return result
+
+# Clé de pagination des transactions sans date : en ordre décroissant MySQL range les NULL
+# après toutes les autres lignes ; le curseur les représente par le plus petit DATETIME
+NULL_TRANSACTION_DATE = datetime(1000, 1, 1)
+
+def transaction_key(transaction):
+    """Clé de pagination (date, id) d'une transaction, jamais NULL"""
+    return (transaction['transaction_date'] or NULL_TRANSACTION_DATE, transaction['transaction_id'])
+
+def _transaction_keyset(after, params):
+    """Condition des transactions qui suivent la clé `after` dans l'ordre date DESC, id DESC"""
+    if after[0] == NULL_TRANSACTION_DATE:
+        params.append(after[1])
+        return "AND transaction_date IS NULL AND transaction_id < %s"
+    params += [after[0], after[0], after[1]]
+    return "AND (transaction_date < %s OR (transaction_date = %s AND transaction_id < %s) OR transaction_date IS NULL)"
 
 class Transaction:
     def __init__(self, db_connection):
         self.db = db_connection
 
-    def get_by_account_id(self, account_id, limit=50):
+    def get_by_account_id(self, account_id, limit=50, after=None):
+        """Transactions du compte, des plus récentes aux plus anciennes.
+
+        `after` est la clé (transaction_date, transaction_id) de la dernière
+        ligne de la page précédente (pagination par clé, voir transaction_key).
+        """
+        params = [account_id]
+        keyset = _transaction_keyset(after, params) if after else ""
         query = f"""
         SELECT * FROM transactions 
-        WHERE account_id = %s 
-        ORDER BY transaction_date DESC 
+        WHERE account_id = %s {keyset}
+        ORDER BY transaction_date DESC, transaction_id DESC 
         LIMIT {int(limit)}
         """
-        return self.db.execute_query(query, (account_id,))
+        return self.db.execute_query(query, tuple(params))
+
+    def iter_by_account_id(self, account_id, date_from=None, date_to=None, chunk_size=500):
+        """Parcourir les transactions du compte par ordre chronologique, par paquets"""
+        params = [account_id]
+        filters = ""
+        if date_from:
+            filters += " AND transaction_date >= %s"
+            params.append(date_from)
+        if date_to:
+            filters += " AND transaction_date < %s"
+            params.append(date_to)
+        query = f"""
+        SELECT * FROM transactions
+        WHERE account_id = %s{filters}
+        ORDER BY transaction_date, transaction_id
+        """
+        return self.db.stream_query(query, tuple(params), chunk_size)
 
-    def create(self, account_id, description, transaction_type, amount, debit_credit_indicator, piece_number=None, value_date=None):
+    def search(self, account_id, match_expression=None, piece_numbers=(), limit=50, after=None):
+        """Transactions du compte dont le libellé correspond à `match_expression`
+        (FULLTEXT, mode booléen) ou dont le numéro de pièce figure dans `piece_numbers`.
+
+        Même ordre et même pagination par clé que get_by_account_id.
+        """
+        params = [account_id]
+        conditions = []
+        if match_expression:
+            conditions.append("MATCH(description) AGAINST (%s IN BOOLEAN MODE)")
+            params.append(match_expression)
+        if piece_numbers:
+            conditions.append(f"piece_number IN ({', '.join(['%s'] * len(piece_numbers))})")
+            params += list(piece_numbers)
+        keyset = _transaction_keyset(after, params) if after else ""
+        query = f"""
+        SELECT * FROM transactions
+        WHERE account_id = %s AND ({' OR '.join(conditions)}) {keyset}
+        ORDER BY transaction_date DESC, transaction_id DESC
+        LIMIT {int(limit)}
+        """
+        return self.db.execute_query(query, tuple(params))
+
+    def create(self, account_id, description, transaction_type, amount, debit_credit_indicator, piece_number=None, value_date=None, commit=True):
         query = """
         INSERT INTO transactions (account_id, description, transaction_type, amount, debit_credit_indicator, piece_number, value_date)
         VALUES (%s, %s, %s, %s, %s, %s, %s)
         """
-        return self.db.execute_query(query, (account_id, description, transaction_type, amount, debit_credit_indicator, piece_number, value_date))
+        return self.db.execute_query(query, (account_id, description, transaction_type, amount, debit_credit_indicator, piece_number, value_date), commit=commit)
+
+class MonthlyRollup:
+    """Agrégats mensuels des transactions par (compte, mois, type, sens).
+
+    Tenus à jour par Ledger.post après le commit de chaque écriture : un
+    échec de l'agrégat n'annule jamais l'écriture, le compte est alors
+    recalculé. `python -m src.models.rollups migrate` crée la table sur une
+    base existante et reconstruit l'historique.
+    """
+
+    def __init__(self, db_connection):
+        self.db = db_connection
+
+    def add_transaction(self, transaction_id, commit=True):
+        """Ajouter une transaction déjà insérée à son agrégat (mois de sa date d'opération)"""
+        query = """
+        INSERT INTO monthly_rollups (account_id, month, transaction_type, debit_credit_indicator, total_amount, transaction_count)
+        SELECT t.account_id, DATE_FORMAT(t.transaction_date, '%%Y-%%m-01'), t.transaction_type, t.debit_credit_indicator, t.amount, 1
+        FROM transactions t
+        WHERE t.transaction_id = %s
+        ON DUPLICATE KEY UPDATE
+            total_amount = monthly_rollups.total_amount + t.amount,
+            transaction_count = monthly_rollups.transaction_count + 1
+        """
+        return self.db.execute_query(query, (transaction_id,), commit=commit)
+
+    def apply(self, transaction_id, account_id):
+        """Reporter une transaction validée ; en cas d'échec, recalculer tout le compte.
+
+        Renvoie False si le compte reste à reconstruire par `backfill`.
+        """
+        if self.add_transaction(transaction_id) is not None:
+            return True
+        print(f"Agrégat mensuel non mis à jour pour la transaction {transaction_id}, recalcul du compte {account_id}")
+        if self.rebuild_account(account_id) is not None:
+            return True
+        print(f"Agrégats du compte {account_id} à reconstruire : python -m src.models.rollups backfill --account {account_id}")
+        return False
+
+    def rebuild_account(self, account_id):
+        """Recalculer tous les agrégats du compte depuis ses transactions, en une transaction SQL"""
+        deleted = self.db.execute_query("DELETE FROM monthly_rollups WHERE account_id = %s", (account_id,), commit=False)
+        if deleted is None:
+            return None
+        query = """
+        INSERT INTO monthly_rollups (account_id, month, transaction_type, debit_credit_indicator, total_amount, transaction_count)
+        SELECT account_id, DATE_FORMAT(transaction_date, '%%Y-%%m-01') AS month, transaction_type, debit_credit_indicator,
+               SUM(amount), COUNT(*)
+        FROM transactions
+        WHERE account_id = %s
+        GROUP BY account_id, month, transaction_type, debit_credit_indicator
+        """
+        return self.db.execute_query(query, (account_id,))
+
+    def get_by_account_id(self, account_id, month_from, month_to):
+        """Agrégats du compte pour les mois [month_from, month_to] (premiers jours de mois)"""
+        query = """
+        SELECT month, transaction_type, debit_credit_indicator, total_amount, transaction_count
+        FROM monthly_rollups
+        WHERE account_id = %s AND month >= %s AND month <= %s
+        ORDER BY month, transaction_type, debit_credit_indicator
+        """
+        return self.db.execute_query(query, (account_id, month_from, month_to))
+
+    def get_user_totals(self, user_id, month_from, month_to):
+        """Totaux débit / crédit par mois et par type, tous comptes de l'utilisateur confondus"""
+        query = """
+        SELECT r.month, r.transaction_type, r.debit_credit_indicator,
+               SUM(r.total_amount) AS total_amount, SUM(r.transaction_count) AS transaction_count
+        FROM monthly_rollups r
+        JOIN accounts a ON r.account_id = a.account_id
+        WHERE a.user_id = %s AND r.month >= %s AND r.month <= %s
+        GROUP BY r.month, r.transaction_type, r.debit_credit_indicator
+        ORDER BY r.month
+        """
+        return self.db.execute_query(query, (user_id, month_from, month_to))
 
 class Beneficiary:
     def __init__(self, db_connection):
         self.db = db_connection
     
-    def get_by_user_id(self, user_id):
-        query = "SELECT * FROM beneficiaries WHERE user_id = %s"
-        return self.db.execute_query(query, (user_id,))
+    def get_by_user_id(self, user_id, limit=50, after=None):
+        params = [user_id]
+        keyset = ""
+        if after:
+            keyset = "AND beneficiary_id > %s"
+            params.append(after[0])
+        query = f"""
+        SELECT * FROM beneficiaries
+        WHERE user_id = %s {keyset}
+        ORDER BY beneficiary_id
+        LIMIT {int(limit)}
+        """
+        return self.db.execute_query(query, tuple(params))
     
     def create(self, user_id, full_name, bank_name, account_number, rib=None):
         query = """
@@ -142,22 +382,28 @@ class Transfer:
     def __init__(self, db_connection):
         self.db = db_connection
     
-    def create(self, from_account_id, to_account_number, beneficiary_name, amount, is_scheduled=False, schedule_frequency=None, next_execution_date=None):
+    def create(self, from_account_id, to_account_number, beneficiary_name, amount, is_scheduled=False, schedule_frequency=None, next_execution_date=None, status='PENDING', commit=True):
         query = """
-        INSERT INTO transfers (from_account_id, to_account_number, beneficiary_name, amount, is_scheduled, schedule_frequency, next_execution_date)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO transfers (from_account_id, to_account_number, beneficiary_name, amount, is_scheduled, schedule_frequency, next_execution_date, status)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """
-        return self.db.execute_query(query, (from_account_id, to_account_number, beneficiary_name, amount, is_scheduled, schedule_frequency, next_execution_date))
+        return self.db.execute_query(query, (from_account_id, to_account_number, beneficiary_name, amount, is_scheduled, schedule_frequency, next_execution_date, status), commit=commit)
     
-    def get_by_user_id(self, user_id):
-        query = """
+    def get_by_user_id(self, user_id, limit=50, after=None):
+        params = [user_id]
+        keyset = ""
+        if after:
+            keyset = "AND (t.transfer_date < %s OR (t.transfer_date = %s AND t.transfer_id < %s))"
+            params += [after[0], after[0], after[1]]
+        query = f"""
         SELECT t.*, a.account_number as from_account_number
         FROM transfers t
         JOIN accounts a ON t.from_account_id = a.account_id
-        WHERE a.user_id = %s
-        ORDER BY t.transfer_date DESC
+        WHERE a.user_id = %s {keyset}
+        ORDER BY t.transfer_date DESC, t.transfer_id DESC
+        LIMIT {int(limit)}
         """
-        return self.db.execute_query(query, (user_id,))
+        return self.db.execute_query(query, tuple(params))
     
     def update_status(self, transfer_id, status):
         query = "UPDATE transfers SET status = %s WHERE transfer_id = %s"
@@ -167,25 +413,60 @@ class LoanApplication:
     def __init__(self, db_connection):
         self.db = db_connection
     
-    def create(self, user_id, requested_amount, loan_term_years, monthly_payment_simulation=None):
+    def create(self, user_id, requested_amount, loan_term_years, monthly_payment_simulation=None, assessment=None):
+        """Enregistrer la demande, avec son évaluation de solvabilité si elle est disponible"""
+        assessment = assessment or {}
         query = """
-        INSERT INTO loan_applications (user_id, requested_amount, loan_term_years, monthly_payment_simulation)
-        VALUES (%s, %s, %s, %s)
+        INSERT INTO loan_applications (user_id, requested_amount, loan_term_years, monthly_payment_simulation,
+                                       monthly_income, recurring_debits, debt_to_income,
+                                       affordability_score, affordability_decision, scored_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
-        return self.db.execute_query(query, (user_id, requested_amount, loan_term_years, monthly_payment_simulation))
+        created = self.db.execute_query(query, (
+            user_id, requested_amount, loan_term_years, monthly_payment_simulation,
+            assessment.get('monthly_income'), assessment.get('recurring_debits'), assessment.get('debt_to_income'),
+            assessment.get('score'), assessment.get('decision'), assessment.get('scored_at')
+        ))
+        return self.db.last_insert_id() if created else None
     
-    def get_by_user_id(self, user_id):
-        query = "SELECT * FROM loan_applications WHERE user_id = %s ORDER BY application_date DESC"
-        return self.db.execute_query(query, (user_id,))
+    def update_assessment(self, application_id, assessment):
+        query = """
+        UPDATE loan_applications
+        SET monthly_income = %s, recurring_debits = %s, debt_to_income = %s,
+            affordability_score = %s, affordability_decision = %s, scored_at = %s
+        WHERE application_id = %s
+        """
+        return self.db.execute_query(query, (
+            assessment['monthly_income'], assessment['recurring_debits'], assessment['debt_to_income'],
+            assessment['score'], assessment['decision'], assessment['scored_at'], application_id
+        ))
+    
+    def get_pending(self, after_id=0, limit=50):
+        """Demandes PENDING par ordre d'identifiant, à partir de `after_id` exclu"""
+        query = f"""
+        SELECT application_id, user_id, monthly_payment_simulation
+        FROM loan_applications
+        WHERE status = 'PENDING' AND application_id > %s
+        ORDER BY application_id
+        LIMIT {int(limit)}
+        """
+        return self.db.execute_query(query, (after_id,))
+    
+    def get_by_user_id(self, user_id, limit=50, after=None):
+        params = [user_id]
+        keyset = ""
+        if after:
+            keyset = "AND (application_date < %s OR (application_date = %s AND application_id < %s))"
+            params += [after[0], after[0], after[1]]
+        query = f"""
+        SELECT * FROM loan_applications
+        WHERE user_id = %s {keyset}
+        ORDER BY application_date DESC, application_id DESC
+        LIMIT {int(limit)}
+        """
+        return self.db.execute_query(query, tuple(params))
     
     def calculate_monthly_payment(self, amount, years, annual_rate=0.07):
-        """Calcul de la mensualité d'un crédit"""
-        monthly_rate = annual_rate / 12
-        num_payments = years * 12
-        
-        if monthly_rate == 0:
-            return amount / num_payments
-        
-        monthly_payment = amount * (monthly_rate * (1 + monthly_rate)**num_payments) / ((1 + monthly_rate)**num_payments - 1)
-        return round(monthly_payment, 3)
+        """Calcul de la mensualité d'un crédit (voir src.models.pricing, sans accès à la base)"""
+        return monthly_payment(amount, years, annual_rate)
 
@@ -0,0 +1,163 @@
+import logging
+import os
+import re
+import time
+from functools import lru_cache
+from flask import g, has_request_context, request
+
+# Fonctions appelées après chaque requête SQL avec un QueryEvent
+_hooks = []
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    """Levée quand un endpoint dépasse son budget de requêtes SQL (mode 'raise')"""
+
+
+class QueryEvent:
+    """Mesure d'une requête SQL exécutée par DatabaseConnection"""
+
+    def __init__(self, statement, params, duration, rows, error=None):
+        self.statement = statement
+        self.params = params
+        self.duration = duration
+        self.rows = rows
+        self.error = error
+
+    @property
+    def normalized(self):
+        return normalize_statement(self.statement)
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(statement):
+    """Texte de la requête sans valeurs littérales, pour regrouper les requêtes identiques"""
+    normalized = _STRING_LITERAL.sub('?', statement)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _PLACEHOLDER.sub('?', normalized)
+    normalized = _IN_LIST.sub('(?)', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+
+def register_hook(hook):
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+def unregister_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+def record_query(statement, params, duration, rows, error=None):
+    """Notifier les hooks ; appelé par DatabaseConnection après chaque requête"""
+    if not _hooks:
+        return
+    event = QueryEvent(statement, params, duration, rows, error)
+    for hook in list(_hooks):
+        try:
+            hook(event)
+        except QueryBudgetExceeded:
+            raise
+        except Exception as e:
+            print(f"Erreur dans un hook d'instrumentation SQL: {e}")
+
+
+def request_query_stats(event):
+    """Agréger le nombre de requêtes et le temps SQL de la requête HTTP courante"""
+    if not has_request_context():
+        return
+    stats = g.get('_query_stats')
+    if stats is None:
+        stats = g._query_stats = {"count": 0, "time": 0.0, "statements": {}}
+    stats["count"] += 1
+    stats["time"] += event.duration
+    normalized = event.normalized
+    stats["statements"][normalized] = stats["statements"].get(normalized, 0) + 1
+
+def get_request_query_stats():
+    if not has_request_context():
+        return None
+    return g.get('_query_stats')
+
+
+class SlowQueryLog:
+    """Journaliser les requêtes plus lentes que `threshold_ms`"""
+
+    def __init__(self, threshold_ms=200, path=None):
+        self.threshold = threshold_ms / 1000
+        self.logger = logging.getLogger('amen_bank.slow_queries')
+        self.logger.setLevel(logging.WARNING)
+        if path and not self.logger.handlers:
+            handler = logging.FileHandler(path, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self.logger.addHandler(handler)
+
+    def __call__(self, event):
+        if event.duration < self.threshold:
+            return
+        endpoint = request.endpoint if has_request_context() else None
+        self.logger.warning(
+            "%.1f ms rows=%s endpoint=%s %s",
+            event.duration * 1000, event.rows, endpoint, event.normalized
+        )
+
+
+class QueryBudget:
+    """Nombre maximal de requêtes SQL par requête HTTP.
+
+    `per_endpoint` surcharge la limite par nom d'endpoint Flask
+    (ex. {'chatbot.chat': 3}). En mode 'warn' le dépassement est journalisé,
+    en mode 'raise' il lève QueryBudgetExceeded (utile dans les tests).
+    """
+
+    def __init__(self, max_queries=None, per_endpoint=None, mode='warn'):
+        self.max_queries = max_queries
+        self.per_endpoint = per_endpoint or {}
+        self.mode = mode
+        self.logger = logging.getLogger('amen_bank.query_budget')
+
+    def limit_for(self, endpoint):
+        return self.per_endpoint.get(endpoint, self.max_queries)
+
+    def check(self, endpoint, stats):
+        limit = self.limit_for(endpoint)
+        if limit is None or stats is None or stats["count"] <= limit:
+            return
+        message = f"{endpoint}: {stats['count']} requêtes SQL pour un budget de {limit}"
+        if self.mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        self.logger.warning(message)
+
+
+def init_app(app, budget=None):
+    """Activer l'instrumentation SQL selon les variables d'environnement.
+
+    SLOW_QUERY_MS / SLOW_QUERY_LOG : seuil et fichier du journal des requêtes lentes
+    QUERY_BUDGET / QUERY_BUDGET_MODE : budget par requête HTTP ('warn' ou 'raise')
+    """
+    register_hook(request_query_stats)
+    register_hook(SlowQueryLog(
+        threshold_ms=float(os.environ.get('SLOW_QUERY_MS', 200)),
+        path=os.environ.get('SLOW_QUERY_LOG')
+    ))
+
+    if budget is None and os.environ.get('QUERY_BUDGET'):
+        budget = QueryBudget(
+            max_queries=int(os.environ['QUERY_BUDGET']),
+            mode=os.environ.get('QUERY_BUDGET_MODE', 'warn')
+        )
+    app.extensions['query_budget'] = budget
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = get_request_query_stats()
+        if stats:
+            response.headers['X-DB-Query-Count'] = str(stats["count"])
+            response.headers['X-DB-Time-Ms'] = f"{stats['time'] * 1000:.1f}"
+        if budget is not None:
+            budget.check(request.endpoint, stats)
+        return response
@@ -0,0 +1,154 @@
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from mysql.connector import Error
+from src.models.database import MonthlyRollup, Transaction, Transfer
+from src.models.cache import invalidate_user_accounts
+
+MILLIME = Decimal('0.001')
+
+# Fonctions appelées après chaque écriture validée, avec un dict décrivant l'écriture
+_posting_listeners = []
+
+def register_posting_listener(listener):
+    if listener not in _posting_listeners:
+        _posting_listeners.append(listener)
+
+def unregister_posting_listener(listener):
+    if listener in _posting_listeners:
+        _posting_listeners.remove(listener)
+
+def _notify_posting(posting):
+    for listener in list(_posting_listeners):
+        try:
+            listener(posting)
+        except Exception as e:
+            print(f"Erreur dans un listener d'écriture: {e}")
+
+def to_amount(value):
+    """Convertir un montant en Decimal arrondi au millime"""
+    return Decimal(str(value)).quantize(MILLIME, rounding=ROUND_HALF_UP)
+
+class Ledger:
+    """Moteur de passation des écritures.
+
+    Chaque opération (dépôt, retrait, virement) est passée dans une seule
+    transaction SQL : mise à jour conditionnelle du solde, écriture dans
+    `transactions`, éventuellement insertion du virement, puis un unique
+    commit. Le contrôle de solde est fait par MySQL dans l'UPDATE, ce qui
+    verrouille la ligne du compte et évite les mises à jour perdues entre
+    opérations concurrentes. L'agrégat mensuel est mis à jour après le
+    commit, sans pouvoir faire échouer l'écriture.
+    """
+
+    def __init__(self, db_connection):
+        self.db = db_connection
+
+    def post(self, account_id, amount, debit_credit_indicator, description, transaction_type, user_id=None, transfer=None):
+        """Passer une écriture au crédit ('C') ou au débit ('D') d'un compte.
+
+        `user_id` restreint l'opération aux comptes de cet utilisateur.
+        `transfer` (dict des champs de `Transfer.create`) insère le virement
+        associé, déjà marqué COMPLETED, dans la même transaction.
+        """
+        amount = to_amount(amount)
+
+        try:
+            if debit_credit_indicator == 'D':
+                query = """
+                UPDATE accounts SET current_balance = current_balance - %s
+                WHERE account_id = %s AND current_balance >= %s
+                """
+                params = [amount, account_id, amount]
+            else:
+                query = """
+                UPDATE accounts SET current_balance = current_balance + %s
+                WHERE account_id = %s
+                """
+                params = [amount, account_id]
+
+            if user_id is not None:
+                query += " AND user_id = %s"
+                params.append(user_id)
+
+            updated = self.db.execute_query(query, tuple(params), commit=False)
+            if updated is None:
+                return {"success": False, "error": "Erreur lors de la mise à jour du solde"}
+            if updated == 0:
+                self.db.rollback()
+                return {"success": False, "error": self._rejection_reason(account_id, user_id)}
+
+            # La ligne est verrouillée par l'UPDATE : ce solde est celui que nous venons d'écrire
+            account = self.db.execute_query(
+                "SELECT current_balance, user_id FROM accounts WHERE account_id = %s",
+                (account_id,)
+            )
+            if not account:
+                return {"success": False, "error": "Erreur lors de la lecture du solde"}
+
+            transfer_id = None
+            if transfer is not None:
+                created = Transfer(self.db).create(
+                    account_id,
+                    transfer["to_account_number"],
+                    transfer["beneficiary_name"],
+                    amount,
+                    transfer.get("is_scheduled", False),
+                    transfer.get("schedule_frequency"),
+                    transfer.get("next_execution_date"),
+                    status="COMPLETED",
+                    commit=False
+                )
+                if not created:
+                    return {"success": False, "error": "Erreur lors de la création du virement"}
+                transfer_id = self.db.last_insert_id()
+
+            created = Transaction(self.db).create(
+                account_id,
+                description,
+                transaction_type,
+                amount,
+                debit_credit_indicator,
+                commit=False
+            )
+            if not created:
+                return {"success": False, "error": "Erreur lors de l'enregistrement de la transaction"}
+            transaction_id = self.db.last_insert_id()
+
+            self.db.commit()
+
+        except Error as e:
+            print(f"Erreur lors de la passation de l'écriture: {e}")
+            self.db.rollback()
+            return {"success": False, "error": "Erreur lors de la passation de l'écriture"}
+
+        # Hors de la transaction : un agrégat en échec ne doit pas annuler l'écriture
+        MonthlyRollup(self.db).apply(transaction_id, account_id)
+        # Invalider après le commit pour ne pas remettre en cache l'ancien solde
+        invalidate_user_accounts(account[0]["user_id"])
+        _notify_posting({
+            "user_id": account[0]["user_id"],
+            "account_id": account_id,
+            "amount": float(amount),
+            "debit_credit_indicator": debit_credit_indicator,
+            "description": description,
+            "transaction_type": transaction_type,
+            "transaction_date": datetime.now().replace(microsecond=0),
+            "new_balance": float(account[0]["current_balance"])
+        })
+
+        return {
+            "success": True,
+            "account_id": account_id,
+            "user_id": account[0]["user_id"],
+            "new_balance": float(account[0]["current_balance"]),
+            "transfer_id": transfer_id
+        }
+
+    def _rejection_reason(self, account_id, user_id):
+        """Expliquer pourquoi l'UPDATE conditionnel n'a touché aucune ligne"""
+        result = self.db.execute_query("SELECT user_id FROM accounts WHERE account_id = %s", (account_id,))
+        if not result:
+            return "Compte non trouvé"
+        if user_id is not None and result[0]["user_id"] != user_id:
+            return "Compte non trouvé ou n'appartient pas à l'utilisateur"
+        return "Solde insuffisant"
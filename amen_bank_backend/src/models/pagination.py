@@ -0,0 +1,55 @@
+import base64
+import json
+from datetime import date, datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(values):
+    """Encoder la clé de tri de la dernière ligne en curseur opaque"""
+    payload = []
+    for value in values:
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+        payload.append(value)
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, size):
+    """Décoder un curseur ; lève ValueError s'il est invalide"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError("Curseur invalide")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Curseur invalide")
+    if any(not isinstance(value, (str, int)) or isinstance(value, bool) for value in values):
+        raise ValueError("Curseur invalide")
+    return values
+
+def decode_datetime_key(after):
+    """Clé (date, id) d'un curseur décodé, date convertie ; lève ValueError si elle est invalide"""
+    try:
+        return datetime.fromisoformat(after[0]), int(after[1])
+    except (TypeError, ValueError):
+        raise ValueError("Curseur invalide")
+
+def parse_page_args(args, key_size, default_limit=DEFAULT_PAGE_SIZE):
+    """Lire `limit` et `cursor` depuis les paramètres de la requête"""
+    limit = args.get('limit', default_limit, type=int)
+    if limit is None or limit <= 0:
+        raise ValueError("Le paramètre limit doit être positif")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    cursor = args.get('cursor')
+    after = decode_cursor(cursor, key_size) if cursor else None
+    return limit, after
+
+def paginate(rows, limit, key):
+    """Découper une page lue avec `limit + 1` lignes et calculer le curseur suivant"""
+    rows = rows or []
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
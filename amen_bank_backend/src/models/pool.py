@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+
+
+class PoolTimeoutError(Error):
+    """Levée lorsqu'aucune connexion n'est disponible avant l'expiration du délai"""
+
+
+class PooledConnection:
+    """Connexion empruntée au pool.
+
+    Se comporte comme la connexion MySQL sous-jacente, mais `close()` la
+    rend au pool au lieu de fermer la socket.
+    """
+
+    def __init__(self, pool, connection, created_at):
+        self._pool = pool
+        self._connection = connection
+        self.created_at = created_at
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    @property
+    def raw_connection(self):
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool._release(connection, self.created_at)
+
+
+class ConnectionPool:
+    """Pool de connexions MySQL thread-safe.
+
+    - `pool_size` connexions sont conservées ouvertes au repos
+    - jusqu'à `max_overflow` connexions supplémentaires peuvent être ouvertes
+      en pointe ; elles sont fermées dès leur restitution
+    - un emprunt attend au plus `timeout` secondes qu'une connexion se libère
+    - les connexions plus vieilles que `recycle` secondes sont renouvelées
+    - avec `pre_ping`, chaque connexion est vérifiée avant d'être prêtée
+    """
+
+    def __init__(self, connect_args, pool_size=5, max_overflow=10, timeout=30, recycle=3600, pre_ping=True):
+        self.connect_args = dict(connect_args)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._idle = deque()
+        self._lock = threading.Condition()
+        self._opened = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+        self._timeouts = 0
+        self._recycled = 0
+        self._ping_failures = 0
+
+    def _create(self):
+        connection = mysql.connector.connect(**self.connect_args)
+        return connection, time.monotonic()
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def _is_usable(self, connection, created_at):
+        if self.recycle is not None and self.recycle >= 0 and time.monotonic() - created_at > self.recycle:
+            self._recycled += 1
+            return False
+        if self.pre_ping:
+            try:
+                connection.ping(reconnect=False)
+            except Error:
+                self._ping_failures += 1
+                return False
+        return True
+
+    def checkout(self):
+        """Emprunter une connexion au pool"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        with self._lock:
+            while True:
+                if self._idle:
+                    connection, created_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._opened < self.pool_size + self.max_overflow:
+                    # Réserver la place avant d'ouvrir la connexion hors verrou
+                    self._opened += 1
+                    self._in_use += 1
+                    connection = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Aucune connexion disponible après {self.timeout}s "
+                        f"(taille {self.pool_size}, débordement {self.max_overflow})"
+                    )
+                self._waiting += 1
+                try:
+                    self._lock.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        try:
+            if connection is not None and not self._is_usable(connection, created_at):
+                self._discard(connection)
+                connection = None
+            if connection is None:
+                connection, created_at = self._create()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+
+        return PooledConnection(self, connection, created_at)
+
+    def _release(self, connection, created_at):
+        # Ne jamais rendre au pool une transaction entamée
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            keep = connection.is_connected()
+        except Error:
+            keep = False
+
+        with self._lock:
+            self._in_use -= 1
+            if keep and len(self._idle) < self.pool_size:
+                self._idle.append((connection, created_at))
+                connection = None
+            else:
+                self._opened -= 1
+            self._lock.notify()
+
+        if connection is not None:
+            self._discard(connection)
+
+    def dispose(self):
+        """Fermer toutes les connexions au repos"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+            self._opened -= len(idle)
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        """Statistiques du pool pour la supervision"""
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "opened": self._opened,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "checkout_timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "ping_failures": self._ping_failures,
+                "checkout_time_avg_ms": round(self._checkout_time_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "checkout_time_max_ms": round(self._checkout_time_max * 1000, 3)
+            }
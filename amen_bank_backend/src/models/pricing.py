@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from src.models.amortization import MAX_LOAN_YEARS, MILLIMES, annuity_payment
+
+DEFAULT_RATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loan_rates.json')
+
+
+@lru_cache(maxsize=4096)
+def monthly_payment(amount, years, annual_rate):
+    """Mensualité d'un crédit à échéances constantes, arrondie au millime (mémoïsée).
+
+    Même calcul que l'échéancier et la grille : nombre d'échéances arrondi
+    au mois, montant et mensualité en millimes entiers.
+    """
+    num_payments = round(years * 12)
+    if num_payments < 1:
+        raise ValueError("La durée doit être d'au moins un mois")
+    if years > MAX_LOAN_YEARS:
+        raise ValueError(f"Durée maximale de {MAX_LOAN_YEARS} ans")
+    balance = round(amount * MILLIMES)
+    return round(annuity_payment(balance, annual_rate / 12, num_payments)) / MILLIMES
+
+
+class RateTable:
+    """Grille des taux de crédit, lue depuis un fichier JSON.
+
+    Le fichier est relu quand sa date de modification change (vérifiée au
+    plus toutes les `check_interval` secondes) : une nouvelle grille est prise
+    en compte sans redémarrage. Si la nouvelle version est invalide, la
+    précédente reste en service.
+    """
+
+    def __init__(self, path=None, check_interval=1.0):
+        self.path = path or DEFAULT_RATES_PATH
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._table = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self.reloads = 0
+
+    def current(self):
+        """Grille en vigueur (rechargée si le fichier a changé)"""
+        now = time.monotonic()
+        if self._table is not None and now - self._checked_at < self.check_interval:
+            return self._table
+        with self._lock:
+            if self._table is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                self._reload_if_changed()
+        if self._table is None:
+            raise ValueError("Grille des taux indisponible")
+        return self._table
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return
+            with open(self.path, encoding='utf-8') as f:
+                table = json.load(f)
+            _validate(table)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Erreur lors du chargement de la grille des taux {self.path}: {e}")
+            return
+        self._table, self._mtime = table, mtime
+        self.reloads += 1
+
+    def rate(self, product, years):
+        """Taux annuel du produit pour une durée en années ; ValueError hors grille.
+
+        Sans produit, le produit par défaut s'il couvre la durée, sinon le
+        premier produit de la grille qui la couvre (crédit immobilier pour
+        les durées longues).
+        """
+        table = self.current()
+        product = product or _product_for_term(table, years)
+        if product not in table['products']:
+            raise ValueError(f"Produit de crédit inconnu: {product}")
+        entry = table['products'][product]
+        for tier in entry['tiers']:
+            if years <= tier['max_years']:
+                return tier['rate']
+        raise ValueError(f"Durée maximale de {entry['tiers'][-1]['max_years']} ans pour {entry['name']}")
+
+    def summary(self):
+        """Taux minimum et maximum par produit, en pourcentage"""
+        table = self.current()
+        rates = {}
+        for product, entry in table['products'].items():
+            tier_rates = [tier['rate'] for tier in entry['tiers']]
+            rates[product] = {
+                'name': entry['name'],
+                'min_rate': round(min(tier_rates) * 100, 3),
+                'max_rate': round(max(tier_rates) * 100, 3),
+                'max_years': entry['tiers'][-1]['max_years'],
+                'currency': table['currency']
+            }
+        return {'rates': rates, 'last_updated': table['last_updated']}
+
+
+def _product_for_term(table, years):
+    """Produit à appliquer quand le client n'en précise pas"""
+    max_years = {product: entry['tiers'][-1]['max_years'] for product, entry in table['products'].items()}
+    for product in [table['default_product']] + list(max_years):
+        if years <= max_years[product]:
+            return product
+    # Hors grille : l'erreur indique la durée maximale possible
+    return max(max_years, key=max_years.get)
+
+
+def _validate(table):
+    """Lever ValueError si la grille est incomplète ou mal ordonnée"""
+    if table['default_product'] not in table['products']:
+        raise ValueError("Produit par défaut absent de la grille")
+    for product, entry in table['products'].items():
+        bounds = [tier['max_years'] for tier in entry['tiers']]
+        if not bounds or bounds != sorted(bounds):
+            raise ValueError(f"Paliers de durée absents ou non triés pour {product}")
+        if any(not 0 <= tier['rate'] < 1 for tier in entry['tiers']):
+            raise ValueError(f"Taux invalide pour {product}")
+
+
+def pricing_stats():
+    info = monthly_payment.cache_info()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+        'rate_table_reloads': rate_table.reloads
+    }
+
+
+# LOAN_RATES_FILE : chemin de la grille des taux (par défaut loan_rates.json à côté de ce module)
+rate_table = RateTable(os.environ.get('LOAN_RATES_FILE'))
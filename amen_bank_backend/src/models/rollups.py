@@ -0,0 +1,108 @@
+import argparse
+import sys
+from datetime import date
+from src.models.database import DatabaseConnection, MonthlyRollup
+
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    account_id INT NOT NULL,
+    month DATE NOT NULL,
+    transaction_type VARCHAR(50) NOT NULL,
+    debit_credit_indicator ENUM('D', 'C') NOT NULL,
+    total_amount DECIMAL(17, 3) NOT NULL DEFAULT 0.000,
+    transaction_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (account_id, month, transaction_type, debit_credit_indicator),
+    FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
+)
+"""
+
+
+def month_start(value):
+    """Premier jour du mois d'une date ou d'une chaîne 'AAAA-MM' ; lève ValueError si invalide"""
+    if isinstance(value, str):
+        year, month = value.split('-')
+        return date(int(year), int(month), 1)
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def summarize(rows):
+    """Regrouper des lignes d'agrégats par mois : débits, crédits, solde net et détail par type"""
+    months = {}
+    for row in rows:
+        key = row['month'].strftime('%Y-%m')
+        summary = months.setdefault(key, {'month': key, 'debits': 0.0, 'credits': 0.0, 'count': 0, 'by_type': {}})
+        amount = float(row['total_amount'])
+        side = 'credits' if row['debit_credit_indicator'] == 'C' else 'debits'
+        summary[side] = round(summary[side] + amount, 3)
+        summary['count'] += int(row['transaction_count'])
+        by_type = summary['by_type'].setdefault(row['transaction_type'], {'debits': 0.0, 'credits': 0.0})
+        by_type[side] = round(by_type[side] + amount, 3)
+    for summary in months.values():
+        summary['net'] = round(summary['credits'] - summary['debits'], 3)
+    return [months[key] for key in sorted(months)]
+
+
+def backfill(account_id=None, create_table=False):
+    """Reconstruire les agrégats d'un compte, ou de tous les comptes un par un.
+
+    Chaque compte est recalculé dans sa propre transaction SQL : les verrous
+    restent courts et une reprise après interruption est sans risque.
+    `create_table` crée d'abord la table si elle manque (bases antérieures
+    aux agrégats). Renvoie (comptes traités, échecs), ou None si la base est
+    injoignable ou la table impossible à créer.
+    """
+    db = DatabaseConnection()
+    if not db.connect():
+        print("Erreur de connexion à la base de données")
+        return None
+    done = failed = 0
+    try:
+        if create_table and db.execute_query(CREATE_TABLE) is None:
+            print("Erreur lors de la création de la table monthly_rollups")
+            return None
+        if account_id is None:
+            accounts = db.execute_query("SELECT account_id FROM accounts ORDER BY account_id") or []
+            account_ids = [row['account_id'] for row in accounts]
+        else:
+            account_ids = [account_id]
+        rollups = MonthlyRollup(db)
+        for current in account_ids:
+            if rollups.rebuild_account(current) is None:
+                failed += 1
+            else:
+                done += 1
+    finally:
+        db.disconnect()
+    return done, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.models.rollups')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    backfill_parser = commands.add_parser('backfill', help="reconstruire les agrégats mensuels depuis les transactions")
+    backfill_parser.add_argument('--account', type=int, help="un seul compte (tous par défaut)")
+
+    commands.add_parser('migrate', help="créer la table des agrégats sur une base existante puis tout reconstruire")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        result = backfill(create_table=True)
+    else:
+        result = backfill(args.account)
+    if result is None:
+        return 1
+    done, failed = result
+    print(f"{done} comptes recalculés, {failed} en échec", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import bisect
+import os
+import re
+import threading
+import time
+from src.chatbot.text_utils import fold_text
+from src.models.cache import LRUTTLCache
+from src.models.database import Transaction, transaction_key
+from src.models.ledger import register_posting_listener
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Longueur minimale indexée par InnoDB (innodb_ft_min_token_size) : même règle pour l'index local
+MIN_TOKEN_LENGTH = 3
+# Délai avant de retenter FULLTEXT après un échec
+FULLTEXT_RETRY_SECONDS = 300
+
+
+def parse_query(text):
+    """Mots à rechercher dans les libellés et numéros de pièce candidats (mots numériques)"""
+    tokens = _TOKEN.findall(fold_text(text or ''))
+    words = list(dict.fromkeys(token for token in tokens if len(token) >= MIN_TOKEN_LENGTH))
+    pieces = list(dict.fromkeys(token for token in tokens if token.isdigit()))
+    return words, pieces
+
+
+def match_expression(words):
+    """Expression FULLTEXT en mode booléen : chaque mot obligatoire, en préfixe ('+chq* +finan*')"""
+    return ' '.join(f'+{word}*' for word in words)
+
+
+class LocalSearchIndex:
+    """Index inversé en mémoire des libellés d'un compte.
+
+    Les lignes sont rangées de la plus récente à la plus ancienne ; chaque
+    mot (sans accents) pointe vers la liste croissante des positions des
+    lignes qui le contiennent. Le vocabulaire trié permet la recherche par
+    préfixe avec une recherche dichotomique.
+    """
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=transaction_key, reverse=True)
+        postings = {}
+        pieces = {}
+        for position, row in enumerate(self.rows):
+            for token in set(_TOKEN.findall(fold_text(row['description']))):
+                postings.setdefault(token, []).append(position)
+            if row['piece_number']:
+                pieces.setdefault(row['piece_number'], []).append(position)
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+        self._pieces = pieces
+
+    def _prefix_positions(self, prefix):
+        positions = set()
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            positions.update(self._postings[token])
+        return positions
+
+    def search(self, words=(), piece_numbers=(), limit=50, after=None):
+        """Mêmes résultats, ordre et pagination que Transaction.search ; `after` vaut (datetime, id)"""
+        matches = None
+        for word in words:
+            positions = self._prefix_positions(word)
+            matches = positions if matches is None else matches & positions
+        matches = set(matches or ())
+        for piece in piece_numbers:
+            matches.update(self._pieces.get(piece, ()))
+
+        results = []
+        for position in sorted(matches):
+            row = self.rows[position]
+            if after and transaction_key(row) >= after:
+                continue
+            results.append(row)
+            if len(results) == limit:
+                break
+        return results
+
+
+class TransactionSearch:
+    """Recherche dans les transactions d'un compte : index FULLTEXT de MySQL,
+    ou à défaut index inversé local construit à la demande.
+
+    `backend` vaut 'auto' (FULLTEXT, index local si la requête échoue, par
+    exemple index absent), 'fulltext' ou 'local'. Les index locaux sont
+    gardés en cache par compte et oubliés à chaque écriture sur le compte.
+    """
+
+    def __init__(self, index_cache, backend='auto'):
+        self.indexes = index_cache
+        self.backend = backend
+        self._fulltext_retry_at = 0.0
+        self._build_locks = {}
+        self._build_locks_lock = threading.Lock()
+
+    def search(self, db, account_id, words, piece_numbers, limit=50, after=None):
+        """Lignes trouvées et moteur utilisé : (lignes, 'fulltext' | 'local') ; lignes None en cas d'erreur"""
+        if self.backend == 'fulltext' or (self.backend == 'auto' and time.monotonic() >= self._fulltext_retry_at):
+            rows = Transaction(db).search(account_id, match_expression(words), piece_numbers, limit, after)
+            if rows is not None or self.backend == 'fulltext':
+                return rows, 'fulltext'
+            print("Recherche FULLTEXT indisponible, index local utilisé")
+            self._fulltext_retry_at = time.monotonic() + FULLTEXT_RETRY_SECONDS
+
+        index = self.local_index(db, account_id)
+        if index is None:
+            return None, 'local'
+        return index.search(words, piece_numbers, limit, after), 'local'
+
+    def local_index(self, db, account_id):
+        index = self.indexes.get(account_id)
+        if index is not None:
+            return index
+        # Une seule construction à la fois par compte : une rafale de recherches ne relit pas
+        # N fois l'historique, et la construction d'un gros compte ne bloque pas les autres
+        with self._build_locks_lock:
+            lock = self._build_locks.setdefault(account_id, threading.Lock())
+        try:
+            with lock:
+                index = self.indexes.get(account_id)
+                if index is None:
+                    rows = []
+                    for chunk in Transaction(db).iter_by_account_id(account_id):
+                        rows.extend(chunk)
+                    index = LocalSearchIndex(rows)
+                    self.indexes.set(account_id, index)
+        finally:
+            # Les recherches encore en attente gardent leur verrou et trouvent l'index en cache
+            with self._build_locks_lock:
+                if self._build_locks.get(account_id) is lock:
+                    del self._build_locks[account_id]
+        return index
+
+    def invalidate_posting(self, posting):
+        """Listener du Ledger : l'index local du compte n'est plus à jour"""
+        self.indexes.delete(posting['account_id'])
+
+    def stats(self):
+        return dict(self.indexes.stats(), backend=self.backend)
+
+
+# TRANSACTION_SEARCH_BACKEND : auto, fulltext ou local
+# SEARCH_INDEX_ACCOUNTS / SEARCH_INDEX_TTL : index locaux gardés en mémoire (objets Python, jamais dans Redis)
+transaction_search = TransactionSearch(
+    LRUTTLCache(
+        maxsize=int(os.environ.get('SEARCH_INDEX_ACCOUNTS', 32)),
+        ttl=int(os.environ.get('SEARCH_INDEX_TTL', 600))
+    ),
+    backend=os.environ.get('TRANSACTION_SEARCH_BACKEND', 'auto')
+)
+register_posting_listener(transaction_search.invalidate_posting)
@@ -1,5 +1,14 @@
-from flask import Blueprint, request, jsonify, session
-from src.models.database import DatabaseConnection, Account, Transaction
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
+from src.models.database import DatabaseConnection, Account, Transaction, MonthlyRollup, transaction_key
+from src.models.ledger import Ledger
+from src.models.cache import account_cache, account_generation, cache_user_accounts
+from src.models.pagination import parse_page_args, paginate, decode_datetime_key
+from src.models.rollups import month_start, add_months, summarize
+from src.models.search import transaction_search, parse_query
 
 accounts_bp = Blueprint('accounts', __name__)
 
@@ -9,7 +18,30 @@ def require_auth():
         return False
     return True
 
+def format_transaction(transaction):
+    """Formater une ligne de la table transactions pour l'API"""
+    return {
+        "transaction_id": transaction["transaction_id"],
+        "transaction_date": transaction["transaction_date"].strftime("%d/%m/%Y %H:%M") if transaction["transaction_date"] else None,
+        "description": transaction["description"],
+        "transaction_type": transaction["transaction_type"],
+        "amount": float(transaction["amount"]),
+        "debit_credit_indicator": transaction["debit_credit_indicator"],
+        "piece_number": transaction["piece_number"],
+        "value_date": transaction["value_date"].strftime("%d/%m/%Y") if transaction["value_date"] else None
+    }
+
 def get_accounts_data(user_id):
+    """Comptes de l'utilisateur, servis depuis le cache tant qu'aucun solde n'a changé.
+
+    Le résultat est partagé avec les autres appelants : ne pas le modifier.
+    """
+    cached = account_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    # Relevée avant la lecture : une écriture pendant la lecture empêche la mise en cache
+    generation = account_generation(user_id)
     try:
         db = DatabaseConnection()
         if not db.connect():
@@ -36,12 +68,14 @@ def get_accounts_data(user_id):
             formatted_accounts.append(formatted_account)
             total_balance += float(account["current_balance"])
         
-        return {
+        result = {
             "success": True,
             "accounts": formatted_accounts,
             "total_balance": round(total_balance, 3),
             "currency": "TND"
         }
+        cache_user_accounts(user_id, generation, result)
+        return result
         
     except Exception as e:
         return {"success": False, "error": f"Erreur serveur: {str(e)}"}
@@ -98,7 +132,7 @@ def get_account_balance(account_id):
     else:
         return jsonify({"error": result["error"]}), 500
 
-def perform_deposit(account_id, amount):
+def perform_deposit(user_id, account_id, amount):
     try:
         if amount <= 0:
             return {"success": False, "error": "Le montant du dépôt doit être positif"}
@@ -107,32 +141,19 @@ def perform_deposit(account_id, amount):
         if not db.connect():
             return {"success": False, "error": "Erreur de connexion à la base de données"}
 
-        account_model = Account(db)
-        account = account_model.get_by_id(account_id)
-
-        if not account:
-            db.disconnect()
-            return {"success": False, "error": "Compte non trouvé"}
-
-        new_balance = float(account["current_balance"]) + amount
-        account_model.update_balance(account_id, new_balance)
-
-        transaction_model = Transaction(db)
-        transaction_model.create(
-            account_id,
-            "DÉPÔT",
-            "DÉPÔT",
-            amount,
-            "C"
-        )
+        # Mise à jour du solde et écriture de la transaction en un seul commit, sur un compte de l'utilisateur uniquement
+        result = Ledger(db).post(account_id, amount, "C", "DÉPÔT", "DÉPÔT", user_id=user_id)
 
         db.disconnect()
-        return {"success": True, "message": "Dépôt effectué avec succès", "new_balance": round(new_balance, 3)}
+
+        if not result["success"]:
+            return result
+        return {"success": True, "message": "Dépôt effectué avec succès", "new_balance": round(result["new_balance"], 3)}
 
     except Exception as e:
         return {"success": False, "error": f"Erreur serveur: {str(e)}"}
 
-def perform_withdrawal(account_id, amount):
+def perform_withdrawal(user_id, account_id, amount):
     try:
         if amount <= 0:
             return {"success": False, "error": "Le montant du retrait doit être positif"}
@@ -141,31 +162,14 @@ def perform_withdrawal(account_id, amount):
         if not db.connect():
             return {"success": False, "error": "Erreur de connexion à la base de données"}
 
-        account_model = Account(db)
-        account = account_model.get_by_id(account_id)
-
-        if not account:
-            db.disconnect()
-            return {"success": False, "error": "Compte non trouvé"}
-
-        if float(account["current_balance"]) < amount:
-            db.disconnect()
-            return {"success": False, "error": "Solde insuffisant"}
-
-        new_balance = float(account["current_balance"]) - amount
-        account_model.update_balance(account_id, new_balance)
-
-        transaction_model = Transaction(db)
-        transaction_model.create(
-            account_id,
-            "RETRAIT",
-            "RETRAIT",
-            amount,
-            "D"
-        )
+        # Le contrôle de solde et de propriétaire est fait par l'UPDATE conditionnel du ledger
+        result = Ledger(db).post(account_id, amount, "D", "RETRAIT", "RETRAIT", user_id=user_id)
 
         db.disconnect()
-        return {"success": True, "message": "Retrait effectué avec succès", "new_balance": round(new_balance, 3)}
+
+        if not result["success"]:
+            return result
+        return {"success": True, "message": "Retrait effectué avec succès", "new_balance": round(result["new_balance"], 3)}
 
     except Exception as e:
         return {"success": False, "error": f"Erreur serveur: {str(e)}"}
@@ -182,7 +186,7 @@ def deposit():
     if not all([account_id, amount]):
         return jsonify({"error": "ID du compte et montant sont obligatoires"}), 400
 
-    result = perform_deposit(account_id, amount)
+    result = perform_deposit(session["user_id"], account_id, amount)
     if result["success"]:
         return jsonify(result), 200
     else:
@@ -200,7 +204,7 @@ def withdraw():
     if not all([account_id, amount]):
         return jsonify({"error": "ID du compte et montant sont obligatoires"}), 400
 
-    result = perform_withdrawal(account_id, amount)
+    result = perform_withdrawal(session["user_id"], account_id, amount)
     if result["success"]:
         return jsonify(result), 200
     else:
@@ -213,7 +217,11 @@ def get_account_transactions(account_id):
     
     try:
         user_id = session['user_id']
-        limit = request.args.get('limit', 50, type=int)
+        try:
+            limit, after = parse_page_args(request.args, key_size=2)
+            after = decode_datetime_key(after) if after else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Connexion à la base de données
         db = DatabaseConnection()
@@ -230,28 +238,19 @@ def get_account_transactions(account_id):
             return jsonify({'error': 'Compte non trouvé'}), 404
         
         transaction_model = Transaction(db)
-        transactions = transaction_model.get_by_account_id(account_id, limit)
+        transactions = transaction_model.get_by_account_id(account_id, limit + 1, after)
         
         db.disconnect()
         
+        transactions, next_cursor = paginate(transactions, limit, transaction_key)
+        
         # Formatage des transactions
-        formatted_transactions = []
-        for transaction in transactions:
-            formatted_transaction = {
-                'transaction_id': transaction['transaction_id'],
-                'transaction_date': transaction['transaction_date'].strftime('%d/%m/%Y %H:%M') if transaction['transaction_date'] else None,
-                'description': transaction['description'],
-                'transaction_type': transaction['transaction_type'],
-                'amount': float(transaction['amount']),
-                'debit_credit_indicator': transaction['debit_credit_indicator'],
-                'piece_number': transaction['piece_number'],
-                'value_date': transaction['value_date'].strftime('%d/%m/%Y') if transaction['value_date'] else None
-            }
-            formatted_transactions.append(formatted_transaction)
+        formatted_transactions = [format_transaction(transaction) for transaction in transactions]
         
         return jsonify({
             'transactions': formatted_transactions,
-            'count': len(formatted_transactions)
+            'count': len(formatted_transactions),
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -259,7 +258,231 @@ def get_account_transactions(account_id):
 
 
 
-def get_account_transactions_data(user_id, account_id, limit=50):
+EXPORT_FIELDS = [
+    "transaction_id", "transaction_date", "value_date", "description",
+    "transaction_type", "amount", "debit_credit_indicator", "piece_number"
+]
+
+EXPORT_CHUNK_SIZE = 500
+
+def _parse_export_date(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+def _export_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        for transaction in rows:
+            # Montant exact au millime (Decimal) plutôt que float
+            writer.writerow([
+                transaction["transaction_id"],
+                transaction["transaction_date"].strftime("%d/%m/%Y %H:%M") if transaction["transaction_date"] else "",
+                transaction["value_date"].strftime("%d/%m/%Y") if transaction["value_date"] else "",
+                transaction["description"],
+                transaction["transaction_type"],
+                transaction["amount"],
+                transaction["debit_credit_indicator"],
+                transaction["piece_number"] or ""
+            ])
+        yield buffer.getvalue()
+
+def _export_jsonl(chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(format_transaction(transaction), ensure_ascii=False) + "\n" for transaction in rows)
+
+@accounts_bp.route('/accounts/<int:account_id>/transactions/export', methods=['GET'])
+def export_account_transactions(account_id):
+    """Relevé complet en CSV ou JSON Lines, produit en flux sans tout charger en mémoire"""
+    if not require_auth():
+        return jsonify({'error': 'Authentification requise'}), 401
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'jsonl'):
+        return jsonify({'error': 'Format invalide (csv ou jsonl)'}), 400
+
+    try:
+        date_from = _parse_export_date(request.args.get('from'))
+        date_to = _parse_export_date(request.args.get('to'))
+    except ValueError:
+        return jsonify({'error': 'Dates invalides (format AAAA-MM-JJ)'}), 400
+    if date_to:
+        # Borne haute inclusive : jusqu'à la fin de la journée
+        date_to += timedelta(days=1)
+
+    try:
+        user_id = session['user_id']
+
+        db = DatabaseConnection()
+        if not db.connect():
+            return jsonify({'error': 'Erreur de connexion à la base de données'}), 500
+
+        account = Account(db).get_by_id(account_id)
+        if not account or account['user_id'] != user_id:
+            db.disconnect()
+            return jsonify({'error': 'Compte non trouvé'}), 404
+
+        def generate():
+            try:
+                chunks = Transaction(db).iter_by_account_id(account_id, date_from, date_to, EXPORT_CHUNK_SIZE)
+                writer = _export_csv if export_format == 'csv' else _export_jsonl
+                for part in writer(chunks):
+                    yield part
+            finally:
+                db.disconnect()
+
+        if export_format == 'csv':
+            mimetype = 'text/csv; charset=utf-8'
+        else:
+            mimetype = 'application/x-ndjson; charset=utf-8'
+        filename = f"releve_{account['account_number']}.{export_format}"
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+
+    except Exception as e:
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
+
+
+@accounts_bp.route('/accounts/<int:account_id>/transactions/search', methods=['GET'])
+def search_account_transactions(account_id):
+    """Recherche dans les libellés (sans accents, par préfixe) et par numéro de pièce
+
+    `q` : mots recherchés, tous obligatoires ; un nombre est aussi cherché
+    comme numéro de pièce. `piece` : numéro de pièce exact. Pagination par
+    curseur, comme la liste des transactions.
+    """
+    if not require_auth():
+        return jsonify({'error': 'Authentification requise'}), 401
+
+    words, piece_numbers = parse_query(request.args.get('q'))
+    piece = (request.args.get('piece') or '').strip()
+    if piece and piece not in piece_numbers:
+        piece_numbers.append(piece)
+    if not words and not piece_numbers:
+        return jsonify({'error': 'Paramètre q (mots d\'au moins 3 caractères) ou piece obligatoire'}), 400
+
+    try:
+        limit, after = parse_page_args(request.args, key_size=2)
+        after = decode_datetime_key(after) if after else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        user_id = session['user_id']
+
+        db = DatabaseConnection()
+        if not db.connect():
+            return jsonify({'error': 'Erreur de connexion à la base de données'}), 500
+
+        account = Account(db).get_by_id(account_id)
+        if not account or account['user_id'] != user_id:
+            db.disconnect()
+            return jsonify({'error': 'Compte non trouvé'}), 404
+
+        transactions, backend = transaction_search.search(db, account_id, words, piece_numbers, limit + 1, after)
+        db.disconnect()
+        if transactions is None:
+            return jsonify({'error': 'Erreur lors de la recherche'}), 500
+
+        transactions, next_cursor = paginate(transactions, limit, transaction_key)
+
+        return jsonify({
+            'transactions': [format_transaction(transaction) for transaction in transactions],
+            'count': len(transactions),
+            'next_cursor': next_cursor,
+            'backend': backend
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
+
+
+# Période par défaut et période maximale de /analytics, en mois
+ANALYTICS_DEFAULT_MONTHS = 12
+ANALYTICS_MAX_MONTHS = 120
+
+@accounts_bp.route('/accounts/<int:account_id>/analytics', methods=['GET'])
+def get_account_analytics(account_id):
+    """Débits, crédits et détail par type, mois par mois, lus dans les agrégats mensuels
+
+    Paramètres `from` et `to` au format AAAA-MM (par défaut les 12 derniers mois).
+    """
+    if not require_auth():
+        return jsonify({'error': 'Authentification requise'}), 401
+
+    try:
+        month_to = month_start(request.args['to']) if request.args.get('to') else month_start(date.today())
+        if request.args.get('from'):
+            month_from = month_start(request.args['from'])
+        else:
+            month_from = add_months(month_to, 1 - ANALYTICS_DEFAULT_MONTHS)
+    except ValueError:
+        return jsonify({'error': 'Mois invalides (format AAAA-MM)'}), 400
+    if month_from > month_to or add_months(month_from, ANALYTICS_MAX_MONTHS) <= month_to:
+        return jsonify({'error': f'Période invalide (from avant to, au plus {ANALYTICS_MAX_MONTHS} mois)'}), 400
+
+    try:
+        user_id = session['user_id']
+
+        db = DatabaseConnection()
+        if not db.connect():
+            return jsonify({'error': 'Erreur de connexion à la base de données'}), 500
+
+        account = Account(db).get_by_id(account_id)
+        if not account or account['user_id'] != user_id:
+            db.disconnect()
+            return jsonify({'error': 'Compte non trouvé'}), 404
+
+        rows = MonthlyRollup(db).get_by_account_id(account_id, month_from, month_to)
+        db.disconnect()
+        if rows is None:
+            return jsonify({'error': 'Erreur lors de la lecture des agrégats'}), 500
+
+        months = summarize(rows)
+        return jsonify({
+            'account_id': account_id,
+            'from': month_from.strftime('%Y-%m'),
+            'to': month_to.strftime('%Y-%m'),
+            'months': months,
+            'totals': {
+                'debits': round(sum(month['debits'] for month in months), 3),
+                'credits': round(sum(month['credits'] for month in months), 3),
+                'count': sum(month['count'] for month in months)
+            },
+            'currency': account['currency']
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
+
+
+def get_spending_data(user_id, months=2):
+    """Débits et crédits des `months` derniers mois (mois en cours compris), tous comptes confondus"""
+    try:
+        db = DatabaseConnection()
+        if not db.connect():
+            return {"success": False, "error": "Erreur de connexion à la base de données"}
+
+        month_to = month_start(date.today())
+        rows = MonthlyRollup(db).get_user_totals(user_id, add_months(month_to, 1 - months), month_to)
+        db.disconnect()
+        if rows is None:
+            return {"success": False, "error": "Erreur lors de la lecture des agrégats"}
+
+        return {"success": True, "months": summarize(rows)}
+
+    except Exception as e:
+        return {"success": False, "error": f"Erreur serveur: {str(e)}"}
+
+
+def get_account_transactions_data(user_id, account_id, limit=50, after=None):
     try:
         db = DatabaseConnection()
         if not db.connect():
@@ -273,28 +496,19 @@ def get_account_transactions_data(user_id, account_id, limit=50):
             return {"success": False, "error": "Compte non trouvé ou n'appartient pas à l'utilisateur"}
         
         transaction_model = Transaction(db)
-        transactions = transaction_model.get_by_account_id(account_id, limit)
+        transactions = transaction_model.get_by_account_id(account_id, limit + 1, after)
         
         db.disconnect()
         
-        formatted_transactions = []
-        for transaction in transactions:
-            formatted_transaction = {
-                "transaction_id": transaction["transaction_id"],
-                "transaction_date": transaction["transaction_date"].strftime("%d/%m/%Y %H:%M") if transaction["transaction_date"] else None,
-                "description": transaction["description"],
-                "transaction_type": transaction["transaction_type"],
-                "amount": float(transaction["amount"]),
-                "debit_credit_indicator": transaction["debit_credit_indicator"],
-                "piece_number": transaction["piece_number"],
-                "value_date": transaction["value_date"].strftime("%d/%m/%Y") if transaction["value_date"] else None
-            }
-            formatted_transactions.append(formatted_transaction)
+        transactions, next_cursor = paginate(transactions, limit, transaction_key)
+        
+        formatted_transactions = [format_transaction(transaction) for transaction in transactions]
         
         return {
             "success": True,
             "transactions": formatted_transactions,
-            "count": len(formatted_transactions)
+            "count": len(formatted_transactions),
+            "next_cursor": next_cursor
         }
         
     except Exception as e:
@@ -1,8 +1,16 @@
-from flask import Blueprint, request, jsonify, session
+import json
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
 from src.chatbot.chatbot_handler import chatbot_handler
+from src.chatbot.state_store import new_chat_id
+from src.chatbot.faq import FAQ_ENTRIES
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
+def _ensure_chat_id():
+    """Identifiant de conversation propre au navigateur, pour retrouver l'état de la conversation"""
+    if 'chat_id' not in session:
+        session['chat_id'] = new_chat_id()
+
 @chatbot_bp.route('/chat', methods=['POST'])
 def chat():
     """Endpoint principal pour le chatbot"""
@@ -14,6 +22,7 @@ def chat():
             return jsonify({'error': 'Message vide'}), 400
         
         # Traiter le message avec le chatbot
+        _ensure_chat_id()
         response = chatbot_handler.process_message(message, session)
         
         return jsonify(response), 200
@@ -25,6 +34,38 @@ def chat():
             'entities': {}
         }), 500
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@chatbot_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Variante de /chat qui envoie la réponse en Server-Sent Events au fil de la génération"""
+    data = request.get_json(silent=True) or {}
+    message = data.get('message', '').strip()
+
+    if not message:
+        return jsonify({'error': 'Message vide'}), 400
+
+    # Avant la réponse : le cookie de session part avec les en-têtes
+    _ensure_chat_id()
+
+    def generate():
+        # Fermé par le serveur quand le client se déconnecte : la génération est alors annulée
+        events = chatbot_handler.stream_message(message, session)
+        try:
+            for event, payload in events:
+                yield _sse(event, payload)
+        except Exception as e:
+            yield _sse('error', {'response': f"Désolé, une erreur s'est produite : {str(e)}"})
+        finally:
+            events.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @chatbot_bp.route('/chat/context', methods=['GET'])
 def get_chat_context():
     """Obtenir le contexte de la conversation"""
@@ -80,30 +121,7 @@ def get_suggestions():
 def get_faq():
     """Obtenir les questions fréquemment posées"""
     try:
-        faq = [
-            {
-                'question': 'Quels sont vos taux de crédit en dinars ?',
-                'answer': 'Nos taux de crédit varient selon le type :\n• Crédit Personnel : 6.5% à 8.5%\n• Crédit Immobilier : 5.0% à 7.0%\n• Crédit Auto : 6.0% à 8.0%\n\nPour une simulation personnalisée, demandez-moi de simuler un crédit.'
-            },
-            {
-                'question': 'Quels documents sont nécessaires pour un prêt ?',
-                'answer': 'Pour une demande de crédit, vous devez fournir :\n• Pièce d\'identité\n• Justificatifs de revenus (3 derniers bulletins de salaire)\n• Relevés bancaires (3 derniers mois)\n• Justificatif de domicile\n• Selon le projet : devis, compromis de vente, etc.'
-            },
-            {
-                'question': 'Comment effectuer un virement ?',
-                'answer': 'Pour effectuer un virement, dites-moi :\n• Le montant à transférer\n• Le nom du bénéficiaire\n• Le numéro de compte de destination\n\nJe vous guiderai ensuite pour la validation sécurisée.'
-            },
-            {
-                'question': 'Comment consulter mon solde ?',
-                'answer': 'Demandez-moi simplement :\n• "Quel est le solde de mon compte ?"\n• "Affiche mon solde"\n• "Combien j\'ai sur mon compte ?"\n\nJe vous afficherai le solde de tous vos comptes.'
-            },
-            {
-                'question': 'Comment voir mes transactions ?',
-                'answer': 'Pour consulter vos transactions, demandez :\n• "Affiche mes transactions"\n• "Historique de mes opérations"\n• "Dernières transactions"\n\nJe vous montrerai vos opérations récentes.'
-            }
-        ]
-        
-        return jsonify({'faq': faq}), 200
+        return jsonify({'faq': FAQ_ENTRIES}), 200
         
     except Exception as e:
         return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
@@ -0,0 +1,58 @@
+from flask import Blueprint, jsonify, request
+from src.models.database import db_pool
+from src.models.cache import account_cache
+from src.chatbot.chatbot_handler import chatbot_handler
+from src.chatbot.user_context import user_context_cache
+from src.models.pricing import pricing_stats
+from src.models.affordability import affordability_engine
+from src.models.search import transaction_search
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/health/pool', methods=['GET'])
+def get_pool_stats():
+    """Statistiques du pool de connexions MySQL"""
+    try:
+        return jsonify({'pool': db_pool.stats()}), 200
+    except Exception as e:
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
+
+@health_bp.route('/health/cache', methods=['GET'])
+def get_cache_stats():
+    """Compteurs des caches : comptes, états de conversation, contexte utilisateur, mensualités, solvabilité, index de recherche (succès, échecs, évictions)"""
+    try:
+        return jsonify({
+            'accounts': account_cache.stats(),
+            'chat_state': chatbot_handler.state_store.stats(),
+            'user_context': user_context_cache.stats(),
+            'loan_pricing': pricing_stats(),
+            'affordability': affordability_engine.stats(),
+            'search_index': transaction_search.stats()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
+
+@health_bp.route('/health/ready', methods=['GET'])
+def get_readiness():
+    """Disponibilité du service et état de chargement du modèle du chatbot
+
+    Les routes hors chatbot sont servies dès le démarrage ; avec
+    ?require_model=1 la réponse est 503 tant que le modèle n'est pas chargé.
+    """
+    model_status = chatbot_handler.model.status()
+    model_ready = model_status['state'] == 'ready'
+    body = {
+        'status': 'ready' if model_ready else 'degraded',
+        'chatbot_model': model_status
+    }
+    if request.args.get('require_model') == '1' and not model_ready:
+        return jsonify(body), 503
+    return jsonify(body), 200
+
+@health_bp.route('/health/intents', methods=['GET'])
+def get_intent_stats():
+    """Répartition des messages entre les niveaux de détection d'intention et leur latence"""
+    try:
+        return jsonify({'intents': chatbot_handler.intent_cascade.stats()}), 200
+    except Exception as e:
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
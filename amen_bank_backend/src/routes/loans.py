@@ -1,5 +1,12 @@
-from flask import Blueprint, request, jsonify, session
+import csv
+import io
+import json
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
 from src.models.database import DatabaseConnection, LoanApplication
+from src.models.pagination import parse_page_args, paginate
+from src.models.amortization import amortization_schedule, simulation_grid, SCHEDULE_FIELDS, MAX_LOAN_YEARS
+from src.models.pricing import monthly_payment, rate_table
+from src.models.affordability import affordability_engine
 
 loans_bp = Blueprint('loans', __name__)
 
@@ -9,25 +16,30 @@ def require_auth():
         return False
     return True
 
-def perform_loan_simulation(amount, years, annual_rate=0.07):
+def perform_loan_simulation(amount, years, annual_rate=None, product=None):
+    """Simulation sans base de données ; sans `annual_rate`, taux de la grille pour le produit et la durée"""
     try:
         if not amount or not years:
             return {"success": False, "error": "Montant et durée sont obligatoires"}
         
         if amount <= 0 or years <= 0:
             return {"success": False, "error": "Montant et durée doivent être positifs"}
+        if round(years * 12) < 1:
+            return {"success": False, "error": "La durée doit être d'au moins un mois"}
+        if years > MAX_LOAN_YEARS:
+            return {"success": False, "error": f"Durée maximale de {MAX_LOAN_YEARS} ans"}
         
-        db = DatabaseConnection()
-        if not db.connect():
-            return {"success": False, "error": "Erreur de connexion à la base de données"}
+        try:
+            if annual_rate is None:
+                annual_rate = rate_table.rate(product, years)
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+        payment = monthly_payment(amount, years, annual_rate)
         
-        loan_model = LoanApplication(db)
-        monthly_payment = loan_model.calculate_monthly_payment(amount, years, annual_rate)
-        
-        db.disconnect()
-        
-        total_payment = monthly_payment * years * 12
-        total_interest = total_payment - amount
+        # Totaux tirés de l'échéancier : la dernière échéance solde les écarts d'arrondi
+        totals = amortization_schedule(amount, years, annual_rate).totals()
+        total_payment = totals["total_payment"]
+        total_interest = totals["total_interest"]
         
         return {
             "success": True,
@@ -35,7 +47,7 @@ def perform_loan_simulation(amount, years, annual_rate=0.07):
                 "requested_amount": amount,
                 "loan_term_years": years,
                 "annual_rate": annual_rate * 100,
-                "monthly_payment": round(monthly_payment, 3),
+                "monthly_payment": payment,
                 "total_payment": round(total_payment, 3),
                 "total_interest": round(total_interest, 3),
                 "currency": "TND"
@@ -53,16 +65,154 @@ def simulate_loan():
     data = request.get_json()
     amount = data.get("amount")
     years = data.get("years")
-    annual_rate = data.get("annual_rate", 0.07)
+    annual_rate = data.get("annual_rate")
+    product = data.get("product")
     
-    result = perform_loan_simulation(amount, years, annual_rate)
+    result = perform_loan_simulation(amount, years, annual_rate, product)
     
     if result["success"]:
         return jsonify(result), 200
     else:
         return jsonify({"error": result["error"]}), 500
 
-def perform_loan_application(user_id, amount, years):
+# Nombre maximal de scénarios par grille, et de valeurs par axe
+MAX_GRID_SIZE = 5000
+MAX_GRID_AXIS = 200
+
+def _grid_axis(value, name, maximum=None):
+    """Valeurs d'un axe de la grille : nombre, liste, ou plage {start, stop, step} (stop inclus)"""
+    if isinstance(value, dict):
+        start, stop, step = float(value["start"]), float(value["stop"]), float(value["step"])
+        if step <= 0 or stop < start:
+            raise ValueError(f"Plage invalide pour {name}")
+        count = int((stop - start) / step + 1e-9) + 1
+        if count > MAX_GRID_AXIS:
+            raise ValueError(f"Trop de valeurs pour {name} (maximum {MAX_GRID_AXIS})")
+        values = [round(start + i * step, 6) for i in range(count)]
+    elif isinstance(value, list):
+        values = [float(v) for v in value]
+    else:
+        values = [float(value)]
+    if not values or len(values) > MAX_GRID_AXIS:
+        raise ValueError(f"Entre 1 et {MAX_GRID_AXIS} valeurs pour {name}")
+    if maximum is not None and max(values) > maximum:
+        raise ValueError(f"Valeur maximale de {maximum} pour {name}")
+    return values
+
+@loans_bp.route("/loans/simulate/grid", methods=["POST"])
+def simulate_loan_grid():
+    """Simulation de toutes les combinaisons de montants, durées et taux en un appel.
+
+    Réponse en colonnes : les axes une seule fois, puis un tableau par
+    résultat, dans l'ordre montant, durée, taux (le taux varie le plus vite).
+    """
+    if not require_auth():
+        return jsonify({"error": "Authentification requise"}), 401
+
+    data = request.get_json(silent=True) or {}
+    try:
+        amounts = _grid_axis(data["amounts"], "amounts")
+        years = _grid_axis(data["years"], "years", maximum=MAX_LOAN_YEARS)
+        rates = _grid_axis(data.get("annual_rates", 0.07), "annual_rates")
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Paramètres invalides: {str(e)}"}), 400
+
+    if min(amounts) <= 0 or min(years) <= 0 or min(rates) < 0:
+        return jsonify({"error": "Montants et durées doivent être positifs, taux positifs ou nuls"}), 400
+    size = len(amounts) * len(years) * len(rates)
+    if size > MAX_GRID_SIZE:
+        return jsonify({"error": f"Grille trop grande ({size} scénarios, maximum {MAX_GRID_SIZE})"}), 400
+
+    try:
+        results = simulation_grid(amounts, years, rates)
+    except ValueError as e:
+        return jsonify({"error": f"Paramètres invalides: {str(e)}"}), 400
+
+    return jsonify({
+        "axes": {
+            "amount": amounts,
+            "years": years,
+            "annual_rate": [round(rate * 100, 6) for rate in rates]
+        },
+        "order": ["amount", "years", "annual_rate"],
+        "count": size,
+        "currency": "TND",
+        "results": results
+    }), 200
+
+SCHEDULE_CHUNK_SIZE = 120
+
+def _schedule_csv(schedule):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SCHEDULE_FIELDS)
+    for index, row in enumerate(schedule.rows(), 1):
+        writer.writerow([row[0]] + [f"{value:.3f}" for value in row[1:]])
+        if index % SCHEDULE_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _schedule_jsonl(schedule):
+    lines = []
+    for row in schedule.rows():
+        lines.append(json.dumps(dict(zip(SCHEDULE_FIELDS, row))) + "\n")
+        if len(lines) == SCHEDULE_CHUNK_SIZE:
+            yield "".join(lines)
+            lines = []
+    yield "".join(lines)
+
+@loans_bp.route("/loans/schedule", methods=["POST"])
+def loan_schedule():
+    """Tableau d'amortissement complet, en JSON (colonnes) ou en flux CSV / JSON Lines"""
+    if not require_auth():
+        return jsonify({"error": "Authentification requise"}), 401
+
+    export_format = request.args.get('format', 'json')
+    if export_format not in ('json', 'csv', 'jsonl'):
+        return jsonify({'error': 'Format invalide (json, csv ou jsonl)'}), 400
+
+    data = request.get_json(silent=True) or {}
+    try:
+        annual_rate = data.get("annual_rate")
+        if annual_rate is None and data.get("years"):
+            annual_rate = rate_table.rate(data.get("product"), data["years"])
+        early_repayments = [(item["month"], item["amount"]) for item in data.get("early_repayments") or []]
+        schedule = amortization_schedule(
+            data.get("amount"),
+            data.get("years"),
+            annual_rate,
+            deferral_months=data.get("deferral_months", 0),
+            deferral_type=data.get("deferral_type", 'partial'),
+            early_repayments=early_repayments,
+            early_repayment_mode=data.get("early_repayment_mode", 'reduce_term')
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Paramètres invalides: {str(e)}"}), 400
+
+    if export_format == 'json':
+        return jsonify({
+            "requested_amount": schedule.amount,
+            "annual_rate": schedule.annual_rate * 100,
+            "currency": "TND",
+            "summary": schedule.totals(),
+            "schedule": schedule.columns()
+        }), 200
+
+    if export_format == 'csv':
+        mimetype = 'text/csv; charset=utf-8'
+        writer = _schedule_csv
+    else:
+        mimetype = 'application/x-ndjson; charset=utf-8'
+        writer = _schedule_jsonl
+    return Response(
+        stream_with_context(writer(schedule)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="echeancier.{export_format}"'}
+    )
+
+def perform_loan_application(user_id, amount, years, product=None):
     try:
         if not amount or not years:
             return {"success": False, "error": "Montant et durée sont obligatoires"}
@@ -70,17 +220,23 @@ def perform_loan_application(user_id, amount, years):
         if amount <= 0 or years <= 0:
             return {"success": False, "error": "Montant et durée doivent être positifs"}
         
+        # Calculer la mensualité pour la simulation, au taux de la grille
+        try:
+            payment = monthly_payment(amount, years, rate_table.rate(product, years))
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+        
         db = DatabaseConnection()
         if not db.connect():
             return {"success": False, "error": "Erreur de connexion à la base de données"}
         
         loan_model = LoanApplication(db)
         
-        # Calculer la mensualité pour la simulation
-        monthly_payment = loan_model.calculate_monthly_payment(amount, years)
+        # Évaluer la capacité de remboursement (None si l'historique est illisible : la demande est tout de même enregistrée)
+        assessment = affordability_engine.assess(user_id, payment, db)
         
         # Créer la demande de crédit
-        application_id = loan_model.create(user_id, amount, years, monthly_payment)
+        application_id = loan_model.create(user_id, amount, years, payment, assessment)
         
         db.disconnect()
         
@@ -89,7 +245,8 @@ def perform_loan_application(user_id, amount, years):
                 "success": True,
                 "message": "Demande de crédit soumise avec succès",
                 "application_id": application_id,
-                "monthly_payment_simulation": round(monthly_payment, 3),
+                "monthly_payment_simulation": payment,
+                "affordability": assessment,
                 "status": "PENDING"
             }
         else:
@@ -106,10 +263,11 @@ def apply_for_loan():
     data = request.get_json()
     amount = data.get("amount")
     years = data.get("years")
+    product = data.get("product")
     
     user_id = session["user_id"]
     
-    result = perform_loan_application(user_id, amount, years)
+    result = perform_loan_application(user_id, amount, years, product)
     
     if result["success"]:
         return jsonify(result), 201
@@ -123,6 +281,10 @@ def get_loan_applications():
     
     try:
         user_id = session['user_id']
+        try:
+            limit, after = parse_page_args(request.args, key_size=2)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Connexion à la base de données
         db = DatabaseConnection()
@@ -130,10 +292,12 @@ def get_loan_applications():
             return jsonify({'error': 'Erreur de connexion à la base de données'}), 500
         
         loan_model = LoanApplication(db)
-        applications = loan_model.get_by_user_id(user_id)
+        applications = loan_model.get_by_user_id(user_id, limit + 1, after)
         
         db.disconnect()
         
+        applications, next_cursor = paginate(applications, limit, lambda a: (a['application_date'], a['application_id']))
+        
         # Formatage des demandes
         formatted_applications = []
         for application in applications:
@@ -144,13 +308,19 @@ def get_loan_applications():
                 'application_date': application['application_date'].strftime('%d/%m/%Y %H:%M') if application['application_date'] else None,
                 'status': application['status'],
                 'monthly_payment_simulation': float(application['monthly_payment_simulation']) if application['monthly_payment_simulation'] else None,
+                'affordability': {
+                    'score': application['affordability_score'],
+                    'decision': application['affordability_decision'],
+                    'debt_to_income': float(application['debt_to_income']) if application['debt_to_income'] is not None else None
+                } if application.get('scored_at') else None,
                 'currency': 'TND'
             }
             formatted_applications.append(formatted_application)
         
         return jsonify({
             'applications': formatted_applications,
-            'count': len(formatted_applications)
+            'count': len(formatted_applications),
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -158,34 +328,9 @@ def get_loan_applications():
 
 @loans_bp.route('/loans/rates', methods=['GET'])
 def get_loan_rates():
-    """Retourner les taux de crédit actuels"""
+    """Retourner les taux de crédit actuels (grille utilisée par les simulations)"""
     try:
-        # Taux fictifs pour la démonstration
-        rates = {
-            'personal_loan': {
-                'name': 'Crédit Personnel',
-                'min_rate': 6.5,
-                'max_rate': 8.5,
-                'currency': 'TND'
-            },
-            'home_loan': {
-                'name': 'Crédit Immobilier',
-                'min_rate': 5.0,
-                'max_rate': 7.0,
-                'currency': 'TND'
-            },
-            'car_loan': {
-                'name': 'Crédit Auto',
-                'min_rate': 6.0,
-                'max_rate': 8.0,
-                'currency': 'TND'
-            }
-        }
-        
-        return jsonify({
-            'rates': rates,
-            'last_updated': '2024-01-01'
-        }), 200
+        return jsonify(rate_table.summary()), 200
         
     except Exception as e:
         return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.database import DatabaseConnection, Transfer, Account, Transaction, Beneficiary
+from src.models.ledger import Ledger
+from src.models.pagination import parse_page_args, paginate
 from datetime import datetime, timedelta
 from decimal import Decimal
 
@@ -18,25 +20,6 @@ def perform_transfer(user_id, from_account_id, to_account_number, beneficiary_na
         if not db.connect():
             return {"success": False, "error": "Erreur de connexion à la base de données"}
         
-        # Vérifier que le compte source appartient à l'utilisateur
-        account_model = Account(db)
-        accounts = account_model.get_by_user_id(user_id)
-        
-        source_account = None
-        for acc in accounts:
-            if acc["account_id"] == from_account_id:
-                source_account = acc
-                break
-        
-        if not source_account:
-            db.disconnect()
-            return {"success": False, "error": "Compte source non trouvé ou n'appartient pas à l'utilisateur"}
-        
-        # Vérifier le solde suffisant
-        if float(source_account["current_balance"]) < amount:
-            db.disconnect()
-            return {"success": False, "error": "Solde insuffisant"}
-        
         # Calculer la prochaine date d'exécution pour les virements permanents
         next_execution_date = None
         if is_scheduled and schedule_frequency:
@@ -45,42 +28,35 @@ def perform_transfer(user_id, from_account_id, to_account_number, beneficiary_na
             elif schedule_frequency == "WEEKLY":
                 next_execution_date = datetime.now() + timedelta(days=7)
         
-        # Créer le virement
-        transfer_model = Transfer(db)
-        transfer_id = transfer_model.create(
-            from_account_id, to_account_number, beneficiary_name, 
-            amount, is_scheduled, schedule_frequency, next_execution_date
+        # Débit conditionnel du compte source (propriété et solde vérifiés par MySQL),
+        # création du virement et de la transaction dans une seule transaction SQL
+        result = Ledger(db).post(
+            from_account_id,
+            amount,
+            "D",
+            f"VIREMENT vers {beneficiary_name}",
+            "VIREMENT",
+            user_id=user_id,
+            transfer={
+                "to_account_number": to_account_number,
+                "beneficiary_name": beneficiary_name,
+                "is_scheduled": is_scheduled,
+                "schedule_frequency": schedule_frequency,
+                "next_execution_date": next_execution_date
+            }
         )
         
-        if transfer_id:
-            # Mettre à jour le solde du compte source
-            new_balance = float(source_account["current_balance"]) - amount
-            account_model.update_balance(from_account_id, new_balance)
-            
-            # Créer une transaction pour le débit
-            transaction_model = Transaction(db)
-            transaction_model.create(
-                from_account_id,
-                f"VIREMENT vers {beneficiary_name}",
-                "VIREMENT",
-                amount,
-                "D"
-            )
-            
-            # Marquer le virement comme complété
-            transfer_model.update_status(transfer_id, "COMPLETED")
-            
-            db.disconnect()
-            
-            return {
-                "success": True,
-                "message": "Virement effectué avec succès",
-                "transfer_id": transfer_id,
-                "new_balance": round(new_balance, 3)
-            }
-        else:
-            db.disconnect()
-            return {"success": False, "error": "Erreur lors de la création du virement"}
+        db.disconnect()
+        
+        if not result["success"]:
+            return result
+        
+        return {
+            "success": True,
+            "message": "Virement effectué avec succès",
+            "transfer_id": result["transfer_id"],
+            "new_balance": round(result["new_balance"], 3)
+        }
             
     except Exception as e:
         return {"success": False, "error": f"Erreur serveur: {str(e)}"}
@@ -120,6 +96,10 @@ def get_transfers():
     
     try:
         user_id = session['user_id']
+        try:
+            limit, after = parse_page_args(request.args, key_size=2)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Connexion à la base de données
         db = DatabaseConnection()
@@ -127,10 +107,12 @@ def get_transfers():
             return jsonify({'error': 'Erreur de connexion à la base de données'}), 500
         
         transfer_model = Transfer(db)
-        transfers = transfer_model.get_by_user_id(user_id)
+        transfers = transfer_model.get_by_user_id(user_id, limit + 1, after)
         
         db.disconnect()
         
+        transfers, next_cursor = paginate(transfers, limit, lambda t: (t['transfer_date'], t['transfer_id']))
+        
         # Formatage des virements
         formatted_transfers = []
         for transfer in transfers:
@@ -150,7 +132,8 @@ def get_transfers():
         
         return jsonify({
             'transfers': formatted_transfers,
-            'count': len(formatted_transfers)
+            'count': len(formatted_transfers),
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -163,6 +146,10 @@ def get_beneficiaries():
     
     try:
         user_id = session['user_id']
+        try:
+            limit, after = parse_page_args(request.args, key_size=1)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Connexion à la base de données
         db = DatabaseConnection()
@@ -170,10 +157,12 @@ def get_beneficiaries():
             return jsonify({'error': 'Erreur de connexion à la base de données'}), 500
         
         beneficiary_model = Beneficiary(db)
-        beneficiaries = beneficiary_model.get_by_user_id(user_id)
+        beneficiaries = beneficiary_model.get_by_user_id(user_id, limit + 1, after)
         
         db.disconnect()
         
+        beneficiaries, next_cursor = paginate(beneficiaries, limit, lambda b: (b['beneficiary_id'],))
+        
         # Formatage des bénéficiaires
         formatted_beneficiaries = []
         for beneficiary in beneficiaries:
@@ -188,7 +177,8 @@ def get_beneficiaries():
         
         return jsonify({
             'beneficiaries': formatted_beneficiaries,
-            'count': len(formatted_beneficiaries)
+            'count': len(formatted_beneficiaries),
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -0,0 +1,26 @@
+import itertools
+import pytest
+from src.models.amortization import amortization_schedule, simulation_grid, MAX_LOAN_YEARS
+
+AMOUNTS = [0.005, 1500, 10000, 123456.789]
+YEARS = [0.5, 2.55, 5, 25, MAX_LOAN_YEARS]
+RATES = [0, 0.07, 0.35]
+
+
+def test_grid_totals_match_schedule():
+    grid = simulation_grid(AMOUNTS, YEARS, RATES)
+    for index, (amount, years, rate) in enumerate(itertools.product(AMOUNTS, YEARS, RATES)):
+        totals = amortization_schedule(amount, years, rate).totals()
+        assert grid['total_payment'][index] == totals['total_payment']
+        assert grid['total_interest'][index] == totals['total_interest']
+
+
+@pytest.mark.parametrize('years', [0.01, MAX_LOAN_YEARS + 1, 1e6])
+def test_grid_rejects_terms_out_of_range(years):
+    with pytest.raises(ValueError):
+        simulation_grid([10000], [years], [0.07])
+
+
+def test_schedule_rejects_terms_beyond_maximum():
+    with pytest.raises(ValueError, match=f"{MAX_LOAN_YEARS} ans"):
+        amortization_schedule(10000, 1e6, 0.07)
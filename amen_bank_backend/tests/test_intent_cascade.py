@@ -0,0 +1,39 @@
+import pytest
+from src.chatbot.intent_cascade import IntentCascade, CANNED_RESPONSES
+from src.chatbot.intent_classifier import INTENTS
+from src.chatbot.intent_engine import keyword_intent_engine, DEFAULT_INTENT
+
+
+def _classifier_phrases():
+    """Exemples d'entraînement que les mots-clés ne reconnaissent pas, rattachés à une seule intention"""
+    owners = {}
+    for intent, phrases in INTENTS.items():
+        for phrase in phrases:
+            owners.setdefault(phrase, set()).add(intent)
+    return [
+        (phrase, intents.pop())
+        for phrase, intents in owners.items()
+        if len(intents) == 1 and keyword_intent_engine.classify(phrase)[0] == DEFAULT_INTENT
+    ]
+
+
+@pytest.fixture(scope='module')
+def cascade():
+    return IntentCascade()
+
+
+@pytest.mark.parametrize('phrase,intent', _classifier_phrases())
+def test_training_phrases_resolve_at_classifier_tier(cascade, phrase, intent):
+    detected, _, tier = cascade.classify(phrase)
+    assert (detected, tier) == (intent, 'classifier')
+    assert type(detected) is str
+
+
+@pytest.mark.parametrize('phrase', ["il fait beau", "quelle est la capitale de la France", "oui", "bonne journée"])
+def test_unknown_or_ambiguous_messages_go_to_generation(cascade, phrase):
+    assert cascade.classify(phrase) == (DEFAULT_INTENT, 0.0, 'llm')
+
+
+def test_goodbye_gets_canned_response(cascade):
+    intent, _, _ = cascade.classify("au revoir")
+    assert intent == 'au_revoir' and intent in CANNED_RESPONSES
@@ -0,0 +1,27 @@
+import pytest
+from src.models.amortization import amortization_schedule, simulation_grid
+from src.models.pricing import monthly_payment, rate_table
+from src.routes.loans import perform_loan_simulation
+
+
+def test_long_simulation_without_product_uses_home_loan_rates():
+    result = perform_loan_simulation(200000, 20)
+    assert result['success'], result
+    assert result['simulation']['annual_rate'] == pytest.approx(6.0)
+
+
+def test_default_product_kept_when_it_covers_the_term():
+    assert rate_table.rate(None, 5) == rate_table.rate('personal_loan', 5)
+
+
+def test_term_beyond_every_product_reports_longest_maximum():
+    with pytest.raises(ValueError, match="25 ans"):
+        rate_table.rate(None, 30)
+
+
+@pytest.mark.parametrize('years', [2.55, 5, 7.3, 0.5])
+def test_quoted_payment_matches_schedule_and_grid(years):
+    payment = monthly_payment(12345.678, years, 0.07)
+    schedule = amortization_schedule(12345.678, years, 0.07)
+    assert payment == schedule.payment[0] / 1000
+    assert payment == simulation_grid([12345.678], [years], [0.07])['monthly_payment'][0]
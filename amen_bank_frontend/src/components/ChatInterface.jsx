@@ -72,8 +72,48 @@ export function ChatInterface({ isOpen, onClose, user }) {
     setInputMessage('')
     setIsLoading(true)
 
+    const botMessageId = Date.now() + 1
+    let botMessageCreated = false
+
+    // Crée le message du bot au premier événement, puis le met à jour au fil du flux
+    const updateBotMessage = (changes) => {
+      if (!botMessageCreated) {
+        botMessageCreated = true
+        const initial = { id: botMessageId, type: 'bot', content: '', timestamp: new Date(), streaming: true }
+        setMessages(prev => [...prev, {
+          ...initial,
+          ...(typeof changes === 'function' ? changes(initial) : changes)
+        }])
+        return
+      }
+      setMessages(prev => prev.map(msg => (
+        msg.id === botMessageId
+          ? { ...msg, ...(typeof changes === 'function' ? changes(msg) : changes) }
+          : msg
+      )))
+    }
+
+    const handleEvent = (event, data) => {
+      switch (event) {
+        case 'meta':
+          updateBotMessage({ intent: data.intent })
+          break
+        case 'token':
+          updateBotMessage(msg => ({ content: (msg?.content || '') + data.text }))
+          break
+        case 'done':
+          updateBotMessage({ content: data.response })
+          break
+        case 'error':
+          updateBotMessage({ content: data.response, isError: true })
+          break
+        default:
+          break
+      }
+    }
+
     try {
-      const response = await fetch('/api/chat', {
+      const response = await fetch('/api/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -82,17 +122,34 @@ export function ChatInterface({ isOpen, onClose, user }) {
         body: JSON.stringify({ message })
       })
 
-      const data = await response.json()
-
-      const botMessage = {
-        id: Date.now() + 1,
-        type: 'bot',
-        content: data.response,
-        timestamp: new Date(),
-        intent: data.intent
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`)
       }
 
-      setMessages(prev => [...prev, botMessage])
+      // Lecture des Server-Sent Events : blocs "event: ...\ndata: ..." séparés par une ligne vide
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        let separatorIndex
+        while ((separatorIndex = buffer.indexOf('\n\n')) !== -1) {
+          const block = buffer.slice(0, separatorIndex)
+          buffer = buffer.slice(separatorIndex + 2)
+
+          let event = 'message'
+          let data = ''
+          for (const line of block.split('\n')) {
+            if (line.startsWith('event: ')) event = line.slice(7)
+            else if (line.startsWith('data: ')) data += line.slice(6)
+          }
+          if (data) handleEvent(event, JSON.parse(data))
+        }
+      }
     } catch (error) {
       const errorMessage = {
         id: Date.now() + 1,
@@ -104,6 +161,9 @@ export function ChatInterface({ isOpen, onClose, user }) {
       setMessages(prev => [...prev, errorMessage])
     } finally {
       setIsLoading(false)
+      setMessages(prev => prev.map(msg => (
+        msg.id === botMessageId ? { ...msg, streaming: false } : msg
+      )))
     }
   }
 
@@ -211,7 +271,7 @@ export function ChatInterface({ isOpen, onClose, user }) {
                 </div>
               ))}
 
-              {isLoading && (
+              {isLoading && !messages.some(msg => msg.streaming) && (
                 <div className="flex gap-3 justify-start">
                   <div className="w-8 h-8 bg-gradient-to-br from-blue-500 to-blue-600 rounded-full flex items-center justify-center">
                     <Bot className="h-4 w-4 text-white" />
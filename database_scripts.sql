@@ -79,17 +79,43 @@ CREATE TABLE loan_applications (
     status VARCHAR(50) NOT NULL DEFAULT 'PENDING',
     monthly_payment_simulation DECIMAL(15, 3),
     justification_docs_path VARCHAR(255),
+    -- Évaluation de solvabilité (src/models/affordability.py)
+    monthly_income DECIMAL(15, 3),
+    recurring_debits DECIMAL(15, 3),
+    debt_to_income DECIMAL(8, 4),
+    affordability_score TINYINT,
+    affordability_decision VARCHAR(20),
+    scored_at DATETIME,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
+-- Agrégats mensuels des transactions, tenus à jour à chaque écriture
+-- (bases existantes : python -m src.models.rollups migrate)
+CREATE TABLE monthly_rollups (
+    account_id INT NOT NULL,
+    month DATE NOT NULL,
+    transaction_type VARCHAR(50) NOT NULL,
+    debit_credit_indicator ENUM('D', 'C') NOT NULL,
+    total_amount DECIMAL(17, 3) NOT NULL DEFAULT 0.000,
+    transaction_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (account_id, month, transaction_type, debit_credit_indicator),
+    FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
+);
+
 -- Index pour améliorer les performances
 CREATE INDEX idx_accounts_user_id ON accounts(user_id);
-CREATE INDEX idx_transactions_account_id ON transactions(account_id);
+-- Index composites (clé, date, id) pour la pagination par curseur
+CREATE INDEX idx_transactions_account_date ON transactions(account_id, transaction_date, transaction_id);
 CREATE INDEX idx_transactions_date ON transactions(transaction_date);
+-- Recherche dans les libellés (collation insensible aux accents) et par numéro de pièce
+CREATE FULLTEXT INDEX ft_transactions_description ON transactions(description);
+CREATE INDEX idx_transactions_account_piece ON transactions(account_id, piece_number);
 CREATE INDEX idx_beneficiaries_user_id ON beneficiaries(user_id);
-CREATE INDEX idx_transfers_from_account ON transfers(from_account_id);
+CREATE INDEX idx_transfers_from_account_date ON transfers(from_account_id, transfer_date, transfer_id);
 CREATE INDEX idx_transfers_date ON transfers(transfer_date);
-CREATE INDEX idx_loan_applications_user_id ON loan_applications(user_id);
+CREATE INDEX idx_loan_applications_user_date ON loan_applications(user_id, application_date, application_id);
+-- Réévaluation des demandes en attente
+CREATE INDEX idx_loan_applications_status ON loan_applications(status, application_id);
 
 -- Données de test (optionnel)
 INSERT INTO users (username, password, email, phone_number, full_name, address) VALUES
@@ -105,6 +131,12 @@ INSERT INTO transactions (account_id, description, transaction_type, amount, deb
 (1, 'ENC 0005 CHQ 13.01', 'ENCAISSEMENT', 739.067, 'C', NULL, '2015-08-12'),
 (1, 'CHQ 7457881 FAV RECEVEUR FINANCE ARI', 'CHEQUE', 3450.000, 'D', '7457881', '2015-08-11');
 
+-- Agrégats des transactions de test (insérées sans passer par l'application)
+INSERT INTO monthly_rollups (account_id, month, transaction_type, debit_credit_indicator, total_amount, transaction_count)
+SELECT account_id, DATE_FORMAT(transaction_date, '%Y-%m-01') AS month, transaction_type, debit_credit_indicator, SUM(amount), COUNT(*)
+FROM transactions
+GROUP BY account_id, month, transaction_type, debit_credit_indicator;
+
 INSERT INTO beneficiaries (user_id, full_name, bank_name, account_number, rib) VALUES
 (1, 'Ahmed Ben Salah', 'Amen Bank', '123456789012', 'TN59 08 011 123456789012 34');
 